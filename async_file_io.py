@@ -0,0 +1,293 @@
+import asyncio
+import functools
+import io
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy import load_module
+from file_io import FileIO
+from remote_cache import CacheEntry
+from exception import (
+    RemoteException, RemoteConnectionException, RemoteAuthenticationException,
+    RemoteTimeoutException, RemoteFileException
+)
+
+# Definitions
+MAX_WORKERS = 16
+
+_executor = None
+_executor_lock = threading.Lock()
+# Imported by _load_paramiko on the first remote call, see lazy.load_module
+paramiko = None
+
+def _load_paramiko() -> None:
+    """Imports paramiko, code that never connects does not pay for it.
+    """
+    global paramiko
+    if paramiko is None:
+        paramiko = load_module("paramiko")
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Gets the executor blocking remote calls run on, creating it on first
+       use.
+
+    Returns:
+        ThreadPoolExecutor: Shared executor.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_WORKERS, thread_name_prefix="spectrak-remote"
+            )
+        return _executor
+
+def _shutdown_executor() -> None:
+    """Shuts down the shared executor, e.g. when the program exits. A new one
+       is created if it is needed again.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _translate_error(e: Exception) -> Exception:
+    """Maps an error from paramiko or the socket layer to a typed exception.
+
+    Args:
+        e (Exception): Error raised by a blocking remote call.
+
+    Returns:
+        Exception: Matching RemoteException.
+    """
+    if isinstance(e, RemoteException):
+        return e
+    if isinstance(e, paramiko.AuthenticationException):
+        return RemoteAuthenticationException(
+            "Authentication failed, please verify your credentials"
+        )
+    if isinstance(e, (socket.timeout, TimeoutError)):
+        return RemoteTimeoutException(f"Server did not answer in time: {e}")
+    if isinstance(e, (FileNotFoundError, PermissionError)):
+        return RemoteFileException(str(e))
+    if isinstance(e, (ConnectionError, EOFError, paramiko.SSHException,
+                      socket.error)):
+        return RemoteConnectionException(
+            f"Unable to establish SSH connection: {e}"
+        )
+    return RemoteFileException(f"Operation error: {e}")
+
+class AsyncFileIO:
+    def __init__(
+        self, file_io: FileIO, timeout: float = None,
+        executor: ThreadPoolExecutor = None) -> None:
+        """Creates an instance of the AsyncFileIO class which exposes the
+           remote operations of a FileIO as coroutines. The blocking paramiko
+           calls run on an executor so the event loop stays responsive.
+
+        Args:
+            file_io (FileIO): Remote target to operate on.
+            timeout (float, optional): Seconds each operation may take, no
+                                       limit if None. Defaults to None.
+            executor (ThreadPoolExecutor, optional): Executor to run on.
+                                                     Defaults to the shared
+                                                     executor.
+        """
+        self.file_io = file_io
+        self.timeout = timeout
+        self.executor = executor
+
+    ############
+    #   Operations
+    ############
+    async def connect(self) -> None:
+        """Opens (or reuses) the SSH/SFTP session.
+
+        Raises:
+            RemoteException: If the connection failed.
+        """
+        await self._run(self.file_io._require_sessions)
+
+    async def stat(self):
+        """Gets the metadata of the remote file.
+
+        Raises:
+            RemoteException: If the operation failed.
+
+        Returns:
+            paramiko.SFTPAttributes: size, mtime, etc. of the remote file.
+        """
+        return await self._run(self._connected, self.file_io._stat_remote_file)
+
+    async def read(self, progress=None) -> bytes:
+        """Reads the whole remote file.
+
+        Args:
+            progress (callable, optional): Called with (bytes done, total) from
+                                           the worker thread.
+
+        Raises:
+            RemoteException: If the operation failed.
+
+        Returns:
+            bytes: Content of the remote file.
+        """
+        def read() -> bytes:
+            buffer = io.BytesIO()
+            self.file_io._transfer_remote_file(buffer, progress)
+            return buffer.getvalue()
+        return await self._run(self._connected, read)
+
+    async def fetch(self, progress=None) -> str:
+        """Brings the cached local copy of the remote file up to date.
+
+        Args:
+            progress (callable, optional): Called with (bytes done, total) from
+                                           the worker thread.
+
+        Raises:
+            RemoteException: If the operation failed.
+
+        Returns:
+            str: Path of the up to date local copy.
+        """
+        return await self._run(self.file_io._fetch_remote_file, progress)
+
+    async def fetch_version(self, progress=None) -> CacheEntry:
+        """Same as fetch but also tells which version was fetched, the base
+           to hand to write for edits made to it.
+
+        Args:
+            progress (callable, optional): Called with (bytes done, total) from
+                                           the worker thread.
+
+        Raises:
+            RemoteException: If the operation failed.
+
+        Returns:
+            CacheEntry: Version fetched, with the path of the local copy.
+        """
+        return await self._run(self.file_io._fetch_remote_version, progress)
+
+    async def write(
+        self, local_path: str, base: CacheEntry,
+        progress=None) -> CacheEntry:
+        """Publishes a local file over the remote file, see
+           FileIO._upload_file.
+
+        Args:
+            local_path (str): Local file to upload.
+            base (CacheEntry): Version the edit was based on, from
+                               fetch_version, None if the remote file should
+                               not exist yet.
+            progress (callable, optional): Called with (bytes done, total) from
+                                           the worker thread.
+
+        Raises:
+            RemoteConflictException: If someone else changed the remote file.
+            RemoteException: If the operation failed.
+
+        Returns:
+            CacheEntry: Version now on the server.
+        """
+        return await self._run(
+            self.file_io._upload_file, local_path, base, progress
+        )
+
+    async def close(self) -> None:
+        """Hands the session back to the pool. That may talk to the server, so
+           like _abort it runs on the loop's default executor.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.file_io._release_sessions)
+
+    ############
+    #   Helpers
+    ############
+    def _connected(self, func, *args):
+        """Runs a FileIO call that needs an open session.
+        """
+        self.file_io._require_sessions()
+        return func(*args)
+
+    def _call(self, func, *args):
+        """Runs a blocking call on the worker thread and types its errors.
+        """
+        # Loaded before any error has to be told apart by its paramiko type
+        _load_paramiko()
+        try:
+            return func(*args)
+        except Exception as e:
+            raise _translate_error(e) from e
+
+    def _abort(self, loop) -> asyncio.Future:
+        """Drops the lease the call runs on so a worker stuck on it fails fast
+           instead of holding an executor thread. Other operations on the same
+           server keep their own leases. Closing the channel talks to the
+           server, so it runs on the loop's default executor, which stuck
+           remote calls cannot fill up.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): Running event loop.
+
+        Returns:
+            asyncio.Future: Done once the lease is dropped.
+        """
+        lease = self.file_io.lease
+        if lease is None:
+            future = loop.create_future()
+            future.set_result(None)
+            return future
+        return loop.run_in_executor(None, self.file_io.pool._discard, lease)
+
+    async def _run(self, func, *args):
+        """Runs a blocking call on the executor with the timeout applied.
+
+        Raises:
+            RemoteTimeoutException: If the call took longer than the timeout.
+            RemoteException: If the call failed.
+
+        Returns:
+            unknown: Result of the call.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.executor or _get_executor(),
+            functools.partial(self._call, func, *args)
+        )
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            await self._abort(loop)
+            raise RemoteTimeoutException(
+                f"{self.file_io.server_ip} did not answer within "
+                f"{self.timeout} seconds"
+            )
+        except asyncio.CancelledError:
+            # Waiting here could be cancelled too, let it finish on its own
+            self._abort(loop)
+            raise
+
+async def fetch_all(
+    targets: list[FileIO], timeout: float = None) -> list:
+    """Fetches many remote files at once from a coroutine.
+
+    Args:
+        targets (list[FileIO]): Remote files to fetch.
+        timeout (float, optional): Seconds each fetch may take.
+
+    Returns:
+        list: Local path or RemoteException of each target, in order.
+    """
+    async def fetch(target: FileIO) -> str:
+        remote = AsyncFileIO(target, timeout)
+        try:
+            return await remote.fetch()
+        finally:
+            # Each fetch leased a session, hand it back for the next one
+            await remote.close()
+    return await asyncio.gather(
+        *(fetch(target) for target in targets), return_exceptions=True
+    )
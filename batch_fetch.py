@@ -0,0 +1,101 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from file_io import FileIO
+
+# Definitions
+MAX_WORKERS = 8
+
+class FetchResult:
+    def __init__(
+        self, target: FileIO, local_path: str, error: Exception,
+        elapsed: float) -> None:
+        """Creates an instance of the FetchResult class which reports how the
+           fetch of one remote target went.
+
+        Args:
+            target (FileIO): Remote target that was fetched.
+            local_path (str): Path of the up to date local copy, None on error.
+            error (Exception): Why the fetch failed, None on success.
+            elapsed (float): Seconds the fetch took.
+        """
+        self.target = target
+        self.local_path = local_path
+        self.error = error
+        self.elapsed = elapsed
+
+    ############
+    #   Getters
+    ############
+    def _get_local_path(self) -> str:
+        """Gets the path of the fetched local copy.
+
+        Returns:
+            str: Local copy, None if the fetch failed.
+        """
+        return self.local_path
+
+    def _get_error(self) -> Exception:
+        """Gets why the fetch failed.
+
+        Returns:
+            Exception: The error, None if the fetch succeeded.
+        """
+        return self.error
+
+    ############
+    #   Helpers
+    ############
+    def _succeeded(self) -> bool:
+        """Checks if the fetch succeeded.
+
+        Returns:
+            bool: True if the local copy is up to date, false otherwise.
+        """
+        return self.error is None
+
+def fetch_many(
+    targets: list[FileIO], max_workers: int = MAX_WORKERS,
+    timeout: int = None, progress=None) -> list[FetchResult]:
+    """Fetches many remote files concurrently. Each target is brought up to
+       date with FileIO._fetch_remote_file, so unchanged files only cost a
+       stat and the wall time follows the slowest server rather than the sum.
+
+    Args:
+        targets (list[FileIO]): Remote files to fetch.
+        max_workers (int, optional): Most fetches running at once. Defaults to
+                                     MAX_WORKERS.
+        timeout (int, optional): Per host timeout in seconds for this fetch,
+                                 the timeout of each target if None.
+        progress (callable, optional): Called with each FetchResult as soon as
+                                       it completes.
+
+    Returns:
+        list[FetchResult]: One result per target, in the order given.
+    """
+    def fetch(target: FileIO) -> FetchResult:
+        start = time.monotonic()
+        try:
+            local_path = target._fetch_remote_file(timeout=timeout)
+            result = FetchResult(
+                target, local_path, None, time.monotonic() - start
+            )
+            target._release_sessions()
+        except Exception as e:
+            if isinstance(e, (FileNotFoundError, PermissionError)):
+                # The lease is fine, the next target on the host may reuse it
+                target._release_sessions()
+            else:
+                # Only this target's lease, the others on the host carry on
+                target._close_sessions()
+            result = FetchResult(target, None, e, time.monotonic() - start)
+        if progress is not None:
+            progress(result)
+        return result
+
+    if len(targets) == 0:
+        return []
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(targets)),
+        thread_name_prefix="spectrak-fetch") as executor:
+        return list(executor.map(fetch, targets))
@@ -0,0 +1,123 @@
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from file_io import FileIO
+from remote_cache import RemoteCache
+from sftp_server import SFTPStandIn, DEFAULT_USERNAME, DEFAULT_PASSWORD
+from ssh_pool import SessionPool
+
+# Definitions
+REMOTE_NAME = "requirements.json"
+
+def _timed(func, *args):
+    """Runs a call and measures it.
+
+    Returns:
+        tuple: (result, seconds)
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def _throughput(size: int, seconds: float) -> str:
+    """Formats a transfer rate.
+    """
+    return f"{size / seconds / 1048576:8.2f} MiB/s"
+
+def _report(name: str, seconds: float, extra: str = "") -> None:
+    """Prints one line of the results table.
+    """
+    print(f"{name:<28}{seconds * 1000:10.1f} ms   {extra}")
+
+def run(size: int, latency: float, bandwidth: float, exec_helper: bool) -> None:
+    """Measures connect latency, fetch and upload throughput and reconnect
+       behaviour of FileIO against an in-process SFTP stand-in.
+
+    Args:
+        size (int): Size of the remote file in bytes.
+        latency (float): Injected one way latency in seconds.
+        bandwidth (float): Injected bandwidth in bytes per second, or None.
+        exec_helper (bool): Whether the server may run the delta helper.
+    """
+    root = tempfile.mkdtemp(prefix="spectrak-bench-")
+    cache_dir = tempfile.mkdtemp(prefix="spectrak-bench-cache-")
+    server = SFTPStandIn(
+        root, latency=latency, bandwidth=bandwidth, allow_exec=exec_helper
+    )
+    try:
+        port = server._start()
+        with open(os.path.join(root, REMOTE_NAME), "wb") as f:
+            f.write(os.urandom(size))
+        local_path = os.path.join(cache_dir, "edited.json")
+        file_io = FileIO(
+            DEFAULT_USERNAME, DEFAULT_PASSWORD, None, REMOTE_NAME,
+            "127.0.0.1", port, local_path, pool=SessionPool(),
+            cache=RemoteCache(cache_dir)
+        )
+
+        _, seconds = _timed(file_io._require_sessions)
+        _report("connect (cold)", seconds)
+        file_io._release_sessions()
+        _, seconds = _timed(file_io._require_sessions)
+        _report("connect (pooled)", seconds)
+
+        base, seconds = _timed(file_io._fetch_remote_version)
+        _report("fetch (full)", seconds, _throughput(size, seconds))
+        _, seconds = _timed(file_io._fetch_remote_file)
+        _report("fetch (unchanged)", seconds, "stat only")
+
+        # Someone else edits a few bytes in the middle of the file
+        with open(os.path.join(root, REMOTE_NAME), "r+b") as f:
+            f.seek(size // 2)
+            f.write(b"edited")
+        os.utime(os.path.join(root, REMOTE_NAME),
+                 (time.time() + 5, time.time() + 5))
+        base, seconds = _timed(file_io._fetch_remote_version)
+        _report("fetch (small edit)", seconds,
+                "delta" if exec_helper else "full")
+
+        shutil.copyfile(base.local_path, local_path)
+        with open(local_path, "r+b") as f:
+            f.seek(size // 3)
+            f.write(b"ours")
+        base, seconds = _timed(file_io._upload_file, local_path, base)
+        _report("upload (atomic)", seconds, _throughput(size, seconds))
+        with open(local_path, "r+b") as f:
+            f.seek(size // 4)
+            f.write(b"again")
+        _, seconds = _timed(file_io._push_local_file, local_path, base)
+        _report("upload (small edit)", seconds,
+                "delta" if exec_helper else "full")
+
+        server._drop_connections()
+        _, seconds = _timed(file_io._fetch_remote_file)
+        _report("fetch after drop", seconds, "reconnect + stat")
+    finally:
+        server._stop()
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark FileIO against an in-process SFTP server."
+    )
+    parser.add_argument("--size", type=float, default=16,
+                        help="remote file size in MiB")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="one way latency in ms")
+    parser.add_argument("--bandwidth", type=float, default=None,
+                        help="bandwidth limit in MiB/s")
+    parser.add_argument("--no-exec", action="store_true",
+                        help="refuse exec requests, disabling delta sync")
+    args = parser.parse_args()
+    # Dropped connections are part of the run, keep paramiko's logs quiet
+    logging.getLogger("paramiko").addHandler(logging.NullHandler())
+    run(
+        int(args.size * 1048576), args.latency / 1000,
+        None if args.bandwidth is None else args.bandwidth * 1048576,
+        not args.no_exec
+    )
@@ -0,0 +1,87 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Definitions
+# What a headless command needs: read, write, diff and fetch requirements
+HEADLESS_MODULES = ("state", "json_read", "json_write", "diff", "checksum",
+                    "file_io")
+GUI_MODULES = ("controller",)
+
+def _import_times(modules: tuple) -> tuple:
+    """Imports modules in a fresh interpreter with -X importtime.
+
+    Args:
+        modules (tuple): Module names to import.
+
+    Returns:
+        tuple: Module name to (self, cumulative) microseconds for every module
+               loaded, and the microseconds of the outermost imports, which
+               include everything else.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "import " + ", ".join(modules)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    )
+    times = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            own, cumulative = int(fields[0]), int(fields[1])
+        except ValueError:
+            # The header line
+            continue
+        name = fields[2].strip()
+        times[name] = (own, cumulative)
+        # Nested imports are indented further than the single space
+        if not fields[2][1:].startswith(" "):
+            total += cumulative
+    return times, total
+
+def run(modules: tuple, repeat: int, top: int) -> None:
+    """Measures the cold import time of a set of modules, interpreter start
+       up included, the way a command starting up pays it.
+
+    Args:
+        modules (tuple): Module names to import.
+        repeat (int): Fresh interpreters to take the median over.
+        top (int): Heaviest modules to list.
+    """
+    totals = []
+    runs = []
+    for _ in range(repeat):
+        times, total = _import_times(modules)
+        runs.append(times)
+        totals.append(total)
+    print(f"{' '.join(modules)}: {statistics.median(totals) / 1000:.1f} ms "
+          f"median of {repeat}")
+    loaded = runs[-1]
+    for name in ("paramiko", "PyQt6"):
+        print(f"  {name:<24}{'loaded' if name in loaded else 'not loaded'}")
+    heaviest = sorted(loaded.items(), key=lambda item: -item[1][0])[:top]
+    for name, (own, _) in heaviest:
+        print(f"  {name:<40}{own / 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark startup import time with python -X importtime."
+    )
+    parser.add_argument("modules", nargs="*",
+                        help="modules to import, defaults to the headless set")
+    parser.add_argument("--gui", action="store_true",
+                        help="measure the GUI entry point as well")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=10,
+                        help="heaviest modules to list")
+    args = parser.parse_args()
+    run(tuple(args.modules) or HEADLESS_MODULES, args.repeat, args.top)
+    if args.gui:
+        run(GUI_MODULES, args.repeat, args.top)
@@ -19,4 +19,19 @@ def hash_list(lst):
     """
     if isinstance(lst, list):
         return tuple(hash_list(sub) for sub in lst)
-    return lst
\ No newline at end of file
+    return lst
+
+def file_checksum(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Generate a checksum of a file's contents without loading it whole.
+
+    Args:
+        path: Path of the file to checksum.
+        chunk_size: How many bytes to read at a time.
+    Return:
+        The checksum as a hexadecimal string.
+    """
+    digest = hashlib.md5()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,572 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import orjson
+except ImportError:
+    # Optional, the standard library parser is used without it
+    orjson = None
+
+from diff import diff
+from dictionify import LEVELS
+
+# Definitions
+STATUSES = ("Not Started", "In Progress", "Under Review", "Done")
+FORMATS = ("json", "jsonl")
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_COLUMNS = ("level", "path", "title", "status", "description",
+                  "comments", "trace", "code_reference")
+# Header keys in the order JsonWriter writes them, readers only find the
+# header without parsing the file if it starts with the timestamp
+HEADER_KEYS = ("timestamp", "settings")
+# Exit codes
+OK = 0
+FOUND = 1
+ERROR = 2
+
+class Profile:
+    def __init__(self) -> None:
+        """Creates an instance of the Profile class which adds up the time
+           spent in each phase of a command.
+        """
+        # Phase -> seconds, in the order the phases were first entered
+        self.phases = {}
+
+    @contextmanager
+    def _phase(self, name: str):
+        """Times the body of a with block as part of a phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + \
+                time.perf_counter() - start
+
+    def _merge(self, phases: dict) -> None:
+        """Adds the phases of another profile, e.g. from a worker process.
+        """
+        for name, seconds in phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def _report(self, stream) -> None:
+        """Prints one line per phase.
+        """
+        for name, seconds in self.phases.items():
+            print(f"{name:<12}{seconds * 1000:10.1f} ms", file=stream)
+
+def loads(data):
+    """Parses json with the fastest parser available.
+
+    Args:
+        data (bytes or str): Json text.
+
+    Returns:
+        unknown: Parsed value.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(value) -> str:
+    """Writes a value as compact json on one line.
+    """
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+def file_format(path: str, given: str = None) -> str:
+    """Gets the storage format of a file, from its extension unless given.
+
+    Returns:
+        str: One of FORMATS.
+    """
+    if given is not None:
+        return given
+    return "jsonl" if path.endswith(".jsonl") else "json"
+
+def read_projects(path: str, profile: Profile, format: str = None) -> tuple:
+    """Opens a requirements file. A json file is parsed whole, a jsonl file
+       one project at a time as the projects are used.
+
+    Args:
+        path (str): Requirements file.
+        profile (Profile): Where to add the time spent.
+        format (str, optional): Storage format, from the extension if None.
+
+    Returns:
+        tuple: (header, projects), the header holding timestamp and
+               settings, projects an iterator of project dictionaries.
+    """
+    if file_format(path, format) == "jsonl":
+        handle = open(path, "rb")
+        with profile._phase("parse"):
+            first = handle.readline()
+            header = loads(first) if first.strip() else {}
+        def projects():
+            with handle:
+                while True:
+                    with profile._phase("read"):
+                        line = handle.readline()
+                    if not line:
+                        return
+                    if not line.strip():
+                        continue
+                    with profile._phase("parse"):
+                        project = loads(line)
+                    yield project
+        return header, projects()
+    with profile._phase("read"):
+        with open(path, "rb") as f:
+            data = f.read()
+    with profile._phase("parse"):
+        document = loads(data)
+    del data
+    if not isinstance(document, dict):
+        raise ValueError("top level is not an object")
+    projects = document.pop("projects", [])
+    if not isinstance(projects, list):
+        raise ValueError("'projects' is not a list")
+    return document, iter(projects)
+
+def checked(projects):
+    """Goes through the project entries of a file, stopping at the first one
+       that is not an object (validate reports those instead).
+
+    Raises:
+        ValueError: If an entry is not an object.
+    """
+    for number, project in enumerate(projects):
+        if not isinstance(project, dict):
+            raise ValueError(f"projects[{number}]: not an object")
+        yield project
+
+def walk(project: dict):
+    """Goes through a project and everything below it.
+
+    Yields:
+        tuple: (depth, node, path), depth indexing LEVELS and path the
+               titles from the project down to the node.
+    """
+    stack = [(0, project, (project.get("title"),))]
+    while stack:
+        depth, node, path = stack.pop()
+        yield depth, node, path
+        key = LEVELS[depth][2]
+        children = node.get(key) if key is not None else None
+        if not isinstance(children, list):
+            continue
+        for child in reversed(children):
+            if isinstance(child, dict):
+                stack.append((depth + 1, child, path + (child.get("title"),)))
+
+def fingerprint(project: dict) -> str:
+    """Gets a checksum of a project that ignores key order.
+    """
+    return hashlib.md5(
+        json.dumps(project, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+def output_path(path: str, options: dict, extension: str) -> str:
+    """Gets where the output made from an input file goes.
+
+    Raises:
+        ValueError: If it would overwrite the input.
+    """
+    out_path = options["output"]
+    if options["many"]:
+        name = os.path.splitext(os.path.basename(path))[0]
+        out_path = os.path.join(out_path, f"{name}.{extension}")
+    if os.path.abspath(out_path) == os.path.abspath(path):
+        raise ValueError(f"{out_path} would overwrite its input")
+    return out_path
+
+############
+#   Commands, each takes one input and returns (output, found, phases)
+#   and raises OSError or ValueError if it cannot be read or written
+############
+def validate_file(path: str, options: dict) -> tuple:
+    """Checks a requirements file can be read back by the program: every
+       field present, children in lists, known statuses and unique project
+       titles.
+    """
+    profile = Profile()
+    errors = []
+    nodes = 0
+    try:
+        header, projects = read_projects(path, profile, options["format"])
+        titles = set()
+        for number, project in enumerate(projects):
+            if not isinstance(project, dict):
+                errors.append(f"projects[{number}]: not an object")
+                continue
+            with profile._phase("check"):
+                title = project.get("title")
+                if title in titles:
+                    errors.append(f"projects[{number}]: duplicate title "
+                                  f"{title!r}")
+                titles.add(title)
+                for depth, node, node_path in walk(project):
+                    nodes += 1
+                    name, fields, key = LEVELS[depth]
+                    where = "/".join(str(t) for t in node_path)
+                    for field in fields:
+                        if field not in node:
+                            errors.append(f"{where}: {name} misses {field!r}")
+                    if "status" in fields and "status" in node and \
+                       node["status"] not in STATUSES:
+                        errors.append(f"{where}: unknown status "
+                                      f"{node['status']!r}")
+                    if key is not None and \
+                       not isinstance(node.get(key), list):
+                        errors.append(f"{where}: {key!r} is not a list")
+    except (OSError, ValueError) as e:
+        errors.append(str(e))
+    if errors:
+        lines = [f"{path}: {error}" for error in errors]
+        return "\n".join(lines) + "\n", True, profile.phases
+    return f"{path}: OK, {nodes} objects\n", False, profile.phases
+
+def stats_file(path: str, options: dict) -> tuple:
+    """Counts the objects of each level by status.
+    """
+    profile = Profile()
+    counts = dict((name, {}) for name, _, _ in LEVELS)
+    projects_done = []
+    header, projects = read_projects(path, profile, options["format"])
+    for project in checked(projects):
+        with profile._phase("count"):
+            below = {}
+            for depth, node, _ in walk(project):
+                name = LEVELS[depth][0]
+                status = node.get("status")
+                level = counts[name]
+                level[status] = level.get(status, 0) + 1
+                if depth > 0:
+                    below[status] = below.get(status, 0) + 1
+            total = sum(below.values())
+            done = 100.0 * below.get("Done", 0) / total if total else 0.0
+            projects_done.append((project.get("title"), total, done))
+    with profile._phase("format"):
+        if options["json"]:
+            output = dumps({
+                "path" : path,
+                "levels" : dict(
+                    (name, dict((str(k), v) for k, v in level.items()))
+                    for name, level in counts.items() if name != "Project"
+                ),
+                "projects" : [
+                    {"title" : t, "objects" : n, "percent_done" : d}
+                    for t, n, d in projects_done
+                ]
+            }) + "\n"
+        else:
+            lines = [path]
+            for name, level in counts.items():
+                if name == "Project":
+                    lines.append(f"  {'Project':<18}{sum(level.values()):>8}")
+                    continue
+                parts = ", ".join(
+                    f"{status}: {count}"
+                    for status, count in sorted(
+                        level.items(), key=lambda item: str(item[0])
+                    )
+                )
+                lines.append(
+                    f"  {name:<18}{sum(level.values()):>8}   {parts}"
+                )
+            for title, total, done in projects_done:
+                lines.append(f"  {title}: {done:.1f}% done of {total}")
+            output = "\n".join(lines) + "\n"
+    return output, False, profile.phases
+
+def export_file(path: str, options: dict) -> tuple:
+    """Writes one row per object, written out as the projects are read.
+    """
+    profile = Profile()
+    header, projects = read_projects(path, profile, options["format"])
+    if options["output"] is None:
+        out = sys.stdout
+    else:
+        out_path = output_path(path, options, options["to"])
+        out = open(out_path, "w", newline="")
+    try:
+        writer = csv.writer(out) if options["to"] == "csv" else None
+        # Many files exported to stdout make one table
+        if writer is not None and \
+           (out is not sys.stdout or path == options["first"]):
+            writer.writerow(EXPORT_COLUMNS)
+        for project in checked(projects):
+            with profile._phase("export"):
+                for depth, node, node_path in walk(project):
+                    row = (
+                        LEVELS[depth][0], "/".join(str(t) for t in node_path),
+                        node.get("title"), node.get("status"),
+                        node.get("description"), node.get("comments"),
+                        node.get("trace"), node.get("code_comments")
+                    )
+                    if writer is not None:
+                        writer.writerow(row)
+                    else:
+                        out.write(dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return "", False, profile.phases
+
+def convert_file(path: str, options: dict) -> tuple:
+    """Writes a requirements file in another storage format, one project at
+       a time. The json output is the same as JsonWriter's. The new file
+       replaces the output only once complete.
+    """
+    profile = Profile()
+    to = options["to"]
+    header, projects = read_projects(path, profile, options["format"])
+    ordered = dict((key, header[key]) for key in HEADER_KEYS if key in header)
+    ordered.update(header)
+    header = ordered
+    out_path = output_path(path, options, to)
+    # A name of its own, other runs may write the same output at once
+    fd, temp_path = tempfile.mkstemp(
+        suffix=".tmp", prefix=os.path.basename(out_path) + ".",
+        dir=os.path.dirname(os.path.abspath(out_path))
+    )
+    try:
+        with os.fdopen(fd, "w") as out:
+            with profile._phase("write"):
+                if to == "jsonl":
+                    out.write(dumps(header) + "\n")
+                elif header:
+                    out.write(json.dumps(header)[:-1] + ',\n"projects": ')
+                else:
+                    # No timestamp or settings to go before the projects
+                    out.write('{"projects": ')
+            first = True
+            for project in checked(projects):
+                with profile._phase("write"):
+                    if to == "jsonl":
+                        out.write(dumps(project) + "\n")
+                        continue
+                    # Indented one level like json.dump of the whole list
+                    text = json.dumps(project, indent=2).replace("\n", "\n  ")
+                    out.write(("[\n  " if first else ",\n  ") + text)
+                    first = False
+            if to == "json":
+                out.write("[]}\n" if first else "\n]}\n")
+        try:
+            os.chmod(temp_path, os.stat(out_path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(temp_path, out_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return "", False, profile.phases
+
+def diff_files(old_path: str, new_path: str, options: dict) -> tuple:
+    """Compares two requirements files project by project, only diffing the
+       projects whose checksums differ.
+    """
+    profile = Profile()
+    old = {}
+    _, projects = read_projects(old_path, profile, options["format"])
+    for project in checked(projects):
+        with profile._phase("checksum"):
+            old[project.get("title")] = (project, fingerprint(project))
+    result = {"added" : [], "removed" : [], "changed" : {}}
+    _, projects = read_projects(new_path, profile, options["format"])
+    for project in checked(projects):
+        title = project.get("title")
+        with profile._phase("checksum"):
+            known = old.pop(title, None)
+            if known is None:
+                result["added"].append(title)
+                continue
+            if known[1] == fingerprint(project):
+                continue
+        with profile._phase("diff"):
+            result["changed"][str(title)] = diff(known[0], project)
+    result["removed"] = list(old)
+    found = bool(result["added"] or result["removed"] or result["changed"])
+    return json.dumps(result, indent=2) + "\n", found, profile.phases
+
+COMMANDS = {
+    "validate" : validate_file,
+    "stats" : stats_file,
+    "export" : export_file,
+    "convert" : convert_file
+}
+
+def _run_one(task: tuple) -> tuple:
+    """Runs a command on one file, in this process or a worker. A file that
+       cannot be read or written does not stop the others.
+
+    Returns:
+        tuple: (output, error, code, phases), error the message for stderr
+               or None and code OK, FOUND or ERROR.
+    """
+    command, path, options = task
+    try:
+        output, found, phases = COMMANDS[command](path, options)
+    except BrokenPipeError:
+        # Not the file's fault, the whole run stops
+        raise
+    except (OSError, ValueError) as e:
+        return "", f"{command}: {path}: {e}\n", ERROR, {}
+    return output, None, FOUND if found else OK, phases
+
+def run_many(command: str, paths: list, options: dict, jobs: int):
+    """Runs a command over many files, in parallel processes when asked.
+
+    Args:
+        command (str): Key of COMMANDS.
+        paths (list): Input files.
+        options (dict): Options of the command.
+        jobs (int): Processes to use.
+
+    Yields:
+        tuple: (output, error, code, phases) of each file, see _run_one,
+               in input order.
+    """
+    tasks = [(command, path, options) for path in paths]
+    if jobs <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _run_one(task)
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+        yield from pool.map(_run_one, tasks)
+
+def build_parser() -> argparse.ArgumentParser:
+    """Gets the parser of the command line.
+    """
+    # Accepted after any command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--jobs", "-j", type=int, default=1,
+                        help="files processed in parallel")
+    common.add_argument("--profile", action="store_true",
+                        help="print the time spent in each phase to stderr")
+    common.add_argument("--format", choices=FORMATS, default=None,
+                        help="storage format of the inputs, by extension "
+                             "if not given")
+    parser = argparse.ArgumentParser(
+        prog="spectrak",
+        description="Work with requirements files without the GUI."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    validate = commands.add_parser(
+        "validate", parents=[common], help="check files can be loaded"
+    )
+    validate.add_argument("files", nargs="+")
+    stats = commands.add_parser(
+        "stats", parents=[common], help="count objects by status"
+    )
+    stats.add_argument("files", nargs="+")
+    stats.add_argument("--json", action="store_true",
+                       help="one json object per file")
+    compare = commands.add_parser(
+        "diff", parents=[common], help="compare two files"
+    )
+    compare.add_argument("old")
+    compare.add_argument("new")
+    export = commands.add_parser(
+        "export", parents=[common], help="one row per object"
+    )
+    export.add_argument("files", nargs="+")
+    export.add_argument("--to", choices=EXPORT_FORMATS, default="csv")
+    export.add_argument("--output", "-o", default=None,
+                        help="output file, a directory for many inputs, "
+                             "stdout if not given")
+    convert = commands.add_parser(
+        "convert", parents=[common],
+        help="write files in another storage format"
+    )
+    convert.add_argument("files", nargs="+")
+    convert.add_argument("--to", choices=FORMATS, required=True)
+    convert.add_argument("--output", "-o", required=True,
+                         help="output file, a directory for many inputs")
+    return parser
+
+def main(argv: list = None) -> int:
+    """Runs the command line.
+
+    Args:
+        argv (list, optional): Arguments, sys.argv[1:] if None.
+
+    Returns:
+        int: Exit code, FOUND if validation failed or the files differ,
+             ERROR if any file could not be read or written.
+    """
+    args = build_parser().parse_args(argv)
+    try:
+        return _run(args)
+    except (OSError, ValueError) as e:
+        print(f"{args.command}: {e}", file=sys.stderr)
+        return ERROR
+
+def _run(args: argparse.Namespace) -> int:
+    """Runs a parsed command line.
+    """
+    profile = Profile()
+    start = time.perf_counter()
+    code = OK
+    jobs = args.jobs
+    try:
+        if args.command == "diff":
+            output, found, phases = diff_files(
+                args.old, args.new, {"format" : args.format}
+            )
+            code = FOUND if found else OK
+            profile._merge(phases)
+            sys.stdout.write(output)
+        else:
+            many = len(args.files) > 1
+            output = getattr(args, "output", None)
+            if many and output is not None and \
+               not os.path.isdir(output):
+                print(f"{output} must be a directory for many inputs",
+                      file=sys.stderr)
+                return ERROR
+            options = {
+                "format" : args.format,
+                "json" : getattr(args, "json", False),
+                "to" : getattr(args, "to", None),
+                "output" : output,
+                "many" : many,
+                "first" : args.files[0]
+            }
+            if args.command == "export" and output is None:
+                # Workers writing to stdout at once would mix their rows
+                jobs = 1
+            for output, error, result, phases in run_many(
+                args.command, args.files, options, jobs):
+                # ERROR outranks FOUND outranks OK
+                code = max(code, result)
+                profile._merge(phases)
+                sys.stdout.write(output)
+                if error is not None:
+                    sys.stdout.flush()
+                    sys.stderr.write(error)
+            sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away, e.g. a pipe into head. What was run until
+        # then decides the exit code, as if nothing went wrong.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return code
+    if args.profile:
+        profile._report(sys.stderr)
+        print(f"{'total':<12}{(time.perf_counter() - start) * 1000:10.1f} ms"
+              f"   parser: {'orjson' if orjson is not None else 'json'}",
+              file=sys.stderr)
+    return code
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,62 @@
 import sys
+import time
+from PyQt6.QtCore import QThreadPool, QTimer
 from PyQt6.QtWidgets import QApplication
 from model import Model
 from view import View
+from state import State
+from file_io import FileIO
+from tree_model import RequirementTreeModel
+from filter_model import FilterTreeModel
+from dirty import DirtyTracker
+from workers import (
+    Worker, UiInvoker, read_file, write_file, sync_file, push_file
+)
+
+# Definitions
+# Quiet time after the last edit before autosaving, in milliseconds
+AUTOSAVE_DELAY = 2000
+# Longest an edit waits for a save while edits keep coming, in seconds
+AUTOSAVE_MAX_WAIT = 30
 
 class Controller:
-    def __init__(self):
+    def __init__(self, state: State = None):
         self.app = QApplication(sys.argv)
         self.model = Model()
+        self.state = state if state is not None else State([], "", None)
+        # The models below are Qt objects, background edits such as the
+        # watcher's are made here on the UI thread
+        self.invoker = UiInvoker()
+        self.state._set_owner(self.invoker)
+        # Edits from here on can be undone
+        self.state._track()
+        self.tree_model = RequirementTreeModel(self.state)
         self.view = View()
+        self.view.set_tree_model(self.tree_model)
         self.view.button.clicked.connect(self.update_model)
+        # Built on first use, it indexes the whole state
+        self.filter_model = None
+        self.filter_status = None
+        self.view.filter_input.textChanged.connect(self.set_filter_text)
+        # File I/O and parsing run here, never on the UI thread
+        self.pool = QThreadPool.globalInstance()
+        # Running workers, kept referenced until they are done
+        self.workers = set()
+        self.loading = None
+        self.app.aboutToQuit.connect(self.shutdown)
+        # Every edit restarts the timer, a burst of edits saves once
+        self.autosave_timer = QTimer()
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.setInterval(AUTOSAVE_DELAY)
+        self.autosave_timer.timeout.connect(self._autosave)
+        self.autosave_path = None
+        self.autosave_waiting = None
+        self.autosaving = None
+        self.fragments = {}
+        self.dirty = DirtyTracker(self.state, self._on_dirty)
+        # Cache key -> version of each remote file the state was synced from,
+        # what pushes are checked against
+        self.remote_bases = {}
 
     def show_view(self):
         self.view.show()
@@ -18,10 +66,186 @@ class Controller:
         self.model.set_data(new_data)
         self.view.set_label_text(self.model.get_data())
 
+    def load(self, path: str) -> Worker:
+        return self._start_load(Worker(read_file, path))
+
+    def sync(self, file_io: FileIO) -> Worker:
+        return self._start_load(
+            Worker(sync_file, file_io),
+            lambda result: self._on_synced(file_io, result)
+        )
+
+    def save(self, path: str) -> Worker:
+        # The snapshot stays as it is while the worker writes it, edits made
+        # meanwhile go to the next save
+        marks = self.dirty._get_marks()
+        worker = Worker(write_file, self.state.snapshot(), path)
+        return self._start(worker, lambda path: self._on_saved(path, marks))
+
+    def push(self, file_io: FileIO) -> Worker:
+        base = self.remote_bases.get(file_io._get_cache_key())
+        marks = self.dirty._get_marks()
+        worker = Worker(push_file, file_io, self.state.snapshot(), base)
+        return self._start(
+            worker, lambda base: self._on_pushed(file_io, base, marks)
+        )
+
+    def enable_autosave(self, path: str):
+        self.autosave_path = path
+        self.fragments = {}
+        if self.dirty._is_dirty():
+            self._on_dirty()
+
+    def disable_autosave(self):
+        self.autosave_path = None
+        self.autosave_timer.stop()
+
+    def set_filter(self, status: str = None, text: str = ''):
+        self.filter_status = status
+        if status is None and not text.strip():
+            self.view.set_tree_model(self.tree_model)
+            if self.filter_model is not None:
+                self.filter_model._set_filter(None, '')
+            return
+        if self.filter_model is None:
+            self.filter_model = FilterTreeModel(self.state)
+            self.filter_model.filtered.connect(self._on_filtered)
+        self.filter_model._set_filter(status, text)
+        self.view.set_tree_model(self.filter_model)
+
+    def set_filter_text(self, text: str):
+        self.set_filter(self.filter_status, text)
+
+    def cancel(self):
+        for worker in tuple(self.workers):
+            worker._cancel()
+
+    def shutdown(self):
+        self.autosave_timer.stop()
+        self.cancel()
+        self.pool.waitForDone()
+        self.dirty._close()
+        self.state._close()
+        if self.filter_model is not None:
+            self.filter_model.state_index._close()
+            self.filter_model.search_index._close()
+            self.filter_model._close()
+
     def run(self):
         self.show_view()
         sys.exit(self.app.exec())
 
+    def _start_load(self, worker: Worker, on_finished=None) -> Worker:
+        # Only the latest load is merged
+        if self.loading is not None:
+            self.loading._cancel()
+        self.loading = worker
+        return self._start(
+            worker, self._on_loaded if on_finished is None else on_finished
+        )
+
+    def _start(self, worker: Worker, on_finished) -> Worker:
+        signals = worker.signals
+        signals.progress.connect(self.view.set_progress)
+        signals.partial.connect(self._on_partial)
+        signals.finished.connect(
+            lambda result: self._done(worker, on_finished, result)
+        )
+        signals.error.connect(lambda e: self._done(worker, self._on_error, e))
+        signals.cancelled.connect(lambda: self._done(worker, None, None))
+        # The pool must not delete the worker, its signals outlive run()
+        worker.setAutoDelete(False)
+        self.workers.add(worker)
+        self.pool.start(worker)
+        return worker
+
+    def _done(self, worker: Worker, callback, value):
+        self.workers.discard(worker)
+        if self.loading is worker:
+            self.loading = None
+        if self.autosaving is worker:
+            self.autosaving = None
+            # Edits made during the save, or a failed save, go next time
+            if self.dirty._is_dirty():
+                self._on_dirty()
+        if not self.workers:
+            self.view.hide_progress()
+        if callback is not None and not worker._is_cancelled():
+            callback(value)
+
+    def _on_dirty(self):
+        if self.autosave_path is None:
+            return
+        now = time.monotonic()
+        if not self.autosave_timer.isActive():
+            self.autosave_waiting = now
+        elif now - self.autosave_waiting > AUTOSAVE_MAX_WAIT:
+            # Let it fire rather than put the save off forever
+            return
+        self.autosave_timer.start()
+
+    def _autosave(self):
+        if self.autosave_path is None or not self.dirty._is_dirty():
+            return
+        if self.autosaving is not None:
+            # One at a time, the running one restarts the timer when done
+            return
+        marks = self.dirty._get_marks()
+        worker = Worker(
+            write_file, self.state.snapshot(), self.autosave_path,
+            self.fragments
+        )
+        self.autosaving = worker
+        self._start(worker, lambda path: self._on_autosaved(marks))
+
+    def _on_autosaved(self, marks):
+        # The file is on disk, only now is what it holds clean
+        self.dirty._clear(marks)
+
+    def _on_filtered(self, count):
+        self.view.set_label_text(f'{count} matches')
+
+    def _on_partial(self, projects):
+        self.view.set_label_text(f'Read {projects[-1].title}')
+
+    def _on_loaded(self, result):
+        # Runs on the UI thread, the worker already built and checksummed
+        # everything so only the changed projects are swapped in
+        before = self.dirty._get_marks()
+        with self.state._transaction():
+            changed = self.state._merge_projects(
+                result.projects, result.checksums
+            )
+            if result.settings is not None:
+                self.state._set_settings(result.settings)
+        if result.path == self.autosave_path:
+            # What was just read is what the file holds
+            marks = self.dirty._get_marks()
+            self.dirty._clear(dict(
+                (key, mark) for key, mark in marks.items() if key not in before
+            ))
+        self.view.set_label_text(f'Loaded {result.path}, {len(changed)} changed')
+
+    def _on_synced(self, file_io, result):
+        self.remote_bases[file_io._get_cache_key()] = result.base
+        self._on_loaded(result)
+
+    def _on_pushed(self, file_io, base, marks):
+        # Our own push is the version the next one builds on
+        self.remote_bases[file_io._get_cache_key()] = base
+        self._on_saved(file_io.local_path, marks)
+
+    def _on_saved(self, path, marks):
+        if path == self.autosave_path and self.autosaving is None:
+            # The autosave file now holds what was dirty when the snapshot
+            # was taken, no need to write it again. With an autosave still
+            # running it is unknown which write lands last, leave it to that.
+            self.dirty._clear(marks)
+        self.view.set_label_text(f'Saved {path}')
+
+    def _on_error(self, e):
+        self.view.set_label_text(f'Error: {e}')
+
 if __name__ == '__main__':
     controller = Controller()
     controller.run()
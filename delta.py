@@ -0,0 +1,356 @@
+"""rsync style delta encoding of files.
+
+This module only uses the standard library so its own source can be sent to
+the remote server and run there with `python3 -c` to do the remote half of a
+transfer.
+"""
+import hashlib
+import itertools
+import math
+import mmap
+import os
+import struct
+import sys
+
+# Definitions
+MIN_BLOCK_SIZE = 2048
+MAX_BLOCK_SIZE = 131072
+LITERAL_LIMIT = 65536
+MODULUS = 1 << 16
+OP_COPY = b"C"
+OP_DATA = b"D"
+OP_END = b"E"
+SIGNATURE_HEADER = struct.Struct(">IQ")
+SIGNATURE_ENTRY = struct.Struct(">I16s")
+OP_ARGUMENT = struct.Struct(">I")
+# Exit status of the remote half when the file is not the expected version
+CONFLICT_STATUS = 3
+
+class Signature:
+    def __init__(self, block_size: int, basis_size: int, blocks: list) -> None:
+        """Creates an instance of the Signature class which describes the
+           blocks of a basis file so another copy can be encoded against it.
+
+        Args:
+            block_size (int): Size of every block but the last.
+            basis_size (int): Size of the basis file in bytes.
+            blocks (list): (weak, strong) checksum pair of each block.
+        """
+        self.block_size = block_size
+        self.basis_size = basis_size
+        self.blocks = blocks
+
+def block_size_for(size: int) -> int:
+    """Picks a block size for a file, roughly the square root of its size so
+       the signature and the expected literal data stay balanced.
+
+    Args:
+        size (int): Size of the file in bytes.
+
+    Returns:
+        int: Block size in bytes.
+    """
+    block_size = math.isqrt(size) & ~1023
+    return min(max(block_size, MIN_BLOCK_SIZE), MAX_BLOCK_SIZE)
+
+def weak_checksum(block: bytes) -> tuple:
+    """Computes the two halves of the rolling checksum of a block.
+
+    Args:
+        block (bytes): Block to checksum.
+
+    Returns:
+        tuple: (a, b) halves of the checksum.
+    """
+    # The sum of the running sums weighs each byte by its distance from the end
+    return (sum(block) % MODULUS,
+            sum(itertools.accumulate(block)) % MODULUS)
+
+def strong_checksum(block: bytes) -> bytes:
+    """Computes the checksum used to confirm a weak checksum match.
+
+    Args:
+        block (bytes): Block to checksum.
+
+    Returns:
+        bytes: 16 byte digest.
+    """
+    return hashlib.md5(block).digest()
+
+def map_file(handle):
+    """Maps a file into memory read-only.
+
+    Args:
+        handle (io): Binary file handle.
+
+    Returns:
+        mmap.mmap: Mapped file, an empty bytes object for empty files.
+    """
+    if os.fstat(handle.fileno()).st_size == 0:
+        return b""
+    return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+def signature(data, block_size: int = None) -> Signature:
+    """Computes the signature of a basis file.
+
+    Args:
+        data (bytes): Content of the basis file, typically from map_file.
+        block_size (int, optional): Block size to use. Defaults to a size
+                                    picked from the length of the data.
+
+    Returns:
+        Signature: Signature of the data.
+    """
+    if block_size is None:
+        block_size = block_size_for(len(data))
+    blocks = []
+    for offset in range(0, len(data), block_size):
+        block = data[offset:offset + block_size]
+        a, b = weak_checksum(block)
+        blocks.append(((b << 16) | a, strong_checksum(block)))
+    return Signature(block_size, len(data), blocks)
+
+def delta(sig: Signature, data):
+    """Encodes data as copies of basis blocks plus literal bytes.
+
+    Args:
+        sig (Signature): Signature of the basis the receiver holds.
+        data (bytes): Content to encode, typically from map_file.
+
+    Yields:
+        tuple: (OP_COPY, block index) or (OP_DATA, bytes)
+    """
+    block_size = sig.block_size
+    table = {}
+    tail = None
+    for index, (weak, strong) in enumerate(sig.blocks):
+        if index == len(sig.blocks) - 1 and \
+           sig.basis_size % block_size != 0:
+            # The short last block can only ever match the end of the data
+            tail = (index, strong, sig.basis_size % block_size)
+        else:
+            table.setdefault(weak, []).append((index, strong))
+
+    size = len(data)
+    position = 0
+    start = 0
+    a = None
+    while position + block_size <= size:
+        if a is None:
+            a, b = weak_checksum(data[position:position + block_size])
+        candidates = table.get((b << 16) | a)
+        if candidates is not None:
+            strong = strong_checksum(data[position:position + block_size])
+            for index, other in candidates:
+                if other == strong:
+                    yield from _literal(data, start, position)
+                    yield (OP_COPY, index)
+                    position += block_size
+                    start = position
+                    a = None
+                    break
+            if a is None:
+                continue
+        if position + block_size < size:
+            # Roll the window forward by one byte
+            out = data[position]
+            a = (a - out + data[position + block_size]) % MODULUS
+            b = (b - block_size * out + a) % MODULUS
+        position += 1
+
+    if tail is not None and size - start >= tail[2] and \
+       strong_checksum(data[size - tail[2]:size]) == tail[1]:
+        yield from _literal(data, start, size - tail[2])
+        yield (OP_COPY, tail[0])
+    else:
+        yield from _literal(data, start, size)
+
+def _literal(data, start: int, end: int):
+    """Splits a run of unmatched bytes into bounded literal operations.
+
+    Yields:
+        tuple: (OP_DATA, bytes)
+    """
+    for offset in range(start, end, LITERAL_LIMIT):
+        yield (OP_DATA, bytes(data[offset:min(offset + LITERAL_LIMIT, end)]))
+
+def patch(basis, ops, out, block_size: int) -> str:
+    """Rebuilds a file from its basis and a delta.
+
+    Args:
+        basis (io): Seekable binary handle of the basis file.
+        ops (iterable): Operations produced by delta.
+        out (io): Binary handle to write the rebuilt file to.
+        block_size (int): Block size of the signature the delta used.
+
+    Returns:
+        str: Checksum of the rebuilt file.
+    """
+    digest = hashlib.md5()
+    for op, argument in ops:
+        if op == OP_COPY:
+            basis.seek(argument * block_size)
+            chunk = basis.read(block_size)
+        else:
+            chunk = argument
+        digest.update(chunk)
+        out.write(chunk)
+    return digest.hexdigest()
+
+############
+#   Wire format
+############
+def write_signature(stream, sig: Signature) -> None:
+    """Serializes a signature.
+
+    Args:
+        stream (io): Binary stream to write to.
+        sig (Signature): Signature to write.
+    """
+    stream.write(SIGNATURE_HEADER.pack(sig.block_size, sig.basis_size))
+    stream.write(b"".join(
+        SIGNATURE_ENTRY.pack(weak, strong) for weak, strong in sig.blocks
+    ))
+
+def read_signature(stream) -> Signature:
+    """Deserializes a signature written by write_signature.
+
+    Args:
+        stream (io): Binary stream to read from.
+
+    Returns:
+        Signature: The signature.
+    """
+    block_size, basis_size = SIGNATURE_HEADER.unpack(
+        _read_exact(stream, SIGNATURE_HEADER.size)
+    )
+    count = math.ceil(basis_size / block_size)
+    raw = _read_exact(stream, count * SIGNATURE_ENTRY.size)
+    return Signature(
+        block_size, basis_size, list(SIGNATURE_ENTRY.iter_unpack(raw))
+    )
+
+def write_delta(stream, ops) -> int:
+    """Serializes a delta as it is produced.
+
+    Args:
+        stream (io): Binary stream to write to.
+        ops (iterable): Operations produced by delta.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    written = 0
+    for op, argument in ops:
+        if op == OP_COPY:
+            frame = OP_COPY + OP_ARGUMENT.pack(argument)
+        else:
+            frame = OP_DATA + OP_ARGUMENT.pack(len(argument)) + argument
+        stream.write(frame)
+        written += len(frame)
+    stream.write(OP_END)
+    return written + len(OP_END)
+
+def read_delta(stream):
+    """Deserializes a delta written by write_delta.
+
+    Args:
+        stream (io): Binary stream to read from.
+
+    Yields:
+        tuple: (OP_COPY, block index) or (OP_DATA, bytes)
+    """
+    while True:
+        op = _read_exact(stream, 1)
+        if op == OP_END:
+            return
+        argument, = OP_ARGUMENT.unpack(_read_exact(stream, OP_ARGUMENT.size))
+        if op == OP_COPY:
+            yield (OP_COPY, argument)
+        elif op == OP_DATA:
+            yield (OP_DATA, _read_exact(stream, argument))
+        else:
+            raise ValueError(f"Corrupt delta stream, unknown operation {op}")
+
+def _read_exact(stream, size: int) -> bytes:
+    """Reads exactly size bytes from a stream.
+
+    Raises:
+        EOFError: If the stream ended early.
+    """
+    chunks = []
+    while size > 0:
+        chunk = stream.read(size)
+        if not chunk:
+            raise EOFError("Delta stream ended early")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+############
+#   Remote half
+############
+def _main(argv: list) -> int:
+    """Runs the remote half of a transfer over stdin/stdout.
+
+       signature PATH: writes the signature of PATH.
+       delta PATH: reads a signature, writes the delta of PATH against it.
+       patch PATH [DIGEST]: reads a delta against PATH and atomically
+                   replaces PATH with the result, then writes its checksum.
+                   If PATH does not have the checksum DIGEST it is left as
+                   it is and the exit status is CONFLICT_STATUS.
+
+    Args:
+        argv (list): mode, path and for patch the expected checksum.
+
+    Returns:
+        int: Exit status.
+    """
+    mode, path = argv[0], argv[1]
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    if mode == "signature":
+        with open(path, "rb") as f:
+            write_signature(stdout, signature(map_file(f)))
+    elif mode == "delta":
+        sig = read_signature(stdin)
+        with open(path, "rb") as f:
+            write_delta(stdout, delta(sig, map_file(f)))
+    elif mode == "patch":
+        expected = argv[2] if len(argv) > 2 else None
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(path, "rb") as basis:
+            if expected is not None:
+                # Checked on the file that gets patched, a writer that came
+                # in since the client's own check is not overwritten
+                current = hashlib.md5()
+                for chunk in iter(lambda: basis.read(LITERAL_LIMIT), b""):
+                    current.update(chunk)
+                if current.hexdigest() != expected:
+                    while stdin.read(LITERAL_LIMIT):
+                        pass
+                    sys.stderr.write(f"{path} was changed by someone else\n")
+                    return CONFLICT_STATUS
+            sig_block_size, = OP_ARGUMENT.unpack(
+                _read_exact(stdin, OP_ARGUMENT.size)
+            )
+            try:
+                with open(temp_path, "wb") as out:
+                    digest = patch(
+                        basis, read_delta(stdin), out, sig_block_size
+                    )
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        stdout.write(digest.encode("ascii"))
+    else:
+        sys.stderr.write(f"Unknown mode {mode}\n")
+        return 2
+    stdout.flush()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -1,21 +1,45 @@
+# Definitions
+# Name, fields and key of the children of each level, as the functions below
+# write them. What reads the files without the model (cli) goes by these.
+LEVELS = (
+    ("Project", ("title", "description"), "requirements"),
+    ("Requirement", ("title", "description", "status"),
+     "system_requirements"),
+    ("SystemRequirement", ("title", "description", "status"),
+     "high_level_requirements"),
+    ("HighLevel", ("title", "description", "status"),
+     "low_level_requirements"),
+    ("LowLevel", ("title", "description", "status", "comments", "trace",
+                  "code_comments"), None)
+)
+
 def dictionify(obj) -> dict:
-    from project import Project
-    from requirement import Requirement
-    from hl import HighLevel
-    from ll import LowLevel
     """Helper to call the dictionary creation functions.
 
     Returns:
         dict: dictionary of the passed in object.
     """
-    if isinstance(obj, Project):
-        return dictionary_project(obj)
-    elif isinstance(obj, Requirement):
-        return dictionary_requirement(obj)
-    elif isinstance(obj, HighLevel):
-        return dictionary_high_level(obj)
-    elif isinstance(obj, LowLevel):
-        return dictionary_low_level(obj)
+    if type(obj).__name__ == "PersistentNode":
+        # Snapshot nodes read like the model objects of the same level
+        return DICTIONARY_FUNCTIONS[obj.kind](obj)
+    function = _dispatch.get(type(obj))
+    if function is None:
+        function = _find_function(type(obj))
+    if function is None:
+        return None
+    return function(obj)
+
+def _find_function(cls):
+    """Finds the dictionary function of a class or of the model class it
+       derives from, by name so the model modules (which import this one
+       through checksum) need not be imported here.
+    """
+    for base in cls.__mro__:
+        function = DICTIONARY_FUNCTIONS.get(base.__name__)
+        if function is not None:
+            _dispatch[cls] = function
+            return function
+    return None
 
 def dictionary_project(project) -> dict:
         """Creates a dictionary of a project object.
@@ -116,4 +140,16 @@ def dictionary_low_level(low_level) -> dict:
         "comments" : low_level.comment,
         "trace" : low_level.trace,
         "code_comments" : low_level.code_reference
-    }
\ No newline at end of file
+    }
+
+# Class name to the function making its dictionary, below the functions it
+# refers to
+DICTIONARY_FUNCTIONS = {
+    "Project" : dictionary_project,
+    "Requirement" : dictionary_requirement,
+    "SystemRequirement" : dictionary_sys_requirement,
+    "HighLevel" : dictionary_high_level,
+    "LowLevel" : dictionary_low_level
+}
+# Class to its function, filled in as classes are seen
+_dispatch = {}
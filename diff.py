@@ -1,3 +1,5 @@
+from dictionify import dictionify
+
 def diff(obj1, obj2):
     """Diffs between two objects.
 
@@ -8,7 +10,6 @@ def diff(obj1, obj2):
     Returns:
         obj: A dictionary of the changes or None.
     """
-    from dictionify import dictionify
     if isinstance(obj1, dict) and isinstance(obj2, dict):
         return diff_dicts(obj1, obj2)
     elif isinstance(obj1, list) and isinstance(obj2, list):
@@ -44,7 +45,6 @@ def diff_dicts(dict1: dict, dict2: dict):
     return diff_result
 
 def diff_lists(list1: list, list2: list):
-    from dictionify import dictionify
     """Diffs two lists.
 
     Args:
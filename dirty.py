@@ -0,0 +1,94 @@
+from state import State
+from events import subscribe, unsubscribe, CHILDREN
+
+class DirtyTracker:
+    def __init__(self, state: State, on_dirty=None) -> None:
+        """Creates an instance of the DirtyTracker class which records which
+           projects changed since they were last saved, from the changes made
+           through the model setters.
+
+        Args:
+            state (State): Program state to follow.
+            on_dirty (callable, optional): Called with no arguments after each
+                                           batch that dirtied something.
+        """
+        self.state = state
+        self.on_dirty = on_dirty
+        # id(project) -> (project, mark), id(state) for the projects list
+        self.marks = {}
+        self.counter = 0
+        subscribe(self._on_change)
+
+    ############
+    #   Getters
+    ############
+    def _is_dirty(self) -> bool:
+        """Checks if anything changed since the last save.
+
+        Returns:
+            bool: True if there is something to save, false otherwise.
+        """
+        return bool(self.marks)
+
+    def _get_marks(self) -> dict:
+        """Gets what is dirty now, to hand to _clear once it is saved.
+
+        Returns:
+            dict: Key to mark of everything dirty.
+        """
+        return dict((key, mark) for key, (_, mark) in self.marks.items())
+
+    ############
+    #   Helpers
+    ############
+    def _close(self) -> None:
+        """Stops following changes to the program state.
+        """
+        unsubscribe(self._on_change)
+
+    def _mark(self, node) -> None:
+        """Marks a project, or the State for its list of projects, dirty.
+        """
+        self.counter += 1
+        self.marks[id(node)] = (node, self.counter)
+
+    def _clear(self, marks: dict) -> None:
+        """Clears what was saved. Anything changed again since marks was taken
+           stays dirty.
+
+        Args:
+            marks (dict): What _get_marks returned before the save.
+        """
+        for key, mark in marks.items():
+            current = self.marks.get(key)
+            if current is not None and current[1] == mark:
+                del self.marks[key]
+
+    def _project_of(self, node):
+        """Gets the project a node belongs to, None if it is not in the
+           program state.
+        """
+        while node is not None and node.parent is not self.state:
+            node = node.parent
+        return node
+
+    def _on_change(self, events: list) -> None:
+        """Marks the projects a batch of changes touched.
+        """
+        before = self.counter
+        for event in events:
+            node = event.node
+            if node is self.state:
+                if event.field == CHILDREN:
+                    self._mark(self.state)
+                    # Saving the list of projects covers removed ones
+                    for project in event.old:
+                        self.marks.pop(id(project), None)
+                    for project in event.new:
+                        self._mark(project)
+                continue
+            project = self._project_of(node)
+            if project is not None:
+                self._mark(project)
+        if self.counter != before and self.on_dirty is not None:
+            self.on_dirty()
@@ -0,0 +1,207 @@
+import threading
+from contextlib import contextmanager
+
+from rollup import move_children, move_status
+
+# Definitions
+CHILDREN = "children"
+
+_subscribers = []
+# Open transactions of each thread and the events they hold back
+_batches = threading.local()
+# Transactions open in any thread, they record changes even when nobody is
+# subscribed so they can be rolled back
+_open_transactions = 0
+_open_lock = threading.Lock()
+
+class ChangeEvent:
+    def __init__(
+        self, node, field: str, old, new,
+        index: int = None, previous: list = None) -> None:
+        """Creates an instance of the ChangeEvent class which describes one
+           change made through the model setters.
+
+        Args:
+            node (unknown): Object that changed.
+            field (str): Attribute that changed, or CHILDREN.
+            old (unknown): Value before the change. For CHILDREN the list of
+                           removed children.
+            new (unknown): Value after the change. For CHILDREN the list of
+                           added children.
+            index (int, optional): Where a single child was inserted or
+                                   removed, else None.
+            previous (list, optional): For CHILDREN changes without an index,
+                                       every child before the change.
+                                       Defaults to old.
+        """
+        self.node = node
+        # Worked out on first use, see _get_path
+        self.path = None
+        self.field = field
+        self.old = old
+        self.new = new
+        self.index = index
+        self.previous = previous
+        if previous is None and field == CHILDREN and index is None:
+            self.previous = old
+
+    ############
+    #   Getters
+    ############
+    def _get_path(self) -> tuple:
+        """Gets the child indexes leading from the top of the tree down to the
+           node. Only worked out when asked for, so it is where the node sat
+           once its batch was dispatched.
+
+        Returns:
+            tuple: Indexes, empty for the top of the tree.
+        """
+        if self.path is None:
+            self.path = node_path(self.node)
+        return self.path
+
+    def __repr__(self) -> str:
+        return (f"ChangeEvent({type(self.node).__name__}, "
+                f"{self.field!r}, {self.old!r}, {self.new!r}, {self.index})")
+
+def node_path(node) -> tuple:
+    """Gets the child indexes leading from the top of the tree down to a node.
+
+    Args:
+        node (unknown): Any object of the requirements hierarchy.
+
+    Returns:
+        tuple: Indexes, empty for the top of the tree.
+    """
+    path = []
+    parent = node.parent
+    while parent is not None:
+        for i, child in enumerate(parent._get_children()):
+            if child is node:
+                path.append(i)
+                break
+        node = parent
+        parent = node.parent
+    path.reverse()
+    return tuple(path)
+
+def subscribe(callback) -> None:
+    """Registers a callback for every change made through the model setters.
+
+    Args:
+        callback (callable): Called with a list of ChangeEvent, one per change
+                             of a transaction or a single one outside of any.
+    """
+    _subscribers.append(callback)
+
+def unsubscribe(callback) -> None:
+    """Removes a callback registered with subscribe.
+
+    Args:
+        callback (callable): Callback to remove.
+    """
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+def dispatch(events: list) -> None:
+    """Hands a batch of events to every subscriber.
+
+    Args:
+        events (list[ChangeEvent]): Changes in the order they were made.
+    """
+    if not events:
+        return
+    for callback in tuple(_subscribers):
+        callback(events)
+
+def emit(
+    node, field: str, old, new, index: int = None,
+    previous: list = None) -> None:
+    """Tells every subscriber that a node changed, or holds the change back
+       until the open transaction ends. Costs a single check when nobody is
+       subscribed.
+
+    Args:
+        node (unknown): Object that changed.
+        field (str): Attribute that changed, or CHILDREN.
+        old (unknown): Value before the change.
+        new (unknown): Value after the change.
+        index (int, optional): Position of an inserted or removed child.
+        previous (list, optional): Every child before a CHILDREN change made
+                                   without an index, if old is not that.
+    """
+    if not _subscribers and not _open_transactions:
+        return
+    if field != CHILDREN and old == new:
+        return
+    event = ChangeEvent(node, field, old, new, index, previous)
+    pending = getattr(_batches, "pending", None)
+    if pending is not None:
+        pending.append(event)
+    else:
+        dispatch([event])
+
+@contextmanager
+def transaction():
+    """Groups the changes made inside the block into one batch handed to the
+       subscribers when the outermost block ends, even if it raised.
+
+    Yields:
+        list[ChangeEvent]: Events collected so far by the outermost block.
+    """
+    global _open_transactions
+    pending = getattr(_batches, "pending", None)
+    if pending is not None:
+        # Nested, the outermost block dispatches
+        yield pending
+        return
+    pending = _batches.pending = []
+    with _open_lock:
+        _open_transactions += 1
+    try:
+        yield pending
+    finally:
+        with _open_lock:
+            _open_transactions -= 1
+        _batches.pending = None
+        dispatch(pending)
+
+def rollback(events: list) -> None:
+    """Undoes changes by applying their inverse, newest first. Nothing is
+       emitted, the caller drops the events instead, but rollups are kept
+       right.
+
+    Args:
+        events (list[ChangeEvent]): Changes in the order they were made.
+    """
+    for event in reversed(events):
+        node = event.node
+        if event.field == "status":
+            move_status(node, node.status, event.old)
+            node.status = event.old
+            continue
+        if event.field != CHILDREN:
+            setattr(node, event.field, event.old)
+            continue
+        children = node._get_children()
+        if event.index is not None:
+            for child in event.new:
+                children.pop(event.index)
+                child.parent = None
+                move_children(node, [child], [])
+            for child in event.old:
+                children.insert(event.index, child)
+                child.parent = node
+                move_children(node, [], [child])
+            continue
+        # Restore the whole list, in place so holders of it see the change
+        restored = set(id(child) for child in event.previous)
+        current = set(id(child) for child in children)
+        dropped = [c for c in children if id(c) not in restored]
+        returned = [c for c in event.previous if id(c) not in current]
+        for child in dropped:
+            child.parent = None
+        children[:] = event.previous
+        for child in children:
+            child.parent = node
+        move_children(node, dropped, returned)
@@ -5,4 +5,68 @@ class SpecTrakException(Exception):
         Exception (Exception): Used to stop the program and notify a
         catastrophic failure.
     """
-    pass
\ No newline at end of file
+    pass
+
+class RemoteException(SpecTrakException):
+    """Remote Exception
+
+    Args:
+        SpecTrakException (SpecTrakException): Used when an operation on the
+        remote server fails.
+    """
+    pass
+
+class RemoteConflictException(RemoteException):
+    """Remote Conflict Exception
+
+    Args:
+        RemoteException (RemoteException): Used when the remote file changed
+        since the version an edit was based on, so writing would overwrite
+        someone else's save.
+    """
+    pass
+
+class RemoteConnectionException(RemoteException):
+    """Remote Connection Exception
+
+    Args:
+        RemoteException (RemoteException): Used when the server could not be
+        reached or the connection to it dropped.
+    """
+    pass
+
+class RemoteAuthenticationException(RemoteException):
+    """Remote Authentication Exception
+
+    Args:
+        RemoteException (RemoteException): Used when the server rejected the
+        credentials.
+    """
+    pass
+
+class RemoteTimeoutException(RemoteException):
+    """Remote Timeout Exception
+
+    Args:
+        RemoteException (RemoteException): Used when the server did not answer
+        in time.
+    """
+    pass
+
+class RemoteFileException(RemoteException):
+    """Remote File Exception
+
+    Args:
+        RemoteException (RemoteException): Used when the remote file could not
+        be read or written, e.g. it does not exist.
+    """
+    pass
+
+class CancelledException(SpecTrakException):
+    """Cancelled Exception
+
+    Args:
+        SpecTrakException (SpecTrakException): Used when a background task
+        stops early because it was cancelled.
+    """
+    pass
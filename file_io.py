@@ -1,15 +1,50 @@
-import paramiko
+import hashlib
+import inspect
+import shlex
+import shutil
 import socket
 import tempfile
+import uuid
 import os
 
+import delta
+from lazy import load_module
+from checksum import file_checksum
+from exception import RemoteConflictException
+from ssh_pool import SESSION_POOL, SessionPool, CONNECT_TIMEOUT
+from remote_cache import REMOTE_CACHE, RemoteCache, CacheEntry
+
+# Definitions
+CHUNK_SIZE = 1048576
+MAX_REQUESTS = 64
+TRANSFER_RETRIES = 3
+
+# Imported by _load_paramiko once a session is first opened, reading local
+# files does not need it
+paramiko = None
+
+def _load_paramiko() -> None:
+    """Imports paramiko, code that never connects does not pay for it. Call
+       it before any try whose except clauses name paramiko's exceptions,
+       they are looked up when an error is raised and paramiko may not be
+       loaded yet.
+    """
+    global paramiko
+    if paramiko is None:
+        paramiko = load_module("paramiko")
+
 class FileIO:
     def __init__(
         self, username: str, password: str,
         private_key_path: str, remote_path: str,
         server_ip: str, server_port: int,
-        local_path: str) -> None:
-        """Creates an instance of the FileIO class.
+        local_path: str, pool: SessionPool = None,
+        cache: RemoteCache = None, timeout: int = CONNECT_TIMEOUT) -> None:
+        """Creates an instance of the FileIO class. Fetching a changed file
+           and pushing an edit send only the blocks that differ when the
+           server lets the SSH user run commands and has python3 on its path,
+           see _exec_delta_helper. Otherwise, or if the delta transfer fails
+           for any other reason, the whole file is transferred over SFTP.
 
         Args:
             username (str): username of the remote server.
@@ -19,6 +54,12 @@ class FileIO:
             server_ip (str): ip of server
             server_port (int): port to access
             local_path (str): file path to local file
+            pool (SessionPool, optional): pool to take SSH/SFTP sessions from.
+                                          Defaults to the shared pool.
+            cache (RemoteCache, optional): cache of fetched remote files.
+                                           Defaults to the shared cache.
+            timeout (int, optional): seconds to wait on the server before
+                                     giving up. Defaults to CONNECT_TIMEOUT.
         """
         self.username = username
         self.password = password
@@ -32,6 +73,12 @@ class FileIO:
         self.temp_file_handle = None
         self.sftp_session = None
         self.ssh_session = None
+        self.lease = None
+        # Timeout of the operation in progress, kept across reconnects
+        self.session_timeout = timeout
+        self.pool = SESSION_POOL if pool is None else pool
+        self.cache = REMOTE_CACHE if cache is None else cache
+        self.timeout = timeout
 
     def _ping_check(self, timeout: int) -> bool:
         """Checks to see if server is online.
@@ -50,49 +97,588 @@ class FileIO:
             except (socket.timeout, socket.error):
                 return False
 
+    def _get_pool_key(self) -> tuple:
+        """Gets the key identifying this server and user in the session pool.
+
+        Returns:
+            tuple: (server, port, user)
+        """
+        return (self.server_ip, self.server_port, self.username)
+
+    def _open_sessions(self, timeout: float = None) -> bool:
+        """Points the object at a lease on a live pooled SSH/SFTP session,
+           connecting only when the pool has no healthy session for the
+           server. A lease the object already holds is kept while it is alive.
+
+        Args:
+            timeout (float, optional): Seconds each request may wait on the
+                                       server. Defaults to the timeout of the
+                                       object.
+
+        Raises:
+            paramiko.SSHException: If a new connection could not be made.
+
+        Returns:
+            bool: False if the server did not answer the ping, true otherwise.
+        """
+        # First, the callers catch its exceptions
+        _load_paramiko()
+        if timeout is None:
+            timeout = self.timeout
+        self.session_timeout = timeout
+        if self.lease is not None:
+            if self.lease._is_alive():
+                self.lease._set_timeout(timeout)
+                return True
+            self._close_sessions()
+        lease = self.pool._get_live_session(self._get_pool_key(), timeout)
+        if lease is None:
+            # Only pay for the ping round trip when we have to reconnect
+            if self._ping_check(min(2, timeout)) is False:
+                return False
+            lease = self.pool._get_session(
+                self.server_ip, self.server_port, self.username,
+                self.password, self.private_key_path, timeout
+            )
+        self.lease = lease
+        self.ssh_session = lease.ssh_session
+        self.sftp_session = lease.sftp_session
+        return True
+
     def _get_remote_file_handle(self):
         """Gets a remote file handle for the remote file.
         """
-        # Check to make sure the server is online
-        if self._ping_check(2) is False:
-            print(f"ERR: Server ping timeout! Server unavailable...")
+        _load_paramiko()
+        try:
+            if self._open_sessions() is False:
+                print(f"ERR: Server ping timeout! Server unavailable...")
+                return
+            self.remote_file_handle = self.sftp_session.open(
+                self.remote_path, "r"
+                )
             return
+        except paramiko.AuthenticationException:
+            print("Authentication failed, please verify your credentials")
+            self._close_sessions()
+        except paramiko.BadHostKeyException as badHostKeyException:
+            print(f"Unable to verify server's host key: {badHostKeyException}")
+            self._close_sessions()
+        except paramiko.SSHException as sshException:
+            print(f"Unable to establish SSH connection: {sshException}")
+            self._close_sessions()
+        except Exception as e:
+            print(f"Operation error: {e}")
+            self._close_sessions()
+
+    def _require_sessions(self, timeout: float = None) -> None:
+        """Same as _open_sessions but treats an offline server as an error.
 
-        self.ssh_session = paramiko.SSHClient()
-        self.ssh_session.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        Args:
+            timeout (float, optional): See _open_sessions.
+
+        Raises:
+            ConnectionError: If the server did not answer the ping.
+        """
+        if self._open_sessions(timeout) is False:
+            raise ConnectionError("Server ping timeout! Server unavailable...")
+
+    def _get_cache_key(self) -> str:
+        """Gets the key of the remote file in the cache.
+
+        Returns:
+            str: Cache key.
+        """
+        return self.cache._get_key(
+            self.server_ip, self.server_port, self.remote_path
+        )
+
+    def _stat_remote_file(self):
+        """Gets the metadata of the remote file in one SFTP round trip.
+
+        Returns:
+            paramiko.SFTPAttributes: size, mtime, etc. of the remote file.
+        """
+        _load_paramiko()
         try:
-            if self.private_key_path is None:
-                self.ssh_session.connect(
-                    hostname=self.server_ip,
-                    username=self.username,
-                    password=self.password,
-                    port=self.server_port
-                )
-            else:
-                private_key = paramiko.RSAKey.from_private_key_file(
-                    os.path.abspath(self.private_key_path)
-                )
-                self.ssh_session.connect(
-                    hostname=self.server_ip,
-                    username=self.username,
-                    pkey=private_key,
-                    port=self.server_port
+            return self.sftp_session.stat(self.remote_path)
+        except (FileNotFoundError, PermissionError):
+            raise
+        except (OSError, EOFError, paramiko.SSHException):
+            # The pooled session died after passing its health check, this is
+            # the first request of every operation so reconnect once here
+            self._close_sessions()
+            self._require_sessions(self.session_timeout)
+            return self.sftp_session.stat(self.remote_path)
+
+    def _fetch_remote_file(self, progress=None, timeout: float = None) -> str:
+        """Brings the cached local copy of the remote file up to date. The
+           remote file is only downloaded when its size or mtime differ from
+           the cached copy, so an unchanged file costs one stat, plus reading
+           it back if it was fetched within its mtime's granularity (see
+           CacheEntry._is_racy).
+
+        Args:
+            progress (callable, optional): Called with (bytes done, total)
+                                           during a full download.
+            timeout (float, optional): Seconds each request may wait on the
+                                       server, the object's timeout if None.
+
+        Raises:
+            ConnectionError: If the server did not answer the ping.
+            paramiko.SSHException: If the connection failed.
+            IOError: If the remote file could not be read.
+
+        Returns:
+            str: Path of the up to date local copy.
+        """
+        return self._fetch_remote_version(progress, timeout).local_path
+
+    def _fetch_remote_version(
+        self, progress=None, timeout: float = None) -> CacheEntry:
+        """Same as _fetch_remote_file but also tells which version of the
+           remote file was fetched. Keep it as the base of edits made to what
+           was read and hand it to _upload_file or _push_local_file, the
+           shared cache moves on whenever anyone fetches a newer version.
+
+        Args:
+            progress (callable, optional): Called with (bytes done, total)
+                                           during a full download.
+            timeout (float, optional): See _fetch_remote_file.
+
+        Returns:
+            CacheEntry: Version fetched, with the path of the local copy.
+        """
+        self._require_sessions(timeout)
+        attributes = self._stat_remote_file()
+        key = self._get_cache_key()
+        local_path = self.cache._get_local_path(key)
+        entry = self.cache._get_entry(key)
+        if entry is not None and \
+           entry._matches(attributes, self._remote_checksum):
+            if entry._is_racy():
+                # Read back now, a later fetch can go by the stat alone
+                entry = self.cache._store(
+                    key, entry.size, entry.mtime, entry.digest
                 )
+            return entry
+        if entry is not None:
+            # A stale copy is still a good basis for a delta transfer
+            try:
+                digest = self._delta_download(local_path)
+            except (OSError, EOFError, ValueError, paramiko.SSHException):
+                digest = self._download_remote_file(local_path, progress)
+        else:
+            digest = self._download_remote_file(local_path, progress)
+        return self.cache._store(
+            key, attributes.st_size, attributes.st_mtime, digest
+        )
 
-            self.sftp_session = self.ssh_session.open_sftp()
-            self.remote_file_handle = self.sftp_session.open(
-                self.remote_path, "r"
+    def _download_remote_file(self, local_path: str, progress=None) -> str:
+        """Downloads the whole remote file, replacing the local file only once
+           the download finished.
+
+        Args:
+            local_path (str): Where to save the remote file.
+            progress (callable, optional): Called with (bytes done, total).
+
+        Returns:
+            str: Checksum of the downloaded content.
+        """
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        local, part_path = self._open_part_file(local_path)
+        try:
+            with local:
+                digest = self._transfer_remote_file(local, progress)
+            os.replace(part_path, local_path)
+        finally:
+            self._remove_part_file(part_path)
+        return digest
+
+    def _open_part_file(self, local_path: str) -> tuple:
+        """Creates a uniquely named file next to a local file to write its new
+           content to, so concurrent fetches of the same file never share one.
+
+        Args:
+            local_path (str): File the content is meant for.
+
+        Returns:
+            tuple: (binary handle, path) of the new file.
+        """
+        fd, part_path = tempfile.mkstemp(
+            suffix=".part", prefix=os.path.basename(local_path) + ".",
+            dir=os.path.dirname(local_path)
+        )
+        return os.fdopen(fd, "wb"), part_path
+
+    def _remove_part_file(self, part_path: str) -> None:
+        """Removes a file made by _open_part_file that was not moved into
+           place, e.g. after a failed transfer.
+        """
+        try:
+            os.remove(part_path)
+        except FileNotFoundError:
+            pass
+
+    def _transfer_remote_file(
+        self, out, progress=None, retries: int = TRANSFER_RETRIES) -> str:
+        """Streams the remote file into a local binary handle. Reads are
+           prefetched with many requests in flight so the transfer is bound by
+           bandwidth rather than round trips, and a dropped connection resumes
+           from the last byte written.
+
+        Args:
+            out (io): Binary handle to write to, positioned at its start.
+            progress (callable, optional): Called with (bytes done, total).
+            retries (int, optional): Reconnects allowed before giving up.
+                                     Defaults to TRANSFER_RETRIES.
+
+        Raises:
+            paramiko.SSHException: If the connection failed for good.
+            IOError: If the remote file could not be read.
+
+        Returns:
+            str: Checksum of the transferred content.
+        """
+        _load_paramiko()
+        attributes = self._stat_remote_file()
+        digest = hashlib.md5()
+        offset = 0
+        attempt = 0
+        while True:
+            try:
+                with self.sftp_session.open(self.remote_path, "rb") as remote:
+                    remote.seek(offset)
+                    remote.prefetch(attributes.st_size, MAX_REQUESTS)
+                    while offset < attributes.st_size:
+                        chunk = remote.read(
+                            min(CHUNK_SIZE, attributes.st_size - offset)
+                        )
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        digest.update(chunk)
+                        offset += len(chunk)
+                        if progress is not None:
+                            progress(offset, attributes.st_size)
+                return digest.hexdigest()
+            except (socket.timeout, ConnectionError, EOFError,
+                    paramiko.SSHException):
+                # Only a dropped or stalled connection is worth a retry, a
+                # local write error or a missing file would fail again
+                attempt += 1
+                if attempt > retries:
+                    raise
+                self._close_sessions()
+                self._require_sessions(self.session_timeout)
+                current = self._stat_remote_file()
+                if (current.st_size != attributes.st_size or
+                    current.st_mtime != attributes.st_mtime):
+                    # The file changed while we were away, start over
+                    attributes = current
+                    out.seek(0)
+                    out.truncate()
+                    digest = hashlib.md5()
+                    offset = 0
+
+    def _exec_delta_helper(self, mode: str, *args):
+        """Starts the remote half of a delta transfer on the server, the
+           source of the delta module run by python3 through an SSH exec
+           channel.
+
+        Args:
+            mode (str): "signature", "delta" or "patch", see delta._main.
+            args (str): Further arguments of the mode.
+
+        Returns:
+            tuple: stdin, stdout and stderr of the remote helper.
+        """
+        command = " ".join(shlex.quote(arg) for arg in [
+            "python3", "-c", inspect.getsource(delta), mode, self.remote_path,
+            *args
+        ])
+        return self.ssh_session.exec_command(command)
+
+    def _check_delta_helper(self, stdout, stderr) -> None:
+        """Waits for the remote helper to exit and checks it succeeded.
+
+        Raises:
+            RemoteConflictException: If the file to patch was not the
+                                     expected version.
+            IOError: If the helper failed, e.g. python3 is not on the server.
+        """
+        status = stdout.channel.recv_exit_status()
+        if status == delta.CONFLICT_STATUS:
+            raise RemoteConflictException(
+                f"{self.remote_path} was changed by someone else"
+            )
+        if status != 0:
+            raise IOError(
+                f"Remote delta helper failed: {stderr.read().decode(errors='replace')}"
+            )
+
+    def _delta_download(self, local_path: str) -> str:
+        """Updates a stale local copy of the remote file by fetching only the
+           blocks that differ from it.
+
+        Args:
+            local_path (str): Local copy to update in place.
+
+        Raises:
+            IOError: If the server cannot run the remote half of the transfer.
+
+        Returns:
+            str: Checksum of the updated content.
+        """
+        with open(local_path, "rb") as basis:
+            data = delta.map_file(basis)
+            sig = delta.signature(data)
+            if data:
+                data.close()
+            stdin, stdout, stderr = self._exec_delta_helper("delta")
+            delta.write_signature(stdin, sig)
+            stdin.flush()
+            stdin.channel.shutdown_write()
+            out, part_path = self._open_part_file(local_path)
+            try:
+                with out:
+                    digest = delta.patch(
+                        basis, delta.read_delta(stdout), out, sig.block_size
+                    )
+                self._check_delta_helper(stdout, stderr)
+                os.replace(part_path, local_path)
+            finally:
+                self._remove_part_file(part_path)
+        return digest
+
+    def _delta_upload(self, local_path: str, base: CacheEntry) -> str:
+        """Updates the remote file from a local file by sending only the blocks
+           the remote file does not already have. The server checks the file
+           it patches is still the base version and swaps the new file into
+           place atomically.
+
+        Args:
+            local_path (str): Local file to upload.
+            base (CacheEntry): Version the edit was based on.
+
+        Raises:
+            RemoteConflictException: If someone else changed the remote file.
+            IOError: If the server cannot run the remote half of the transfer
+                     or the result does not match the local file.
+
+        Returns:
+            str: Checksum of the uploaded content.
+        """
+        stdin, stdout, stderr = self._exec_delta_helper("signature")
+        sig = delta.read_signature(stdout)
+        self._check_delta_helper(stdout, stderr)
+        with open(local_path, "rb") as f:
+            data = delta.map_file(f)
+            stdin, stdout, stderr = self._exec_delta_helper(
+                "patch", base.digest
+            )
+            stdin.write(delta.OP_ARGUMENT.pack(sig.block_size))
+            delta.write_delta(stdin, delta.delta(sig, data))
+            stdin.flush()
+            stdin.channel.shutdown_write()
+            remote_digest = stdout.read().decode("ascii")
+            self._check_delta_helper(stdout, stderr)
+            if data:
+                data.close()
+        digest = file_checksum(local_path)
+        if remote_digest != digest:
+            raise IOError("Remote file does not match after delta upload")
+        return digest
+
+    def _remote_checksum(self) -> str:
+        """Computes the checksum of the remote file by streaming it.
+
+        Returns:
+            str: Checksum of the remote content.
+        """
+        digest = hashlib.md5()
+        with self.sftp_session.open(self.remote_path, "rb") as remote:
+            remote.prefetch(None, MAX_REQUESTS)
+            for chunk in iter(lambda: remote.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _check_remote_base(self, base: CacheEntry) -> None:
+        """Checks the remote file is still the version an edit was based on.
+           A stat is enough unless the mtime moved without a size change, or
+           did not move but cannot be trusted (see CacheEntry._is_racy), in
+           which case the content checksum decides.
+
+        Args:
+            base (CacheEntry): What the remote file looked like when fetched,
+                               None if it should not exist yet.
+
+        Raises:
+            RemoteConflictException: If the remote file was changed, created
+                                     or removed by someone else.
+        """
+        try:
+            attributes = self._stat_remote_file()
+        except FileNotFoundError:
+            attributes = None
+        if base is None:
+            if attributes is not None:
+                raise RemoteConflictException(
+                    f"{self.remote_path} was created by someone else"
                 )
             return
+        if attributes is None:
+            raise RemoteConflictException(
+                f"{self.remote_path} was removed by someone else"
+            )
+        if base._matches(attributes, self._remote_checksum):
+            return
+        if (attributes.st_size == base.size and
+            attributes.st_mtime != base.mtime and
+            self._remote_checksum() == base.digest):
+            return
+        raise RemoteConflictException(
+            f"{self.remote_path} was changed by someone else"
+        )
+
+    def _replace_remote_file(
+        self, local_path: str, base: CacheEntry, progress=None) -> str:
+        """Streams the local file to a temporary remote path with pipelined
+           writes, then renames it over the remote file if nobody changed the
+           remote file in the meantime. No partial file is ever left behind.
+
+        Args:
+            local_path (str): Local file to upload.
+            base (CacheEntry): What the remote file looked like when fetched,
+                               None if it should not exist yet.
+            progress (callable, optional): Called with (bytes done, total).
+
+        Raises:
+            RemoteConflictException: If the remote file changed meanwhile.
+
+        Returns:
+            str: Checksum of the uploaded content.
+        """
+        temp_path = f"{self.remote_path}.{uuid.uuid4().hex}.tmp"
+        total = os.path.getsize(local_path)
+        digest = hashlib.md5()
+        done = 0
+        try:
+            with self.sftp_session.open(temp_path, "wb") as remote:
+                remote.set_pipelined(True)
+                with open(local_path, "rb") as local:
+                    for chunk in iter(lambda: local.read(CHUNK_SIZE), b""):
+                        remote.write(chunk)
+                        digest.update(chunk)
+                        done += len(chunk)
+                        if progress is not None:
+                            progress(done, total)
+            # Closing waited for every write to be acknowledged
+            self._check_remote_base(base)
+            self.sftp_session.posix_rename(temp_path, self.remote_path)
+        except BaseException:
+            try:
+                self.sftp_session.remove(temp_path)
+            except Exception:
+                pass
+            raise
+        return digest.hexdigest()
+
+    def _store_pushed_file(self, local_path: str, digest: str) -> CacheEntry:
+        """Records an uploaded file in the cache so the next fetch is free.
+
+        Args:
+            local_path (str): Local file that was uploaded.
+            digest (str): Checksum of the uploaded content.
+
+        Returns:
+            CacheEntry: Version now on the server, the base of the next edit.
+        """
+        attributes = self._stat_remote_file()
+        key = self._get_cache_key()
+        cache_path = self.cache._get_local_path(key)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        shutil.copyfile(local_path, cache_path)
+        return self.cache._store(
+            key, attributes.st_size, attributes.st_mtime, digest
+        )
+
+    def _upload_file(
+        self, local_path: str, base: CacheEntry,
+        progress=None) -> CacheEntry:
+        """Publishes a local file to the remote path in one pipelined transfer
+           plus an atomic rename. The upload only goes through if the remote
+           file is still the version the edit was based on.
+
+        Args:
+            local_path (str): Local file to upload.
+            base (CacheEntry): Version the edit was based on, as returned by
+                               _fetch_remote_version when it was loaded, None
+                               if the remote file should not exist yet.
+            progress (callable, optional): Called with (bytes done, total).
+
+        Raises:
+            ConnectionError: If the server did not answer the ping.
+            RemoteConflictException: If someone else changed the remote file.
+            paramiko.SSHException: If the connection failed.
+            IOError: If the remote file could not be written.
+
+        Returns:
+            CacheEntry: Version now on the server, the base of the next edit.
+        """
+        self._require_sessions()
+        # Fail before sending anything if we already know it will conflict
+        self._check_remote_base(base)
+        digest = self._replace_remote_file(local_path, base, progress)
+        return self._store_pushed_file(local_path, digest)
+
+    def _push_local_file(
+        self, local_path: str, base: CacheEntry) -> CacheEntry:
+        """Updates the remote file from a local file, sending only changed
+           blocks when the server can run the delta helper (remote exec and
+           python3) and the whole file over SFTP when it cannot, then
+           refreshes the cache so the next fetch is free. A conflict found by
+           either is raised, not retried.
+
+        Args:
+            local_path (str): Local file to upload.
+            base (CacheEntry): Version the edit was based on, see
+                               _upload_file.
+
+        Raises:
+            ConnectionError: If the server did not answer the ping.
+            RemoteConflictException: If someone else changed the remote file.
+            paramiko.SSHException: If the connection failed.
+            IOError: If the remote file could not be written.
+
+        Returns:
+            CacheEntry: Version now on the server, the base of the next edit.
+        """
+        self._require_sessions()
+        # Fail before sending anything if we already know it will conflict
+        self._check_remote_base(base)
+        if base is None:
+            # Nothing on the server to send a delta against
+            digest = self._replace_remote_file(local_path, base)
+        else:
+            try:
+                digest = self._delta_upload(local_path, base)
+            except (OSError, EOFError, ValueError, paramiko.SSHException):
+                digest = self._replace_remote_file(local_path, base)
+        return self._store_pushed_file(local_path, digest)
+
+    def _get_cached_file_handle(self):
+        """Gets a file handle to an up to date local copy of the remote file,
+           downloading only if the remote file changed since the last fetch.
+        """
+        _load_paramiko()
+        try:
+            self.remote_file_handle = open(self._fetch_remote_file(), "r")
         except paramiko.AuthenticationException:
             print("Authentication failed, please verify your credentials")
             self._close_sessions()
         except paramiko.SSHException as sshException:
             print(f"Unable to establish SSH connection: {sshException}")
             self._close_sessions()
-        except paramiko.BadHostKeyException as badHostKeyException:
-            print(f"Unable to verify server's host key: {badHostKeyException}")
-            self._close_sessions()
         except Exception as e:
             print(f"Operation error: {e}")
             self._close_sessions()
@@ -130,6 +716,31 @@ class FileIO:
         except Exception as e:
             print(f"Temporary file error: {e}")
 
+    def _get_remote_temp_file_handle(self, progress=None):
+        """Streams the remote file into a temporary file and leaves the
+           temporary file handle rewound, ready to be handed to a reader.
+
+        Args:
+            progress (callable, optional): Called with (bytes done, total).
+        """
+        self._get_temp_file_handle()
+        if self.temp_file_handle is None:
+            return
+        _load_paramiko()
+        try:
+            self._require_sessions()
+            self._transfer_remote_file(self.temp_file_handle, progress)
+            self.temp_file_handle.seek(0)
+        except paramiko.AuthenticationException:
+            print("Authentication failed, please verify your credentials")
+            self._close_sessions()
+        except paramiko.SSHException as sshException:
+            print(f"Unable to establish SSH connection: {sshException}")
+            self._close_sessions()
+        except Exception as e:
+            print(f"Operation error: {e}")
+            self._close_sessions()
+
     def _close_temp_file_handle(self):
         """Closes temporary file.
         """
@@ -138,10 +749,30 @@ class FileIO:
         except Exception as e:
             print(f"Temporary file error: {e}")
 
+    def _release_sessions(self):
+        """Lets go of the remote connections, leaving them alive in the pool
+           for the next operation on the same server.
+        """
+        if self.lease is not None:
+            self.pool._release(self.lease)
+        self._forget_sessions()
+
     def _close_sessions(self):
-        """Helper function to close the remote connections.
+        """Helper function to close the remote connections. Only this object's
+           lease is given up, other users of the pooled session carry on.
         """
-        if self.sftp_session is not None:
+        if self.lease is not None:
+            self.pool._discard(self.lease)
+        else:
+            if self.sftp_session is not None:
                 self.sftp_session.close()
-        if self.ssh_session is not None:
-            self.ssh_session.close()
+            if self.ssh_session is not None:
+                self.ssh_session.close()
+        self._forget_sessions()
+
+    def _forget_sessions(self):
+        """Drops the references to the remote connections.
+        """
+        self.lease = None
+        self.sftp_session = None
+        self.ssh_session = None
@@ -0,0 +1,505 @@
+import bisect
+import time
+
+from PyQt6.QtCore import QModelIndex, QTimer, pyqtSignal
+
+from state import State
+from query import StateIndex
+from search import SearchIndex, TEXT_FIELDS, tokenize, count_tokens
+from tree_model import RequirementTreeModel, TreeItem
+from events import CHILDREN
+
+# Definitions
+# Time spent filtering per event loop iteration, in seconds, well under a
+# frame so typing never waits on it
+CHUNK_BUDGET = 0.008
+# Nodes looked at between checks of the clock
+CHUNK_SIZE = 64
+
+class FilterItem(TreeItem):
+    def __init__(self, node, parent_item, row: int, position: int) -> None:
+        """Creates an instance of the FilterItem class, a shown row of the
+           filtered tree.
+
+        Args:
+            node (unknown): Object shown.
+            parent_item (FilterItem): Item of the parent, None for the root.
+            row (int): Position among the shown children of the parent.
+            position (int): Position among all children of the parent node,
+                            keeps the shown rows in tree order.
+        """
+        super().__init__(node, parent_item, row)
+        self.position = position
+        # Positions of the shown children, in row order
+        self.positions = []
+        # id(child) -> position among all children of the node, built when
+        # first needed and dropped once the children change
+        self.order = None
+        self.fetched = False
+
+class FilterTreeModel(RequirementTreeModel):
+    # Number of matches, once every candidate has been looked at
+    filtered = pyqtSignal(int)
+
+    def __init__(
+        self, state: State, state_index: StateIndex = None,
+        search_index: SearchIndex = None, parent=None) -> None:
+        """Creates an instance of the FilterTreeModel class which shows the
+           nodes matching a status and text filter, along with their
+           ancestors. Candidates come from the indexes and are looked at a
+           chunk per event loop iteration, so rows show up as they are found
+           and a filter that grows from the last one only rechecks what the
+           last one matched.
+
+        Args:
+            state (State): Program state to filter.
+            state_index (StateIndex, optional): Index of the state, built if
+                                                not given.
+            search_index (SearchIndex, optional): Text index of the state,
+                                                  built if not given.
+            parent (QObject, optional): Qt parent.
+        """
+        super().__init__(state, parent)
+        self.state_index = StateIndex(state) if state_index is None \
+            else state_index
+        self.search_index = SearchIndex(state) if search_index is None \
+            else search_index
+        self.root = FilterItem(state, None, 0, 0)
+        self.root.fetched = True
+        self.items = {id(state): self.root}
+        self.status = None
+        self.text = ""
+        # id(node) -> node of every match found so far
+        self.matches = {}
+        # id(node) -> matches at or below the node, the node is shown if set
+        self.counts = {}
+        # Nodes still to look at, None once done
+        self.pending = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self._refine)
+
+    ############
+    #   Qt model interface
+    ############
+    def hasChildren(self, parent=QModelIndex()) -> bool:
+        item = self._item(parent)
+        if item is self.root:
+            return bool(self.root.children)
+        key = id(item.node)
+        below = self.counts.get(key, 0)
+        if key in self.matches:
+            below -= 1
+        return below > 0
+
+    def canFetchMore(self, parent) -> bool:
+        if self.changing:
+            return False
+        return not self._item(parent).fetched and self.hasChildren(parent)
+
+    def fetchMore(self, parent) -> None:
+        item = self._item(parent)
+        if item.fetched:
+            return
+        item.fetched = True
+        shown = [
+            (position, child)
+            for position, child in enumerate(item.node._get_children())
+            if id(child) in self.counts
+        ]
+        if not shown:
+            return
+        self.changing = True
+        try:
+            self.beginInsertRows(parent, 0, len(shown) - 1)
+            for row, (position, child) in enumerate(shown):
+                added = FilterItem(child, item, row, position)
+                item.children.append(added)
+                item.positions.append(position)
+                self.items[id(child)] = added
+            self.endInsertRows()
+        finally:
+            self.changing = False
+
+    ############
+    #   Setters
+    ############
+    def _set_filter(self, status: str = None, text: str = "") -> None:
+        """Changes the filter. The first matches are shown before returning,
+           the rest follow over the next event loop iterations.
+
+        Args:
+            status (str, optional): Exact status to keep, None for any.
+            text (str, optional): Words every shown node contains, the last
+                                  one matched as a prefix.
+        """
+        text = (text or "").lower()
+        narrower = (self.status is None or status == self.status) and \
+            text.startswith(self.text) and \
+            (self.status is not None or self.text != "")
+        self.status = status
+        self.text = text
+        if not self._is_active():
+            self.timer.stop()
+            self.pending = None
+            self._restart()
+            self.filtered.emit(0)
+            return
+        if narrower:
+            # Whatever the new filter keeps, the old one matched or has yet
+            # to look at
+            narrowed = list(self.matches.values())
+            self.pending = self._recheck(narrowed, self.pending)
+        else:
+            self._restart()
+            self.pending = self._candidates()
+        self._refine()
+
+    ############
+    #   Getters
+    ############
+    def _is_active(self) -> bool:
+        """Checks a filter is set.
+
+        Returns:
+            bool: True if a status or text is set, false otherwise.
+        """
+        return self.status is not None or tokenize(self.text) != []
+
+    def _is_done(self) -> bool:
+        """Checks every candidate of the filter was looked at.
+
+        Returns:
+            bool: True if the shown rows are final, false otherwise.
+        """
+        return self.pending is None
+
+    def _position(self, parent_item: FilterItem, node) -> int:
+        """Gets the position of a node among all children of its parent.
+
+        Args:
+            parent_item (FilterItem): Item of the parent.
+            node (unknown): Child of the parent.
+
+        Returns:
+            int: Position, None if the node is no child of the parent.
+        """
+        if parent_item.order is None:
+            parent_item.order = dict(
+                (id(child), position) for position, child
+                in enumerate(parent_item.node._get_children())
+            )
+        return parent_item.order.get(id(node))
+
+    def _accepts(self, node, check_text: bool = True) -> bool:
+        """Checks a node matches the filter.
+
+        Args:
+            node (unknown): Node to check.
+            check_text (bool, optional): False if the text is known to match,
+                                         e.g. for nodes the text index gave.
+        """
+        if self.status is not None and \
+           getattr(node, "status", None) != self.status:
+            return False
+        terms = tokenize(self.text)
+        if not terms or not check_text:
+            return True
+        tokens = count_tokens(node)
+        if not self.text[-1:].isspace():
+            last = terms.pop()
+            if not any(token.startswith(last) for token in tokens):
+                return False
+        return all(term in tokens for term in terms)
+
+    def _candidates(self):
+        """Gets the nodes the filter may match, each with whether its text
+           still needs checking, from the indexes. They are only looked up
+           once this is first iterated, so the indexes have caught up with
+           the last change.
+        """
+        if tokenize(self.text):
+            for node in self.search_index._matches(self.text):
+                yield node, False
+        else:
+            for node in list(self.state_index.by_status.get(
+                self.status, {}
+            ).values()):
+                yield node, False
+
+    def _recheck(self, nodes: list, then):
+        """Gets the nodes of a list to check again in full, followed by what
+           another iterator of candidates still held.
+        """
+        for node in nodes:
+            yield node, True
+        if then is not None:
+            # Their text was only known to match the old filter
+            for node, _ in then:
+                yield node, True
+
+    ############
+    #   Helpers
+    ############
+    def _restart(self) -> None:
+        """Drops every shown row.
+        """
+        self.beginResetModel()
+        self.root.children = []
+        self.root.positions = []
+        self.root.order = None
+        self.items = {id(self.state): self.root}
+        self.matches = {}
+        self.counts = {}
+        self.endResetModel()
+
+    def _refine(self) -> None:
+        """Looks at candidates until the time budget of this iteration is
+           spent, then leaves the rest to the next one.
+        """
+        if self.pending is None:
+            self.timer.stop()
+            return
+        deadline = time.perf_counter() + CHUNK_BUDGET
+        pending = self.pending
+        while time.perf_counter() < deadline:
+            for _ in range(CHUNK_SIZE):
+                candidate = next(pending, None)
+                if candidate is None:
+                    self.pending = None
+                    self.timer.stop()
+                    self.filtered.emit(len(self.matches))
+                    return
+                self._consider(*candidate)
+        self.timer.start()
+
+    def _consider(self, node, check_text: bool = True) -> None:
+        """Shows or hides a node depending on the filter.
+        """
+        if self._accepts(node, check_text):
+            self._add_match(node)
+        else:
+            self._remove_match(node)
+
+    def _add_match(self, node) -> None:
+        """Shows a node and its ancestors.
+        """
+        if id(node) in self.matches or not self._owns(node):
+            return
+        self.matches[id(node)] = node
+        shown = []
+        while node is not self.state:
+            count = self.counts.get(id(node), 0)
+            self.counts[id(node)] = count + 1
+            if count == 0:
+                shown.append(node)
+            node = node.parent
+        # Parents first, so each row lands under a row that exists
+        for node in reversed(shown):
+            self._insert_row(node)
+
+    def _remove_match(self, node) -> None:
+        """Hides a node, and the ancestors it was the last match below.
+        """
+        if self.matches.pop(id(node), None) is None:
+            return
+        hidden = []
+        while node is not None and node is not self.state:
+            count = self.counts[id(node)] - 1
+            if count == 0:
+                del self.counts[id(node)]
+                hidden.append(node)
+            else:
+                self.counts[id(node)] = count
+            node = node.parent
+        if hidden:
+            # Removing the highest row takes the rows below it along
+            self._remove_row(hidden[-1])
+
+    def _insert_row(self, node) -> None:
+        """Adds the row of a node that became shown, if its parent's rows
+           were fetched.
+        """
+        parent_item = self.items.get(id(node.parent))
+        if parent_item is None or not parent_item.fetched:
+            return
+        position = self._position(parent_item, node)
+        row = bisect.bisect(parent_item.positions, position)
+        self.changing = True
+        try:
+            self.beginInsertRows(self._index_of(parent_item), row, row)
+            added = FilterItem(node, parent_item, row, position)
+            parent_item.children.insert(row, added)
+            parent_item.positions.insert(row, position)
+            self.items[id(node)] = added
+            self._renumber(parent_item, row)
+            self.endInsertRows()
+        finally:
+            self.changing = False
+
+    def _remove_row(self, node) -> None:
+        """Takes away the row of a node that is no longer shown.
+        """
+        item = self.items.get(id(node))
+        if item is None:
+            return
+        parent_item = item.parent_item
+        self.changing = True
+        try:
+            self.beginRemoveRows(
+                self._index_of(parent_item), item.row, item.row
+            )
+            parent_item.children.pop(item.row)
+            parent_item.positions.pop(item.row)
+            self._forget(item)
+            self._renumber(parent_item, item.row)
+            self.endRemoveRows()
+        finally:
+            self.changing = False
+
+    def _owns(self, node) -> bool:
+        """Checks a node belongs to the filtered program state.
+        """
+        while node is not None:
+            if node is self.state:
+                return True
+            node = node.parent
+        return False
+
+    def _drop_matches(self, node) -> None:
+        """Forgets the matches at and below a node taken out of the tree.
+        """
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            self.matches.pop(id(node), None)
+            self.counts.pop(id(node), None)
+            stack.extend(node._get_children())
+
+    def _shift(self, event, added: list, reordered: dict) -> None:
+        """Applies a change to the children of a node to the shown rows. Rows
+           of removed children go, the positions of the rows after them are
+           moved along and added children are left for the caller to check.
+
+        Args:
+            event (ChangeEvent): CHILDREN change.
+            added (list): Gets the added children.
+            reordered (dict): Gets the items whose rows need their positions
+                              worked out again, by id.
+        """
+        parent = event.node
+        owned = self._owns(parent)
+        item = self.items.get(id(parent)) if owned else None
+        if item is not None:
+            item.order = None
+        for child in event.old:
+            below = self.counts.get(id(child), 0)
+            self._drop_matches(child)
+            if not owned:
+                # Its parent left the tree too, that change settles the rows
+                continue
+            hidden = None
+            node = parent
+            while below and node is not self.state:
+                count = self.counts[id(node)] - below
+                if count == 0:
+                    del self.counts[id(node)]
+                    hidden = node
+                else:
+                    self.counts[id(node)] = count
+                node = node.parent
+            if hidden is not None:
+                # Removing the highest row takes the rows below it along
+                self._remove_row(hidden)
+            else:
+                shown = self.items.get(id(child))
+                if shown is not None and shown.parent_item is item:
+                    self._remove_row(child)
+            if item is not None and event.index is not None:
+                positions = item.positions
+                for row in range(
+                    bisect.bisect_right(positions, event.index), len(positions)
+                ):
+                    positions[row] -= 1
+                    item.children[row].position -= 1
+        if not owned:
+            return
+        added.extend(event.new)
+        if item is None or self.items.get(id(parent)) is not item:
+            return
+        if event.index is None:
+            # Kept children may sit elsewhere in the new list
+            reordered[id(item)] = item
+        else:
+            positions = item.positions
+            for row in range(
+                bisect.bisect_left(positions, event.index), len(positions)
+            ):
+                positions[row] += len(event.new)
+                item.children[row].position += len(event.new)
+        self._row_changed(item)
+
+    def _reorder(self, item: FilterItem) -> None:
+        """Works out the positions of the rows under an item whose children
+           were replaced as a whole. If the shown rows changed order, they are
+           shown again.
+        """
+        if self.items.get(id(item.node)) is not item:
+            return
+        positions = [self._position(item, child.node) for child in item.children]
+        if None not in positions and positions == sorted(positions):
+            item.positions = positions
+            for child, position in zip(item.children, positions):
+                child.position = position
+            return
+        if item.children:
+            self.changing = True
+            try:
+                self.beginRemoveRows(
+                    self._index_of(item), 0, len(item.children) - 1
+                )
+                for child in item.children:
+                    self._forget(child)
+                item.children = []
+                item.positions = []
+                self.endRemoveRows()
+            finally:
+                self.changing = False
+        for child in item.node._get_children():
+            if id(child) in self.counts:
+                self._insert_row(child)
+
+    def _on_change(self, events: list) -> None:
+        """Keeps the shown rows in step with a batch of changes. Rows under a
+           node whose children changed are shifted rather than the filter run
+           again, only added nodes and nodes whose fields changed are checked.
+        """
+        if not self._is_active():
+            return
+        added = []
+        reordered = {}
+        for event in events:
+            if event.field == CHILDREN:
+                self._shift(event, added, reordered)
+        for item in reordered.values():
+            self._reorder(item)
+        for node in added:
+            if not self._owns(node):
+                continue
+            stack = [node]
+            while stack:
+                node = stack.pop()
+                self._consider(node)
+                stack.extend(node._get_children())
+        for event in events:
+            if event.field != "status" and event.field not in TEXT_FIELDS:
+                continue
+            node = event.node
+            if not self._owns(node):
+                continue
+            self._consider(node)
+            item = self.items.get(id(node))
+            if item is not None:
+                self._row_changed(item)
+        if self._is_done():
+            self.filtered.emit(len(self.matches))
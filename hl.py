@@ -1,5 +1,7 @@
 from ll import LowLevel
 from checksum import checksum, hash_list
+from rollup import tally, move_children, move_status, percent_done
+from events import emit, CHILDREN
 
 class HighLevel:
     def __init__(
@@ -27,6 +29,12 @@ class HighLevel:
         self.description = description
         self.title = title
         self.LowLevel = LowLevel
+        # Set by the SystemRequirement object holding this requirement
+        self.parent = None
+        for child in self.LowLevel:
+            child.parent = self
+        # Statuses of every object below this one
+        self.status_counts = tally(self.LowLevel)
 
     ############
     #   Setters
@@ -37,7 +45,9 @@ class HighLevel:
         Args:
             title (str): Denotes the title of the requirement
         """
+        old = self.title
         self.title = title
+        emit(self, "title", old, title)
 
     def _set_description(self, description: str) -> None:
         """Sets the description of a requirement.
@@ -45,7 +55,9 @@ class HighLevel:
         Args:
             description (str): Denotes the description of the requirement
         """
+        old = self.description
         self.description = description
+        emit(self, "description", old, description)
 
     def _set_status(self, status: str) -> bool:
         """Sets the status of a requirement.
@@ -60,7 +72,10 @@ class HighLevel:
             'In Progress', 'Not Started', 'Under Review', 'Done'
         })
         if status in status_options:
+            old = self.status
             self.status = status
+            move_status(self, old, status)
+            emit(self, "status", old, status)
             return True
         else:
             return False
@@ -76,7 +91,14 @@ class HighLevel:
             bool: Check to make sure the passed in value is not empty.
         """
         if low_level is not None:
+            old = self.LowLevel
+            for child in old:
+                child.parent = None
+            for child in low_level:
+                child.parent = self
             self.LowLevel = low_level
+            move_children(self, old, low_level)
+            emit(self, CHILDREN, old, low_level)
             return True
         else:
             return False
@@ -116,6 +138,30 @@ class HighLevel:
         """
         return self.LowLevel
 
+    def _get_children(self) -> list[LowLevel]:
+        """Gets the children of this requirement.
+
+        Returns:
+            list[LowLevel]: Children LowLevel objects.
+        """
+        return self.LowLevel
+
+    def _get_status_counts(self) -> dict:
+        """Gets the statuses of every object below this one.
+
+        Returns:
+            dict: Status to number of objects holding it.
+        """
+        return self.status_counts
+
+    def _get_percent_done(self) -> float:
+        """Gets how much of this requirement is done.
+
+        Returns:
+            float: Percentage from 0 to 100.
+        """
+        return percent_done(self)
+
     ############
     #   Helpers
     ############
@@ -128,9 +174,12 @@ class HighLevel:
         Returns:
             bool: If the ll req was found or not.
         """
-        for l in self.LowLevel:
+        for i, l in enumerate(self.LowLevel):
             if l.title == title:
-                self.LowLevel.remove(l)
+                self.LowLevel.pop(i)
+                l.parent = None
+                move_children(self, [l], [])
+                emit(self, CHILDREN, [l], [], i)
                 return True
         return False
 
@@ -11,6 +11,10 @@ from project import Project
 # Definitions
 FILE_HANDLE = 0
 HANDLE_STATUS = 1
+# Files written by JsonWriter start with a single line holding the timestamp
+# and settings, which fits in the first HEADER_SIZE bytes
+HEADER_PREFIX = '{"timestamp": '
+HEADER_SIZE = 4096
 
 class JsonReader:
     def __init__(self, file_handle) -> None:
@@ -73,18 +77,54 @@ class JsonReader:
                 self.file_handle = (self.file_handle[FILE_HANDLE], True)
                 # Update the status to show that the new handle
                 # has been read
-                return True
+            # Already read handles reuse the parsed json
+            return True
         print(f"ERR: Trying to read a file descriptor which is None!")
         # Unrecoverable error if handle is bad
         return False
 
 
+    def _read_header(self) -> dict:
+        """Reads the header line at the start of the file without parsing the
+           rest of it. The handle is left where it was found.
+
+        Returns:
+            dict: timestamp and settings, None if the file has no header (e.g.
+                  an older file), the handle cannot seek or was already read.
+        """
+        handle = self._get_file_handle()
+        if handle is None or self.file_handle[HANDLE_STATUS] is True:
+            return None
+        try:
+            position = handle.tell()
+            head = handle.read(HEADER_SIZE)
+            handle.seek(position)
+        except (OSError, ValueError):
+            return None
+        newline = b"\n" if isinstance(head, bytes) else "\n"
+        if newline not in head:
+            return None
+        line = head.split(newline, 1)[0]
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        line = line.rstrip()
+        if not line.startswith(HEADER_PREFIX) or not line.endswith(","):
+            return None
+        try:
+            return json.loads(line[:-1] + "}")
+        except ValueError:
+            return None
+
     def _read_timestamp(self) -> float:
         """Reads the json file specified for the timestamp data.
 
         Returns:
             float: timestamp in seconds as a float.
         """
+        header = self._read_header()
+        if header is not None:
+            self.timestamp = header["timestamp"]
+            return self.timestamp
         if self._check_handle_status() is True:
             data = self.read_json
             self.timestamp = data["timestamp"]
@@ -101,7 +141,7 @@ class JsonReader:
                   otherwise, false.
         """
         if self.timestamp is None:
-            self.timestamp = self._read_timestamp
+            self.timestamp = self._read_timestamp()
         if self.timestamp < datetime.datetime.now().timestamp():
             return True
         else:
@@ -171,6 +211,13 @@ class JsonReader:
     def _read_settings(self) -> None:
         """Reads the settings data from the json.
         """
+        header = self._read_header()
+        if header is not None:
+            if "settings" in header:
+                self.settings = self._create_settings(header["settings"])
+            else:
+                self.settings = None
+            return
         if self._check_handle_status() is True:
             self.settings = self._create_settings(self.read_json["settings"])
         else:
@@ -2,19 +2,26 @@ import json
 import datetime
 from state import State
 from dictionify import dictionify
+from persistent import PersistentNode
 
 class JsonWriter:
     def __init__(
-        self, state: State, file_handle) -> None:
+        self, state: State, file_handle, fragments: dict = None) -> None:
         """Creates a new instance or the JsonWriter class which is used to
            output the program state to a json file.
 
         Args:
             state (State): state of the program when writing to json.
             file_handle (io): handle of what to write to
+            fragments (dict, optional): Json text of the projects from the
+                                        last write, kept between writes of
+                                        snapshots so unchanged projects are
+                                        not serialized again. Filled in by
+                                        the write.
         """
         self.file_handle = file_handle
         self.state = state
+        self.fragments = fragments
 
     ############
     #   Setters
@@ -62,22 +69,55 @@ class JsonWriter:
         """Writes the all the program state to the output file.
         """
         if self._check_handle_status() is True:
-            dictionary = {}
+            # The small fields go first, on a line of their own, so readers
+            # can get them without parsing the projects (see HEADER_PREFIX)
+            header = {"timestamp" : datetime.datetime.now().timestamp()}
             if self.state.settings is not None:
-                    dictionary["settings"] = {
+                    header["settings"] = {
                         "color_theme" : self.state.settings.color_theme,
                         "organization_name" : self.state.settings.org_name,
                         "software_version" : self.state.settings.sw_version,
                         "support" : self.state.settings.support,
                         "remote_url" : self.state.settings.remote_url
                     }
-            projects = []
-            for i in range(len(self.state.projects)):
-                projects.append(dictionify(
-                    self.state.projects[i])
-                )
-            dictionary["projects"] = projects
-            dictionary["timestamp"] = datetime.datetime.now().timestamp()
-            json.dump(dictionary, self.file_handle, indent=2)
+            header_line = json.dumps(header)
+            self.file_handle.write(header_line[:-1] + ',\n"projects": ')
+            if self.fragments is None:
+                projects = []
+                for i in range(len(self.state.projects)):
+                    projects.append(dictionify(
+                        self.state.projects[i])
+                    )
+                json.dump(projects, self.file_handle, indent=2)
+            else:
+                self._write_fragments()
+            self.file_handle.write("}\n")
         else:
-            pass
\ No newline at end of file
+            pass
+
+    def _write_fragments(self) -> None:
+        """Writes the projects list from cached json text, serializing only
+           the projects that changed since the last write. The output is the
+           same as json.dump with indent=2.
+        """
+        cached = self.fragments
+        fragments = {}
+        texts = []
+        for project in self.state.projects:
+            entry = cached.get(id(project))
+            if entry is None or entry[0] is not project or \
+               not isinstance(project, PersistentNode):
+                # Only immutable snapshot nodes are known not to have changed
+                # since their text was made
+                text = json.dumps(dictionify(project), indent=2)
+                # One level deeper than a project written on its own
+                entry = (project, "  " + text.replace("\n", "\n  "))
+            fragments[id(project)] = entry
+            texts.append(entry[1])
+        if texts:
+            self.file_handle.write("[\n" + ",\n".join(texts) + "\n]")
+        else:
+            self.file_handle.write("[]")
+        # Drop the text of projects that are gone
+        cached.clear()
+        cached.update(fragments)
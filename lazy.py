@@ -0,0 +1,23 @@
+import importlib
+import threading
+
+# Held while a module is first imported
+_lock = threading.Lock()
+
+def load_module(name: str):
+    """Imports a module where it is first needed rather than where the code
+       needing it is imported, so code that never takes that path does not
+       pay for a heavy dependency. Threads racing to import it wait for each
+       other and only ever get the fully loaded module.
+
+    Args:
+        name (str): Module name, e.g. "paramiko".
+
+    Raises:
+        ModuleNotFoundError: If the module is not installed.
+
+    Returns:
+        module: The loaded module.
+    """
+    with _lock:
+        return importlib.import_module(name)
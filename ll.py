@@ -1,3 +1,6 @@
+from rollup import move_status, percent_done
+from events import emit
+
 class LowLevel:
     def __init__(
         self, title='Unnamed', code_reference='None',
@@ -33,6 +36,8 @@ class LowLevel:
         self.code_reference = code_reference
         self.comment = comment
         self.trace = trace
+        # Set by the HighLevel object holding this requirement
+        self.parent = None
 
     ############
     #   Setters
@@ -43,7 +48,9 @@ class LowLevel:
         Args:
             title (str): Denotes the title of the requirement
         """
+        old = self.title
         self.title = title
+        emit(self, "title", old, title)
 
     def _set_description(self, description: str) -> None:
         """Sets the description of a requirement.
@@ -51,7 +58,9 @@ class LowLevel:
         Args:
             description (str): Denotes the description of the requirement
         """
+        old = self.description
         self.description = description
+        emit(self, "description", old, description)
 
     def _set_status(self, status: str) -> bool:
         """Sets the status of a requirement.
@@ -66,7 +75,10 @@ class LowLevel:
             'In Progress', 'Not Started', 'Under Review', 'Done'
         })
         if status in status_options:
+            old = self.status
             self.status = status
+            move_status(self, old, status)
+            emit(self, "status", old, status)
             return True
         else:
             return False
@@ -80,7 +92,9 @@ class LowLevel:
                                   external tool, the code itself, comments about
                                   the solution, etc.
         """
+        old = self.code_reference
         self.code_reference = code_reference
+        emit(self, "code_reference", old, code_reference)
 
     def _set_comment(self, comment: str) -> None:
         """Sets the comment of the LowLevel requirement
@@ -88,7 +102,9 @@ class LowLevel:
         Args:
             comment (str): Comments about the solution
         """
+        old = self.comment
         self.comment = comment
+        emit(self, "comment", old, comment)
 
     def _set_trace(self, trace: str) -> None:
         """Sets the trace of the LowLevel requirement
@@ -96,7 +112,9 @@ class LowLevel:
         Args:
             trace (str): Name of the function which solve the requirement
         """
+        old = self.trace
         self.trace = trace
+        emit(self, "trace", old, trace)
 
     ############
     #   Getters
@@ -149,6 +167,22 @@ class LowLevel:
         """
         return self.trace
 
+    def _get_children(self) -> list:
+        """Gets the children, LowLevel objects are the bottom of the hierarchy.
+
+        Returns:
+            list: Always empty.
+        """
+        return []
+
+    def _get_percent_done(self) -> float:
+        """Gets how much of this requirement is done.
+
+        Returns:
+            float: Percentage from 0 to 100.
+        """
+        return percent_done(self)
+
     ############
     #   Helpers
     ############
@@ -0,0 +1,286 @@
+from ll import LowLevel
+from hl import HighLevel
+from system_req import SystemRequirement
+from requirement import Requirement
+from project import Project
+
+# Definitions
+# Fields of each level, in the order the model constructors take them
+FIELDS = {
+    "State" : (),
+    "Project" : ("title", "description"),
+    "Requirement" : ("title", "description", "status"),
+    "SystemRequirement" : ("title", "description", "status"),
+    "HighLevel" : ("title", "description", "status"),
+    "LowLevel" : (
+        "title", "code_reference", "description", "status", "comment",
+        "trace"
+    )
+}
+# Attribute the model classes keep their children in
+CHILD_ATTRIBUTES = {
+    "State" : "projects",
+    "Project" : "requirements",
+    "Requirement" : "SystemRequirement",
+    "SystemRequirement" : "HighLevel",
+    "HighLevel" : "LowLevel",
+    "LowLevel" : None
+}
+CLASSES = {
+    "Project" : Project,
+    "Requirement" : Requirement,
+    "SystemRequirement" : SystemRequirement,
+    "HighLevel" : HighLevel,
+    "LowLevel" : LowLevel
+}
+
+class PersistentNode:
+    __slots__ = ("kind", "values", "children")
+
+    def __init__(self, kind: str, values: tuple, children: tuple = ()) -> None:
+        """Creates an instance of the PersistentNode class, an immutable node
+           of the requirements tree. Versions are built from the model with
+           from_model, which only builds the nodes an edit went through, so
+           older roots stay valid and share every subtree left untouched.
+
+        Args:
+            kind (str): Level, e.g. "HighLevel".
+            values (tuple): Field values in the order of FIELDS[kind].
+            children (tuple, optional): Child PersistentNode objects.
+        """
+        object.__setattr__(self, "kind", kind)
+        object.__setattr__(self, "values", tuple(values))
+        object.__setattr__(self, "children", tuple(children))
+
+    def __setattr__(self, name, value) -> None:
+        raise AttributeError("PersistentNode is immutable")
+
+    def __getattr__(self, name: str):
+        # Read like the model objects, e.g. node.status or node.LowLevel, so
+        # code written against them (dictionify, JsonWriter) can read it
+        fields = FIELDS[self.kind]
+        if name in fields:
+            return self.values[fields.index(name)]
+        if name == CHILD_ATTRIBUTES[self.kind]:
+            return self.children
+        raise AttributeError(name)
+
+    ############
+    #   Getters
+    ############
+    def _get(self, field: str):
+        """Gets the value of a field.
+
+        Args:
+            field (str): Field name, e.g. "status".
+
+        Returns:
+            unknown: Value of the field.
+        """
+        return self.values[FIELDS[self.kind].index(field)]
+
+    def _get_children(self) -> tuple:
+        """Gets the children.
+
+        Returns:
+            tuple: Child PersistentNode objects.
+        """
+        return self.children
+
+def from_model(node) -> PersistentNode:
+    """Gets the persistent version of a model object and everything below it.
+       Each model object keeps the version last built for it, so only what was
+       invalidated since is built again and the rest is shared.
+
+    Args:
+        node (unknown): State, Project, Requirement, SystemRequirement,
+                        HighLevel or LowLevel object.
+
+    Returns:
+        PersistentNode: Root of the persistent version.
+    """
+    built = getattr(node, "persistent", None)
+    if built is not None:
+        return built
+    kind = type(node).__name__
+    built = PersistentNode(
+        kind,
+        [getattr(node, field) for field in FIELDS[kind]],
+        [from_model(child) for child in node._get_children()]
+    )
+    node.persistent = built
+    return built
+
+def invalidate(node) -> None:
+    """Drops the persistent version kept by a model object and every object
+       above it, after it changed.
+
+    Args:
+        node (unknown): Object that changed.
+    """
+    while node is not None:
+        node.persistent = None
+        node = node.parent
+
+def to_model(node: PersistentNode):
+    """Builds mutable model objects from a persistent node. A State root has no
+       model counterpart of its own, use it on each of its children. The built
+       objects keep the node they came from as their persistent version.
+
+    Args:
+        node (PersistentNode): Node below the State root.
+
+    Returns:
+        unknown: Project, Requirement, SystemRequirement, HighLevel or
+                 LowLevel object.
+    """
+    cls = CLASSES[node.kind]
+    if node.kind == "LowLevel":
+        built = cls(*node.values)
+    else:
+        built = cls([to_model(child) for child in node.children], *node.values)
+    built.persistent = node
+    return built
+
+def get_node(root: PersistentNode, path: tuple) -> PersistentNode:
+    """Follows child indexes down from a root.
+
+    Args:
+        root (PersistentNode): Where to start.
+        path (tuple): Child indexes.
+
+    Returns:
+        PersistentNode: Node at the end of the path.
+    """
+    node = root
+    for index in path:
+        node = node.children[index]
+    return node
+
+class History:
+    def __init__(self, root: PersistentNode, limit: int = None) -> None:
+        """Creates an instance of the History class which keeps undo and redo
+           stacks of roots. Roots share everything an edit did not touch, so
+           each step only costs the nodes along the edited path.
+
+        Args:
+            root (PersistentNode): Current version of the tree.
+            limit (int, optional): Most undo steps kept, None for no limit.
+        """
+        self.root = root
+        self.limit = limit
+        self.undo_stack = []
+        self.redo_stack = []
+
+    ############
+    #   Getters
+    ############
+    def _get_root(self) -> PersistentNode:
+        """Gets the current version of the tree.
+
+        Returns:
+            PersistentNode: Current root.
+        """
+        return self.root
+
+    ############
+    #   Helpers
+    ############
+    def _commit(self, root: PersistentNode) -> None:
+        """Makes a new version current. Whatever could be redone is dropped.
+           A root built again over the same children as the current one, e.g.
+           after an undo, is not a new version.
+
+        Args:
+            root (PersistentNode): New root.
+        """
+        if root is self.root:
+            return
+        if root.values == self.root.values and \
+           len(root.children) == len(self.root.children) and \
+           all(a is b for a, b in zip(root.children, self.root.children)):
+            return
+        self.undo_stack.append(self.root)
+        if self.limit is not None and len(self.undo_stack) > self.limit:
+            del self.undo_stack[0]
+        self.redo_stack.clear()
+        self.root = root
+
+    def _can_undo(self) -> bool:
+        return bool(self.undo_stack)
+
+    def _can_redo(self) -> bool:
+        return bool(self.redo_stack)
+
+    def _undo(self) -> PersistentNode:
+        """Goes back one version.
+
+        Returns:
+            PersistentNode: Root now current, None if there was nothing to
+                            undo.
+        """
+        if not self.undo_stack:
+            return None
+        self.redo_stack.append(self.root)
+        self.root = self.undo_stack.pop()
+        return self.root
+
+    def _redo(self) -> PersistentNode:
+        """Goes forward one undone version.
+
+        Returns:
+            PersistentNode: Root now current, None if there was nothing to
+                            redo.
+        """
+        if not self.redo_stack:
+            return None
+        self.undo_stack.append(self.root)
+        self.root = self.redo_stack.pop()
+        return self.root
+
+class Snapshot:
+    def __init__(self, root: PersistentNode, username: str, settings) -> None:
+        """Creates an instance of the Snapshot class, a read only view of the
+           program state at one point in time. It reads like a State, e.g.
+           snapshot.projects[0].requirements, so it can be handed to code
+           such as JsonWriter from another thread.
+
+        Args:
+            root (PersistentNode): Persistent version of the State.
+            username (str): User who was logged in.
+            settings (Settings): Settings of the program.
+        """
+        self.root = root
+        self.projects = root.children
+        self.username = username
+        self.settings = settings
+
+    ############
+    #   Getters
+    ############
+    def _get_root(self) -> PersistentNode:
+        """Gets the persistent version of the State.
+
+        Returns:
+            PersistentNode: Root of the snapshot.
+        """
+        return self.root
+
+    def _get_projects(self) -> tuple:
+        """Gets the projects as they were when the snapshot was taken.
+
+        Returns:
+            tuple: Project PersistentNode objects.
+        """
+        return self.projects
+
+    def _get_node(self, path: tuple) -> PersistentNode:
+        """Gets the node at a path, as given by ChangeEvent._get_path.
+
+        Args:
+            path (tuple): Child indexes.
+
+        Returns:
+            PersistentNode: Node at the path.
+        """
+        return get_node(self.root, path)
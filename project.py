@@ -1,5 +1,7 @@
 from requirement import Requirement
 from checksum import checksum, hash_list
+from rollup import tally, move_children, percent_done
+from events import emit, CHILDREN
 
 class Project:
     def __init__(
@@ -17,6 +19,12 @@ class Project:
         self.requirements = Requirements
         self.title = title
         self.description = description
+        # Set by the State object holding this project
+        self.parent = None
+        for child in self.requirements:
+            child.parent = self
+        # Statuses of every object below this one
+        self.status_counts = tally(self.requirements)
 
     ############
     #   Setters
@@ -27,7 +35,9 @@ class Project:
         Args:
             title (str): title of the project.
         """
+        old = self.title
         self.title = title
+        emit(self, "title", old, title)
 
     def _set_description(self, desc: str) -> None:
         """Sets the description of the of the project.
@@ -35,7 +45,9 @@ class Project:
         Args:
             desc (str): description to set to.
         """
+        old = self.description
         self.description = desc
+        emit(self, "description", old, desc)
 
     ############
     #   Getters
@@ -56,6 +68,30 @@ class Project:
         """
         return self.description
 
+    def _get_children(self) -> list[Requirement]:
+        """Gets the requirements of the project.
+
+        Returns:
+            list[Requirement]: Requirement objects of the project.
+        """
+        return self.requirements
+
+    def _get_status_counts(self) -> dict:
+        """Gets the statuses of every object below this one.
+
+        Returns:
+            dict: Status to number of objects holding it.
+        """
+        return self.status_counts
+
+    def _get_percent_done(self) -> float:
+        """Gets how much of the project is done.
+
+        Returns:
+            float: Percentage from 0 to 100.
+        """
+        return percent_done(self)
+
     ############
     #   Helpers
     ############
@@ -66,6 +102,9 @@ class Project:
             req (Requirement): Requirements to add.
         """
         self.requirements.append(req)
+        req.parent = self
+        move_children(self, [], [req])
+        emit(self, CHILDREN, [], [req], len(self.requirements) - 1)
 
     def _remove_requirement(self, idx: int) -> bool:
         """Removes a requirement specified.
@@ -77,10 +116,13 @@ class Project:
             bool: If the requirement at that index existed or not.
         """
         try:
-            self.requirements.pop(idx)
-            return True
+            req = self.requirements.pop(idx)
         except:
             return False
+        req.parent = None
+        move_children(self, [req], [])
+        emit(self, CHILDREN, [req], [], idx % (len(self.requirements) + 1))
+        return True
 
     def _remove_requirement(self, title: str) -> bool:
         """Removes a requirement based on name
@@ -91,9 +133,12 @@ class Project:
         Returns:
             bool: If the requirement with specified name was found or not.
         """
-        for requirement in self.requirements:
+        for i, requirement in enumerate(self.requirements):
             if title == requirement.title:
-                self.requirements.remove(requirement)
+                self.requirements.pop(i)
+                requirement.parent = None
+                move_children(self, [requirement], [])
+                emit(self, CHILDREN, [requirement], [], i)
                 return True
         return False
 
@@ -104,10 +149,13 @@ class Project:
             bool: If the requirements list had anything in it.
         """
         try:
-            self.requirements.pop(-1)
-            return True
+            req = self.requirements.pop(-1)
         except:
             return False
+        req.parent = None
+        move_children(self, [req], [])
+        emit(self, CHILDREN, [req], [], len(self.requirements))
+        return True
 
     def __eq__(self, other) -> bool:
         """Compares between two HighLevel objects.
@@ -0,0 +1,258 @@
+from state import State
+from events import subscribe, unsubscribe, CHILDREN
+
+def preorder(state: State) -> list:
+    """Lists every node below the program state in a stable order, parents
+       before their children. Used to refer to nodes in saved indexes.
+
+    Args:
+        state (State): Program state to walk.
+
+    Returns:
+        list: Project, Requirement, SystemRequirement, HighLevel and LowLevel
+              objects.
+    """
+    nodes = []
+    stack = list(reversed(state.projects))
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed(node._get_children()))
+    return nodes
+
+class QueryResult:
+    def __init__(self, node) -> None:
+        """Creates an instance of the QueryResult class which is one match of
+           a query. The path is only worked out when asked for.
+
+        Args:
+            node (unknown): Matching Project, Requirement, SystemRequirement,
+                            HighLevel or LowLevel object.
+        """
+        self.node = node
+
+    ############
+    #   Getters
+    ############
+    def _get_node(self):
+        """Gets the matching object.
+
+        Returns:
+            unknown: Matching object.
+        """
+        return self.node
+
+    def _get_level(self) -> str:
+        """Gets the level of the matching object in the hierarchy.
+
+        Returns:
+            str: Class name, e.g. "LowLevel".
+        """
+        return type(self.node).__name__
+
+    def _get_path(self) -> list[str]:
+        """Gets the titles leading from the project down to the match.
+
+        Returns:
+            list[str]: Titles, starting with the project.
+        """
+        path = []
+        node = self.node
+        while node is not None and not isinstance(node, State):
+            path.append(node.title)
+            node = node.parent
+        path.reverse()
+        return path
+
+class StateIndex:
+    def __init__(self, state: State) -> None:
+        """Creates an instance of the StateIndex class which indexes every node
+           of the program state by level, status and trace. The indexes follow
+           every change made through the model setters.
+
+        Args:
+            state (State): Program state to index.
+        """
+        self.state = state
+        # Each index maps a key to {id(node): node}, nodes hash by content
+        self.by_level = {}
+        self.by_status = {}
+        self.by_level_status = {}
+        self.by_trace = {}
+        # id(node) -> (level, status, trace) it was indexed under. Batches
+        # reach the index after the changes were made, unindexing has to use
+        # these rather than what the node holds by then.
+        self.keys = {}
+        for project in state.projects:
+            self._index_subtree(project)
+        subscribe(self._on_change)
+
+    ############
+    #   Helpers
+    ############
+    def _close(self) -> None:
+        """Stops following changes to the program state.
+        """
+        unsubscribe(self._on_change)
+
+    def _query(
+        self, level: str = None, status: str = None, title: str = None,
+        description: str = None, trace: str = None,
+        code_reference: str = None):
+        """Finds the nodes matching every predicate given. Level, status and
+           trace are answered from the indexes, the substring predicates only
+           look at what those leave.
+
+        Args:
+            level (str, optional): Class name, e.g. "HighLevel".
+            status (str, optional): Exact status, e.g. "Done".
+            title (str, optional): Case insensitive substring of the title.
+            description (str, optional): Case insensitive substring of the
+                                         description.
+            trace (str, optional): Exact trace.
+            code_reference (str, optional): Case insensitive substring of the
+                                            code reference.
+
+        Yields:
+            QueryResult: Matches, produced as they are found.
+        """
+        candidates = []
+        if level is not None and status is not None:
+            candidates.append(self.by_level_status.get((level, status), {}))
+        elif level is not None:
+            candidates.append(self.by_level.get(level, {}))
+        elif status is not None:
+            candidates.append(self.by_status.get(status, {}))
+        if trace is not None:
+            candidates.append(self.by_trace.get(trace, {}))
+        if not candidates:
+            candidates = list(self.by_level.values())
+            rest = []
+        else:
+            # Walk the smallest bucket, check membership in the others
+            candidates.sort(key=len)
+            rest = candidates[1:]
+            candidates = candidates[:1]
+        title = None if title is None else title.lower()
+        description = None if description is None else description.lower()
+        code_reference = None if code_reference is None \
+            else code_reference.lower()
+        for bucket in candidates:
+            for key, node in list(bucket.items()):
+                if any(key not in other for other in rest):
+                    continue
+                if title is not None and title not in node.title.lower():
+                    continue
+                if description is not None and \
+                   description not in node.description.lower():
+                    continue
+                if code_reference is not None and \
+                   code_reference not in \
+                   str(getattr(node, "code_reference", "")).lower():
+                    continue
+                yield QueryResult(node)
+
+    def _count(self, level: str = None, status: str = None) -> int:
+        """Counts nodes straight from the indexes without walking them.
+
+        Args:
+            level (str, optional): Class name, e.g. "HighLevel".
+            status (str, optional): Exact status.
+
+        Returns:
+            int: Number of matching nodes.
+        """
+        if level is None and status is None:
+            return sum(len(bucket) for bucket in self.by_level.values())
+        if status is None:
+            return len(self.by_level.get(level, {}))
+        if level is None:
+            return len(self.by_status.get(status, {}))
+        return len(self.by_level_status.get((level, status), {}))
+
+    def _owns(self, node) -> bool:
+        """Checks a changed node belongs to the indexed program state.
+        """
+        while node is not None:
+            if node is self.state:
+                return True
+            node = node.parent
+        return False
+
+    def _add(self, index: dict, key, node) -> None:
+        """Adds a node to the bucket of a key in an index.
+        """
+        index.setdefault(key, {})[id(node)] = node
+
+    def _discard(self, index: dict, key, node) -> None:
+        """Removes a node from the bucket of a key in an index.
+        """
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(id(node), None)
+            if not bucket:
+                del index[key]
+
+    def _index_node(self, node) -> None:
+        """Adds a node to the indexes under what it holds now.
+        """
+        level = type(node).__name__
+        status = getattr(node, "status", None)
+        trace = getattr(node, "trace", None)
+        self.keys[id(node)] = (level, status, trace)
+        self._add(self.by_level, level, node)
+        if status is not None:
+            self._add(self.by_status, status, node)
+            self._add(self.by_level_status, (level, status), node)
+        if trace:
+            self._add(self.by_trace, trace, node)
+
+    def _unindex_node(self, node) -> None:
+        """Removes a node from the indexes under what it was indexed with.
+        """
+        keys = self.keys.pop(id(node), None)
+        if keys is None:
+            return
+        level, status, trace = keys
+        self._discard(self.by_level, level, node)
+        if status is not None:
+            self._discard(self.by_status, status, node)
+            self._discard(self.by_level_status, (level, status), node)
+        if trace:
+            self._discard(self.by_trace, trace, node)
+
+    def _index_subtree(self, node) -> None:
+        """Adds a node and everything below it to the indexes.
+        """
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            self._index_node(node)
+            stack.extend(node._get_children())
+
+    def _unindex_subtree(self, node) -> None:
+        """Removes a node and everything below it from the indexes.
+        """
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            self._unindex_node(node)
+            stack.extend(node._get_children())
+
+    def _on_change(self, events: list) -> None:
+        """Keeps the indexes in step with a batch of changes to the program
+           state.
+        """
+        for event in events:
+            node = event.node
+            if event.field == CHILDREN:
+                if self._owns(node):
+                    for child in event.old:
+                        self._unindex_subtree(child)
+                    for child in event.new:
+                        self._index_subtree(child)
+            elif event.field in ("status", "trace") and id(node) in self.keys:
+                # Checked against the index rather than the tree, the node may
+                # have been removed by a later change of the same batch
+                self._unindex_node(node)
+                self._index_node(node)
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Definitions
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".spectrak", "cache")
+INDEX_FILE = "index.json"
+# Seconds an mtime may be off by: SFTP mtimes are whole seconds, plus one
+# for rounding. A file changed this close to when it was fetched can change
+# again without its size or mtime showing it.
+MTIME_GRANULARITY = 2
+
+class CacheEntry:
+    def __init__(
+        self, local_path: str, size: int, mtime: int, digest: str,
+        checked: float = 0.0) -> None:
+        """Creates an instance of the CacheEntry class which records what the
+           remote file looked like when the local copy was fetched.
+
+        Args:
+            local_path (str): Path of the local copy of the remote file.
+            size (int): Size of the remote file in bytes.
+            mtime (int): Modification time of the remote file.
+            digest (str): Checksum of the content.
+            checked (float, optional): time.time() when the content was last
+                                       known to have that size and mtime.
+                                       Defaults to never.
+        """
+        self.local_path = local_path
+        self.size = size
+        self.mtime = mtime
+        self.digest = digest
+        self.checked = checked
+
+    ############
+    #   Helpers
+    ############
+    def _is_racy(self) -> bool:
+        """Checks if the file may have changed again within its mtime, i.e.
+           it was last checked less than MTIME_GRANULARITY after it changed.
+        """
+        return self.checked <= self.mtime + MTIME_GRANULARITY
+
+    def _matches(self, attributes, checksum=None) -> bool:
+        """Checks the entry against a fresh stat of the remote file, much like
+           an HTTP If-Modified-Since check. Where the stat cannot tell, see
+           _is_racy, the content checksum decides.
+
+        Args:
+            attributes (paramiko.SFTPAttributes): stat of the remote file.
+            checksum (callable, optional): Returns the checksum of the remote
+                                           content. Without it an entry the
+                                           stat cannot vouch for does not
+                                           match.
+
+        Returns:
+            bool: True if the remote file is unchanged, false otherwise.
+        """
+        if self.size != attributes.st_size or \
+           self.mtime != attributes.st_mtime:
+            return False
+        if not self._is_racy():
+            return True
+        return checksum is not None and checksum() == self.digest
+
+class RemoteCache:
+    def __init__(self, cache_dir: str = CACHE_DIR) -> None:
+        """Creates an instance of the RemoteCache class which keeps local
+           copies of remote files keyed by host and path.
+
+        Args:
+            cache_dir (str, optional): Directory holding the copies and the
+                                       index. Defaults to CACHE_DIR.
+        """
+        self.cache_dir = cache_dir
+        self.entries = None
+        self.lock = threading.Lock()
+
+    ############
+    #   Getters
+    ############
+    def _get_key(
+        self, server_ip: str, server_port: int, remote_path: str) -> str:
+        """Gets the key of a remote file in the cache.
+
+        Args:
+            server_ip (str): ip of server
+            server_port (int): port to access
+            remote_path (str): file path of remote file
+
+        Returns:
+            str: Cache key.
+        """
+        return f"{server_ip}:{server_port}:{remote_path}"
+
+    def _get_local_path(self, key: str) -> str:
+        """Gets where the local copy of a remote file lives.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            str: Path of the local copy.
+        """
+        name = hashlib.md5(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, name)
+
+    def _get_entry(self, key: str) -> CacheEntry:
+        """Gets the entry of a remote file if its local copy still exists.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            CacheEntry: Cached entry, None if not cached.
+        """
+        with self.lock:
+            self._load_index()
+            entry = self.entries.get(key)
+        if entry is None or not os.path.exists(entry.local_path):
+            return None
+        return entry
+
+    ############
+    #   Helpers
+    ############
+    def _is_fresh(self, key: str, attributes, checksum=None) -> bool:
+        """Checks if the local copy is still the same as the remote file.
+
+        Args:
+            key (str): Cache key.
+            attributes (paramiko.SFTPAttributes): stat of the remote file.
+            checksum (callable, optional): See CacheEntry._matches.
+
+        Returns:
+            bool: True if the download can be skipped, false otherwise.
+        """
+        entry = self._get_entry(key)
+        return entry is not None and entry._matches(attributes, checksum)
+
+    def _store(
+        self, key: str, size: int, mtime: int, digest: str) -> CacheEntry:
+        """Records a freshly fetched local copy in the index.
+
+        Args:
+            key (str): Cache key.
+            size (int): Size of the remote file in bytes.
+            mtime (int): Modification time of the remote file.
+            digest (str): Checksum of the content.
+
+        Returns:
+            CacheEntry: The stored entry.
+        """
+        entry = CacheEntry(
+            self._get_local_path(key), size, mtime, digest, time.time()
+        )
+        with self.lock:
+            self._load_index()
+            self.entries[key] = entry
+            self._save_index()
+        return entry
+
+    def _invalidate(self, key: str) -> None:
+        """Forgets a remote file so the next fetch downloads it again.
+
+        Args:
+            key (str): Cache key.
+        """
+        with self.lock:
+            self._load_index()
+            if self.entries.pop(key, None) is not None:
+                self._save_index()
+
+    def _load_index(self) -> None:
+        """Loads the index from disk the first time it is needed. Must be
+           called with the lock held.
+        """
+        if self.entries is not None:
+            return
+        self.entries = {}
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # Missing or corrupt index only costs a download
+            return
+        for key, e in data.items():
+            self.entries[key] = CacheEntry(
+                e["local_path"], e["size"], e["mtime"], e["digest"],
+                e.get("checked", 0.0)
+            )
+
+    def _save_index(self) -> None:
+        """Writes the index to disk atomically. Must be called with the lock
+           held.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data = {}
+        for key, entry in self.entries.items():
+            data[key] = {
+                "local_path" : entry.local_path,
+                "size" : entry.size,
+                "mtime" : entry.mtime,
+                "digest" : entry.digest,
+                "checked" : entry.checked
+            }
+        path = os.path.join(self.cache_dir, INDEX_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+# Shared cache used by every FileIO unless one is passed in explicitly
+REMOTE_CACHE = RemoteCache()
@@ -1,5 +1,7 @@
 from system_req import SystemRequirement
 from checksum import checksum, hash_list
+from rollup import tally, move_children, move_status, percent_done
+from events import emit, CHILDREN
 
 class Requirement:
     def __init__(
@@ -26,6 +28,12 @@ class Requirement:
         self.description = description
         self.title = title
         self.SystemRequirement = SystemRequirement
+        # Set by the Project object holding this requirement
+        self.parent = None
+        for child in self.SystemRequirement:
+            child.parent = self
+        # Statuses of every object below this one
+        self.status_counts = tally(self.SystemRequirement)
 
     ############
     #   Setters
@@ -36,7 +44,9 @@ class Requirement:
         Args:
             title (str): Denotes the title of the requirement
         """
+        old = self.title
         self.title = title
+        emit(self, "title", old, title)
 
     def _set_description(self, description: str) -> None:
         """Sets the description of a requirement.
@@ -44,7 +54,9 @@ class Requirement:
         Args:
             description (str): Denotes the description of the requirement
         """
+        old = self.description
         self.description = description
+        emit(self, "description", old, description)
 
     def _set_status(self, status: str) -> bool:
         """Sets the status of a requirement.
@@ -59,7 +71,10 @@ class Requirement:
             'In Progress', 'Not Started', 'Under Review', 'Done'
         })
         if status in status_options:
+            old = self.status
             self.status = status
+            move_status(self, old, status)
+            emit(self, "status", old, status)
             return True
         else:
             return False
@@ -76,7 +91,14 @@ class Requirement:
             bool: Checks to ensure that the SystemRequirement is not empty.
         """
         if system_requirement is not None:
+            old = self.SystemRequirement
+            for child in old:
+                child.parent = None
+            for child in system_requirement:
+                child.parent = self
             self.SystemRequirement = system_requirement
+            move_children(self, old, system_requirement)
+            emit(self, CHILDREN, old, system_requirement)
             return True
         else:
             return False
@@ -117,6 +139,30 @@ class Requirement:
         """
         return self.SystemRequirement
 
+    def _get_children(self) -> list[SystemRequirement]:
+        """Gets the children of this requirement.
+
+        Returns:
+            list[SystemRequirement]: Children SystemRequirement objects.
+        """
+        return self.SystemRequirement
+
+    def _get_status_counts(self) -> dict:
+        """Gets the statuses of every object below this one.
+
+        Returns:
+            dict: Status to number of objects holding it.
+        """
+        return self.status_counts
+
+    def _get_percent_done(self) -> float:
+        """Gets how much of this requirement is done.
+
+        Returns:
+            float: Percentage from 0 to 100.
+        """
+        return percent_done(self)
+
     ############
     #   Helpers
     ############
@@ -129,9 +175,12 @@ class Requirement:
         Returns:
             bool: If system requirement was found or not.
         """
-        for sys_req in self.SystemRequirement:
+        for i, sys_req in enumerate(self.SystemRequirement):
             if sys_req.title == title:
-                self.SystemRequirement.remove(sys_req)
+                self.SystemRequirement.pop(i)
+                sys_req.parent = None
+                move_children(self, [sys_req], [])
+                emit(self, CHILDREN, [sys_req], [], i)
                 return True
         return False
 
@@ -0,0 +1,94 @@
+# Definitions
+DONE = "Done"
+
+def subtree_counts(node) -> dict:
+    """Counts the statuses of a node and everything below it.
+
+    Args:
+        node (unknown): Any object of the requirements hierarchy.
+
+    Returns:
+        dict: Status to number of objects holding it.
+    """
+    counts = dict(getattr(node, "status_counts", {}))
+    status = getattr(node, "status", None)
+    if status is not None:
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+def tally(children: list) -> dict:
+    """Counts the statuses of every object below a container from the counts
+       its children already hold.
+
+    Args:
+        children (list): Children of the container.
+
+    Returns:
+        dict: Status to number of descendants holding it.
+    """
+    counts = {}
+    for child in children:
+        for status, count in subtree_counts(child).items():
+            counts[status] = counts.get(status, 0) + count
+    return counts
+
+def adjust(node, counts: dict) -> None:
+    """Applies a change in descendant statuses to a container and every
+       container above it.
+
+    Args:
+        node (unknown): Lowest container affected, or None.
+        counts (dict): Status to change in count, may be negative.
+    """
+    while node is not None:
+        held = node.status_counts
+        for status, count in counts.items():
+            total = held.get(status, 0) + count
+            if total:
+                held[status] = total
+            else:
+                held.pop(status, None)
+        node = node.parent
+
+def move_children(node, removed: list, added: list) -> None:
+    """Updates the counts of a container and its ancestors once children have
+       been removed and/or added.
+
+    Args:
+        node (unknown): Container whose children changed.
+        removed (list): Children taken out.
+        added (list): Children put in.
+    """
+    counts = tally(added)
+    for status, count in tally(removed).items():
+        counts[status] = counts.get(status, 0) - count
+    adjust(node, counts)
+
+def move_status(node, old: str, new: str) -> None:
+    """Updates the counts above a node once its status changed.
+
+    Args:
+        node (unknown): Object whose status changed.
+        old (str): Previous status.
+        new (str): Current status.
+    """
+    if old != new:
+        adjust(node.parent, {old: -1, new: 1})
+
+def percent_done(node) -> float:
+    """Gets how much of a node is done, from the statuses below it or from its
+       own status when it has nothing below it.
+
+    Args:
+        node (unknown): Any object of the requirements hierarchy.
+
+    Returns:
+        float: Percentage from 0 to 100.
+    """
+    counts = getattr(node, "status_counts", None)
+    if not counts:
+        counts = subtree_counts(node)
+    total = sum(counts.values())
+    if total == 0:
+        return 0.0
+    return 100.0 * counts.get(DONE, 0) / total
@@ -0,0 +1,93 @@
+import threading
+from contextlib import contextmanager
+
+class ReadWriteLock:
+    def __init__(self) -> None:
+        """Creates an instance of the ReadWriteLock class. Any number of
+           threads may read at once, a writer waits for them and has the lock
+           to itself. Waiting writers go before new readers so a steady
+           stream of reads cannot starve edits. The writing thread may take
+           the lock again, for reading or writing.
+        """
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = None
+        self.writer_depth = 0
+        self.waiting_writers = 0
+        # Reads each thread holds, to let it read again while writers wait
+        self.local = threading.local()
+
+    ############
+    #   Helpers
+    ############
+    def _acquire_read(self) -> None:
+        """Takes the lock for reading, waiting for the writer if there is one.
+        """
+        me = threading.get_ident()
+        held = getattr(self.local, "reads", 0)
+        with self.condition:
+            if self.writer != me and held == 0:
+                while self.writer is not None or self.waiting_writers:
+                    self.condition.wait()
+            self.readers += 1
+        self.local.reads = held + 1
+
+    def _release_read(self) -> None:
+        """Gives back a read.
+        """
+        self.local.reads -= 1
+        with self.condition:
+            self.readers -= 1
+            if self.readers == 0:
+                self.condition.notify_all()
+
+    def _acquire_write(self) -> None:
+        """Takes the lock for writing, waiting for every reader to finish.
+
+        Raises:
+            RuntimeError: The thread holds a read, waiting would deadlock.
+        """
+        me = threading.get_ident()
+        with self.condition:
+            if self.writer == me:
+                self.writer_depth += 1
+                return
+            if getattr(self.local, "reads", 0):
+                raise RuntimeError("Cannot write while holding a read lock")
+            self.waiting_writers += 1
+            try:
+                while self.writer is not None or self.readers:
+                    self.condition.wait()
+            finally:
+                self.waiting_writers -= 1
+            self.writer = me
+            self.writer_depth = 1
+
+    def _release_write(self) -> None:
+        """Gives back a write.
+        """
+        with self.condition:
+            self.writer_depth -= 1
+            if self.writer_depth == 0:
+                self.writer = None
+                self.condition.notify_all()
+
+    @contextmanager
+    def _reading(self):
+        """Holds the lock for reading inside a with block.
+        """
+        self._acquire_read()
+        try:
+            yield
+        finally:
+            self._release_read()
+
+    @contextmanager
+    def _writing(self):
+        """Holds the lock for writing inside a with block.
+        """
+        self._acquire_write()
+        try:
+            yield
+        finally:
+            self._release_write()
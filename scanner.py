@@ -0,0 +1,283 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from state import State
+
+# Definitions
+SCAN_DIR = os.path.join(os.path.expanduser("~"), ".spectrak", "scan")
+SCAN_VERSION = 1
+TAG = b"REQ:"
+SOURCE_SUFFIXES = (
+    ".py", ".c", ".h", ".cc", ".cpp", ".hpp", ".cs", ".java", ".js", ".ts",
+    ".go", ".rs", ".rb", ".sh", ".lua", ".sql", ".kt", ".swift", ".m"
+)
+EXCLUDED_DIRS = {".git", ".hg", ".svn", "__pycache__", "node_modules", ".tox"}
+# Definitions closer than this below a tag are what the tag annotates
+LOOKAHEAD_LINES = 3
+ANNOTATION_PREFIXES = (b"@", b"#", b"//", b"/*", b"*", b"--", b";")
+# Fewer changed files than this are read in process, a pool costs more
+PARALLEL_THRESHOLD = 64
+# One pass finds both the tags in any comment style and the definitions
+# they get traced to. Lines may end in CRLF, $ only stops before the \n.
+PATTERN = re.compile(
+    rb"(?:#|//|/\*|--|;|\*)[ \t]*" + re.escape(TAG) +
+    rb"[ \t]*(?P<title>[^\r\n]*?)[ \t]*(?:\*/)?[ \t]*\r?$"
+    rb"|^[ \t]*(?:async[ \t]+)?(?:def|function|func|fn|sub)[ \t]+"
+    rb"(?P<name>[A-Za-z_]\w*)",
+    re.MULTILINE
+)
+
+def _only_annotations(between: bytes) -> bool:
+    """Checks that only blank lines, comments and decorators separate a tag
+       from the definition below it.
+    """
+    for line in between.splitlines()[1:]:
+        line = line.strip()
+        if line and not line.startswith(ANNOTATION_PREFIXES):
+            return False
+    return True
+
+def scan_file(path: str) -> list:
+    """Finds the requirement tags in one source file. Runs in the worker
+       processes so it only takes and returns plain data.
+
+    Args:
+        path (str): File to read.
+
+    Returns:
+        list: [title, line, trace] for every tag, trace being the name of the
+              definition just below the tag or else the one it sits in.
+    """
+    hits = []
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return hits
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # Most files have no tags, skip them without the regex
+                if mm.find(TAG) == -1:
+                    return hits
+                line = 1
+                position = 0
+                last_name = ""
+                pending = []
+                for match in PATTERN.finditer(mm):
+                    line += mm[position:match.start()].count(b"\n")
+                    position = match.start()
+                    name = match.group("name")
+                    if name is None:
+                        title = match.group("title").decode("utf-8", "replace")
+                        if title:
+                            hit = [title, line, last_name]
+                            hits.append(hit)
+                            pending.append((hit, match.end()))
+                        continue
+                    name = name.decode("utf-8", "replace")
+                    for hit, end in pending:
+                        if line - hit[1] <= LOOKAHEAD_LINES and \
+                           _only_annotations(mm[end:match.start()]):
+                            hit[2] = name
+                    pending = []
+                    last_name = name
+    except (OSError, ValueError):
+        # Unreadable files are treated as having no tags
+        return []
+    return hits
+
+class SourceScanner:
+    def __init__(
+        self, root: str, cache_path: str = None,
+        suffixes: tuple = SOURCE_SUFFIXES, max_workers: int = None) -> None:
+        """Creates an instance of the SourceScanner class which links source
+           code to LowLevel requirements. A comment such as
+           "# REQ: <LowLevel title>" tags the code below it.
+
+        Args:
+            root (str): Top of the source tree.
+            cache_path (str, optional): Where the results of the last scan are
+                                        kept. Defaults to a file under
+                                        SCAN_DIR named after the root.
+            suffixes (tuple, optional): File endings to read. Defaults to
+                                        SOURCE_SUFFIXES.
+            max_workers (int, optional): Most processes reading files.
+                                         Defaults to the number of CPUs.
+        """
+        self.root = os.path.abspath(root)
+        if cache_path is None:
+            name = hashlib.md5(self.root.encode("utf-8")).hexdigest()
+            cache_path = os.path.join(SCAN_DIR, name + ".json")
+        self.cache_path = cache_path
+        self.suffixes = tuple(suffixes)
+        self.max_workers = max_workers
+        # Relative path -> [size, mtime, hits]
+        self.files = {}
+        # Title -> [code_reference, trace] last written to the LowLevel
+        self.applied = {}
+        self._load_cache()
+
+    ############
+    #   Helpers
+    ############
+    def _walk(self):
+        """Lists the source files below the root.
+
+        Yields:
+            tuple: (relative path, size, mtime in nanoseconds)
+        """
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in EXCLUDED_DIRS:
+                                stack.append(entry.path)
+                        elif entry.name.endswith(self.suffixes):
+                            stat = entry.stat()
+                            yield (
+                                os.path.relpath(entry.path, self.root),
+                                stat.st_size, stat.st_mtime_ns
+                            )
+                    except OSError:
+                        continue
+
+    def _scan(self) -> dict:
+        """Brings the tags of every source file up to date, only reading the
+           files whose size or mtime changed since the last scan.
+
+        Returns:
+            dict: Title to its sorted list of (path, line, trace).
+        """
+        files = {}
+        changed = []
+        for path, size, mtime in self._walk():
+            known = self.files.get(path)
+            if known is not None and known[0] == size and known[1] == mtime:
+                files[path] = known
+            else:
+                files[path] = [size, mtime, []]
+                changed.append(path)
+        full_paths = [os.path.join(self.root, path) for path in changed]
+        if len(changed) < PARALLEL_THRESHOLD:
+            results = map(scan_file, full_paths)
+            self._store_results(files, changed, results)
+        else:
+            with ProcessPoolExecutor(self.max_workers) as executor:
+                results = executor.map(
+                    scan_file, full_paths,
+                    chunksize=max(1, len(changed) // 256)
+                )
+                self._store_results(files, changed, results)
+        self.files = files
+        links = {}
+        for path, (_, _, hits) in files.items():
+            for title, line, trace in hits:
+                links.setdefault(title, []).append((path, line, trace))
+        for hits in links.values():
+            hits.sort()
+        return links
+
+    def _store_results(self, files: dict, changed: list, results) -> None:
+        """Records the tags found in the changed files.
+        """
+        for path, hits in zip(changed, results):
+            files[path][2] = hits
+
+    def _apply(self, state: State, links: dict) -> list:
+        """Points every tagged LowLevel at its code. The first tag found wins
+           when a requirement is tagged in several places. References this
+           scanner wrote before whose tag is gone are cleared, anything
+           entered by hand is left alone. It edits the state, so it runs
+           through State._edit, see _update.
+
+        Args:
+            state (State): Program state holding the LowLevel objects.
+            links (dict): Result of _scan.
+
+        Returns:
+            list[LowLevel]: Requirements that were changed.
+        """
+        changed = []
+        applied = {}
+        stack = list(state.projects)
+        while stack:
+            node = stack.pop()
+            children = node._get_children()
+            if children:
+                stack.extend(children)
+                continue
+            if not hasattr(node, "trace"):
+                continue
+            hits = links.get(node.title)
+            previous = self.applied.get(node.title)
+            if hits:
+                path, line, trace = hits[0]
+                reference = f"{path}:{line}"
+                applied[node.title] = [reference, trace]
+                if node.code_reference != reference or node.trace != trace:
+                    node._set_code_reference(reference)
+                    node._set_trace(trace)
+                    changed.append(node)
+            elif previous is not None and \
+                 node.code_reference == previous[0] and \
+                 node.trace == previous[1]:
+                node._set_code_reference("None")
+                node._set_trace("")
+                changed.append(node)
+        self.applied = applied
+        return changed
+
+    def _update(self, state: State) -> Future:
+        """Scans the source tree, updates the LowLevel objects and saves the
+           results for the next scan. Safe to call from a background thread,
+           only the edit runs on the thread owning the state, in one
+           transaction.
+
+        Args:
+            state (State): Program state holding the LowLevel objects.
+
+        Returns:
+            Future: Requirements that were changed, once they were.
+        """
+        future = state._edit(self._apply, state, self._scan())
+        # What was applied is only known once the edit was made
+        future.add_done_callback(lambda _: self._save_cache())
+        return future
+
+    def _load_cache(self) -> None:
+        """Loads the results of the last scan of this root.
+        """
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # Missing or corrupt cache only costs a full scan
+            return
+        if data.get("version") != SCAN_VERSION or \
+           data.get("root") != self.root:
+            return
+        self.files = data.get("files", {})
+        self.applied = data.get("applied", {})
+
+    def _save_cache(self) -> None:
+        """Writes the results of this scan to disk atomically.
+        """
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        data = {
+            "version" : SCAN_VERSION,
+            "root" : self.root,
+            "files" : self.files,
+            "applied" : self.applied
+        }
+        with open(self.cache_path + ".tmp", "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(self.cache_path + ".tmp", self.cache_path)
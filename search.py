@@ -0,0 +1,396 @@
+import bisect
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+
+from state import State
+from query import QueryResult, preorder
+from checksum import file_checksum
+from events import subscribe, unsubscribe, CHILDREN
+
+# Definitions
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+TEXT_FIELDS = ("title", "description", "comment", "trace", "code_reference")
+INDEX_SUFFIX = ".search.json"
+INDEX_VERSION = 1
+RESULT_LIMIT = 50
+MAX_EXPANSIONS = 16
+
+def tokenize(text: str) -> list[str]:
+    """Splits text into lower case search tokens.
+
+    Args:
+        text (str): Text to split.
+
+    Returns:
+        list[str]: Tokens in order, repeats included.
+    """
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+def count_tokens(node) -> Counter:
+    """Counts the tokens over every searchable field of a node.
+
+    Args:
+        node (unknown): Project, Requirement, SystemRequirement, HighLevel or
+                        LowLevel object.
+
+    Returns:
+        Counter: Token to number of occurrences.
+    """
+    values = []
+    for field in TEXT_FIELDS:
+        value = getattr(node, field, None)
+        if value:
+            values.append(str(value))
+    return Counter(tokenize(" ".join(values)))
+
+class SearchResult(QueryResult):
+    def __init__(self, node, score: float) -> None:
+        """Creates an instance of the SearchResult class which is one ranked
+           match of a search.
+
+        Args:
+            node (unknown): Matching object.
+            score (float): Relevance, higher is better.
+        """
+        super().__init__(node)
+        self.score = score
+
+    ############
+    #   Getters
+    ############
+    def _get_score(self) -> float:
+        """Gets the relevance of the match.
+
+        Returns:
+            float: Relevance, higher is better.
+        """
+        return self.score
+
+class SearchIndex:
+    def __init__(self, state: State, path: str = None) -> None:
+        """Creates an instance of the SearchIndex class, an inverted index over
+           the text of every node. If path is the requirements file the state
+           was loaded from and a saved index for that exact file exists next
+           to it, the saved index is used instead of building a new one.
+
+        Args:
+            state (State): Program state to index.
+            path (str, optional): Requirements file the state was read from.
+        """
+        self.state = state
+        self.path = path
+        # token -> {id(node): term frequency}
+        self.postings = {}
+        # Sorted tokens for prefix lookups
+        self.vocabulary = []
+        # id(node) -> node
+        self.nodes = {}
+        # id(node) -> token counts it was indexed with. Batches reach the
+        # index after the changes were made, unindexing has to use these
+        # rather than what the node holds by then.
+        self.tokens = {}
+        if path is None or self._load() is False:
+            self._build()
+        subscribe(self._on_change)
+
+    ############
+    #   Helpers
+    ############
+    def _close(self) -> None:
+        """Stops following changes to the program state.
+        """
+        unsubscribe(self._on_change)
+
+    def _search(self, text: str, limit: int = RESULT_LIMIT) -> list:
+        """Finds the nodes containing every word of the text, the last word
+           being matched as a prefix so results follow typing.
+
+        Args:
+            text (str): What was typed.
+            limit (int, optional): Most results to return. Defaults to
+                                   RESULT_LIMIT.
+
+        Returns:
+            list[SearchResult]: Best matches first.
+        """
+        groups = self._groups(text, MAX_EXPANSIONS)
+        if not groups or limit <= 0:
+            return []
+        # Walk the nodes of the rarest word and only look the others up. Only
+        # the best limit matches are kept, smallest first, each with the
+        # order it was found in so ties go to the first found.
+        best = []
+        seen = set()
+        for posting, _ in groups[0]:
+            for key in posting:
+                if key in seen:
+                    continue
+                seen.add(key)
+                score = 0.0
+                for group in groups:
+                    found = False
+                    for other, idf in group:
+                        frequency = other.get(key)
+                        if frequency is not None:
+                            score += frequency * idf
+                            found = True
+                    if not found:
+                        break
+                else:
+                    item = (score, -len(seen), key)
+                    if len(best) < limit:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+        best.sort(reverse=True)
+        return [SearchResult(self.nodes[key], score) for score, _, key in best]
+
+    def _matches(self, text: str):
+        """Finds every node containing every word of the text, the last word
+           being matched as a prefix, without ranking or limit. Meant to be
+           consumed a bit at a time, e.g. by a filter: nothing is gathered up
+           front, and it copes with the index changing in between.
+
+        Args:
+            text (str): What was typed.
+
+        Yields:
+            unknown: Matching nodes, each once.
+        """
+        terms = tokenize(text)
+        if not terms:
+            return
+        prefix = None
+        if not text[-1:].isspace():
+            prefix = terms.pop()
+        postings = []
+        for term in terms:
+            if term not in self.postings:
+                return
+            postings.append(self.postings[term])
+        if postings:
+            # Walk the rarest word, look the others up
+            postings.sort(key=len)
+            for key in list(postings[0]):
+                if not all(key in other for other in postings[1:]):
+                    continue
+                node = self.nodes.get(key)
+                if node is None:
+                    continue
+                if prefix is None or any(
+                    token.startswith(prefix) for token in self.tokens[key]
+                ):
+                    yield node
+            return
+        # A single word being typed may stand for a great many tokens, take
+        # them one at a time
+        seen = set()
+        for token in self._expand(prefix, None):
+            for key in list(self.postings.get(token, ())):
+                if key in seen:
+                    continue
+                seen.add(key)
+                node = self.nodes.get(key)
+                if node is not None:
+                    yield node
+
+    def _groups(self, text: str, expansions: int) -> list:
+        """Gets the postings of each word of the text with their weights, the
+           rarest word first.
+
+        Args:
+            text (str): What was typed.
+            expansions (int): Most tokens the last word stands for, None for
+                              every token it prefixes.
+
+        Returns:
+            list: One list of (posting, idf) per word, empty if a word is
+                  not in the index.
+        """
+        terms = tokenize(text)
+        if not terms:
+            return []
+        total = max(len(self.nodes), 1)
+        groups = []
+        for i, term in enumerate(terms):
+            if i == len(terms) - 1 and not text[-1:].isspace():
+                tokens = self._expand(term, expansions)
+            else:
+                tokens = [term] if term in self.postings else []
+            if not tokens:
+                return []
+            groups.append([
+                (self.postings[token],
+                 math.log(1 + total / len(self.postings[token])))
+                for token in tokens
+            ])
+        groups.sort(key=lambda group: sum(len(p) for p, _ in group))
+        return groups
+
+    def _expand(self, prefix: str, limit: int = MAX_EXPANSIONS) -> list[str]:
+        """Gets the tokens starting with a prefix, keeping the most common
+           ones when there are more than limit.
+        """
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\uffff", start)
+        tokens = self.vocabulary[start:end]
+        if limit is not None and len(tokens) > limit:
+            tokens = heapq.nlargest(
+                limit, tokens, key=lambda t: len(self.postings[t])
+            )
+        return tokens
+
+    def _add_postings(self, node, frequencies: dict, sort: bool = True) -> None:
+        """Adds the token counts of one node to the postings.
+        """
+        key = id(node)
+        self.nodes[key] = node
+        self.tokens[key] = frequencies
+        for token, frequency in frequencies.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                if sort:
+                    bisect.insort(self.vocabulary, token)
+            posting[key] = frequency
+
+    def _remove_postings(self, node) -> None:
+        """Removes the token counts one node was indexed with from the
+           postings.
+        """
+        key = id(node)
+        self.nodes.pop(key, None)
+        for token in self.tokens.pop(key, ()):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(key, None)
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def _build(self) -> None:
+        """Indexes the whole program state, sorting the tokens once at the
+           end rather than on every insert.
+        """
+        for project in self.state.projects:
+            stack = [project]
+            while stack:
+                node = stack.pop()
+                self._add_postings(node, count_tokens(node), False)
+                stack.extend(node._get_children())
+        self.vocabulary = sorted(self.postings)
+
+    def _index_subtree(self, node) -> None:
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            self._add_postings(node, count_tokens(node))
+            stack.extend(node._get_children())
+
+    def _unindex_subtree(self, node) -> None:
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            self._remove_postings(node)
+            stack.extend(node._get_children())
+
+    def _owns(self, node) -> bool:
+        """Checks a changed node belongs to the indexed program state.
+        """
+        while node is not None:
+            if node is self.state:
+                return True
+            node = node.parent
+        return False
+
+    def _on_change(self, events: list) -> None:
+        """Keeps the index in step with a batch of changes to the program
+           state.
+        """
+        for event in events:
+            node = event.node
+            if event.field == CHILDREN:
+                if self._owns(node):
+                    for child in event.old:
+                        self._unindex_subtree(child)
+                    for child in event.new:
+                        self._index_subtree(child)
+            elif event.field in TEXT_FIELDS and id(node) in self.nodes:
+                # Checked against the index rather than the tree, the node may
+                # have been removed by a later change of the same batch
+                self._remove_postings(node)
+                self._add_postings(node, count_tokens(node))
+
+    ############
+    #   Persistence
+    ############
+    def _get_index_path(self) -> str:
+        """Gets where the index is saved, next to the requirements file.
+
+        Returns:
+            str: Path of the saved index.
+        """
+        return self.path + INDEX_SUFFIX
+
+    def _save(self) -> None:
+        """Saves the index next to the requirements file. Call it once the
+           state has been written to that file, the saved index is tied to the
+           file's checksum.
+        """
+        numbers = {}
+        for number, node in enumerate(preorder(self.state)):
+            numbers[id(node)] = number
+        postings = {}
+        for token, posting in self.postings.items():
+            postings[token] = [
+                list(map(numbers.__getitem__, posting)), list(posting.values())
+            ]
+        data = {
+            "version" : INDEX_VERSION,
+            "source" : file_checksum(self.path),
+            "postings" : postings
+        }
+        index_path = self._get_index_path()
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(index_path + ".tmp", index_path)
+
+    def _load(self) -> bool:
+        """Loads the saved index if it was saved for the current file.
+
+        Returns:
+            bool: True if the saved index was loaded, false otherwise.
+        """
+        try:
+            with open(self._get_index_path(), "r") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION or \
+               data.get("source") != file_checksum(self.path):
+                return False
+        except (OSError, ValueError):
+            return False
+        nodes = preorder(self.state)
+        keys = [id(node) for node in nodes]
+        postings = {}
+        try:
+            for token, (numbers, frequencies) in data["postings"].items():
+                postings[token] = dict(
+                    zip(map(keys.__getitem__, numbers), frequencies)
+                )
+        except (IndexError, KeyError, TypeError, ValueError):
+            # The state does not match the file the index was saved for
+            return False
+        tokens = dict((key, {}) for key in keys)
+        for token, posting in postings.items():
+            for key, frequency in posting.items():
+                tokens[key][token] = frequency
+        self.postings = postings
+        self.nodes = dict(zip(keys, nodes))
+        self.tokens = tokens
+        self.vocabulary = sorted(postings)
+        return True
@@ -0,0 +1,455 @@
+import collections
+import os
+import select
+import shlex
+import socket
+import subprocess
+import threading
+import time
+
+import paramiko
+
+# Definitions
+DEFAULT_USERNAME = "spectrak"
+DEFAULT_PASSWORD = "spectrak"
+RECV_SIZE = 65536
+
+class _ThrottledSocket:
+    def __init__(self, sock, latency: float, bandwidth: float) -> None:
+        """Wraps a socket so everything crossing it is delayed by a one way
+           latency and limited to a bandwidth, in both directions.
+
+        Args:
+            sock (socket.socket): Connected socket to wrap.
+            latency (float): One way delay in seconds.
+            bandwidth (float): Bytes per second per direction, None for no
+                               limit.
+        """
+        self.sock = sock
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.timeout = None
+        self._closed = False
+        self.condition = threading.Condition()
+        self.outgoing = collections.deque()
+        self.incoming = collections.deque()
+        self.link_free = {"out" : 0.0, "in" : 0.0}
+        threading.Thread(target=self._pump_out, daemon=True).start()
+        threading.Thread(target=self._pump_in, daemon=True).start()
+
+    def _due(self, direction: str, size: int) -> float:
+        """Works out when data put on the link now arrives at the other end.
+           Must be called with the condition held.
+        """
+        start = max(time.monotonic(), self.link_free[direction])
+        if self.bandwidth is not None:
+            start += size / self.bandwidth
+        self.link_free[direction] = start
+        return start + self.latency
+
+    def _pump_out(self) -> None:
+        """Sends queued data once it is due.
+        """
+        while True:
+            with self.condition:
+                while not self.outgoing and not self._closed:
+                    self.condition.wait()
+                if not self.outgoing:
+                    return
+                due, data = self.outgoing.popleft()
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                return
+
+    def _pump_in(self) -> None:
+        """Reads from the real socket and queues data until it is due.
+        """
+        while True:
+            try:
+                data = self.sock.recv(RECV_SIZE)
+            except OSError:
+                data = b""
+            with self.condition:
+                self.incoming.append([self._due("in", len(data)), data])
+                self.condition.notify_all()
+            if not data:
+                return
+
+    ############
+    #   socket interface used by paramiko
+    ############
+    def send(self, data) -> int:
+        with self.condition:
+            if self._closed:
+                raise OSError("Socket is closed")
+            self.outgoing.append((self._due("out", len(data)), bytes(data)))
+            self.condition.notify_all()
+        return len(data)
+
+    def sendall(self, data) -> None:
+        self.send(data)
+
+    def recv(self, size: int) -> bytes:
+        deadline = None if self.timeout is None \
+            else time.monotonic() + self.timeout
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if self.incoming and self.incoming[0][0] <= now:
+                    break
+                wait = None if deadline is None else deadline - now
+                if self.incoming:
+                    head = self.incoming[0][0] - now
+                    wait = head if wait is None else min(wait, head)
+                if wait is not None and wait <= 0:
+                    raise socket.timeout()
+                self.condition.wait(wait)
+            entry = self.incoming[0]
+            data = entry[1][:size]
+            entry[1] = entry[1][size:]
+            if not entry[1] and data:
+                self.incoming.popleft()
+            return data
+
+    def settimeout(self, timeout: float) -> None:
+        self.timeout = timeout
+
+    def gettimeout(self) -> float:
+        return self.timeout
+
+    def getpeername(self):
+        return self.sock.getpeername()
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def close(self) -> None:
+        with self.condition:
+            self._closed = True
+            self.condition.notify_all()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+class _StandInServer(paramiko.ServerInterface):
+    def __init__(self, stand_in) -> None:
+        """Answers the SSH level requests of one connection.
+
+        Args:
+            stand_in (SFTPStandIn): Server the connection belongs to.
+        """
+        self.stand_in = stand_in
+        self.root = stand_in.root
+
+    def get_allowed_auths(self, username: str) -> str:
+        return "password,publickey"
+
+    def check_auth_password(self, username: str, password: str) -> int:
+        if (username == self.stand_in.username and
+            password == self.stand_in.password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_auth_publickey(self, username: str, key) -> int:
+        if username == self.stand_in.username:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind: str, chanid: int) -> int:
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command: bytes) -> bool:
+        if self.stand_in.allow_exec is False:
+            return False
+        threading.Thread(
+            target=_run_exec, args=(channel, command, self.root), daemon=True
+        ).start()
+        return True
+
+def _run_exec(channel, command: bytes, cwd: str) -> None:
+    """Runs an exec request as a local process in the served directory,
+       wiring its stdin, stdout and stderr to the channel.
+    """
+    try:
+        process = subprocess.Popen(
+            shlex.split(command.decode("utf-8")), cwd=cwd,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    except OSError as e:
+        channel.sendall_stderr(f"{e}\n".encode("utf-8"))
+        channel.send_exit_status(127)
+        channel.close()
+        return
+
+    def feed() -> None:
+        try:
+            for data in iter(lambda: channel.recv(RECV_SIZE), b""):
+                process.stdin.write(data)
+        except OSError:
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    def drain(stream, send) -> None:
+        for data in iter(lambda: stream.read1(RECV_SIZE), b""):
+            send(data)
+
+    threads = [
+        threading.Thread(target=feed, daemon=True),
+        threading.Thread(
+            target=drain, args=(process.stdout, channel.sendall), daemon=True
+        ),
+        threading.Thread(
+            target=drain, args=(process.stderr, channel.sendall_stderr),
+            daemon=True
+        )
+    ]
+    for thread in threads:
+        thread.start()
+    status = process.wait()
+    threads[1].join()
+    threads[2].join()
+    channel.send_exit_status(status)
+    channel.close()
+
+class _StandInHandle(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(
+                os.fstat(self.readfile.fileno())
+            )
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def chattr(self, attr):
+        return paramiko.SFTP_OK
+
+class _StandInSFTP(paramiko.SFTPServerInterface):
+    def __init__(self, server: _StandInServer, *args, **kwargs) -> None:
+        """Serves SFTP requests from a local directory.
+
+        Args:
+            server (_StandInServer): SSH side of the connection.
+        """
+        super().__init__(server, *args, **kwargs)
+        self.root = server.root
+
+    def _local(self, path: str) -> str:
+        """Maps a remote path onto the served directory.
+        """
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def _errno(self, e: OSError) -> int:
+        return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def canonicalize(self, path: str) -> str:
+        return "/" + os.path.normpath(path).lstrip("/")
+
+    def list_folder(self, path: str):
+        try:
+            local = self._local(path)
+            folder = []
+            for name in os.listdir(local):
+                attr = paramiko.SFTPAttributes.from_stat(
+                    os.stat(os.path.join(local, name))
+                )
+                attr.filename = name
+                folder.append(attr)
+            return folder
+        except OSError as e:
+            return self._errno(e)
+
+    def stat(self, path: str):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local(path)))
+        except OSError as e:
+            return self._errno(e)
+
+    def lstat(self, path: str):
+        try:
+            return paramiko.SFTPAttributes.from_stat(
+                os.lstat(self._local(path))
+            )
+        except OSError as e:
+            return self._errno(e)
+
+    def open(self, path: str, flags: int, attr):
+        local = self._local(path)
+        try:
+            fd = os.open(local, flags | getattr(os, "O_BINARY", 0), 0o644)
+        except OSError as e:
+            return self._errno(e)
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        try:
+            f = os.fdopen(fd, mode)
+        except OSError as e:
+            os.close(fd)
+            return self._errno(e)
+        handle = _StandInHandle(flags)
+        handle.filename = local
+        handle.readfile = f
+        handle.writefile = f
+        return handle
+
+    def remove(self, path: str) -> int:
+        try:
+            os.remove(self._local(path))
+        except OSError as e:
+            return self._errno(e)
+        return paramiko.SFTP_OK
+
+    def rename(self, oldpath: str, newpath: str) -> int:
+        # Plain SFTP rename refuses to overwrite
+        if os.path.exists(self._local(newpath)):
+            return paramiko.SFTP_FAILURE
+        return self.posix_rename(oldpath, newpath)
+
+    def posix_rename(self, oldpath: str, newpath: str) -> int:
+        try:
+            os.replace(self._local(oldpath), self._local(newpath))
+        except OSError as e:
+            return self._errno(e)
+        return paramiko.SFTP_OK
+
+    def mkdir(self, path: str, attr) -> int:
+        try:
+            os.mkdir(self._local(path))
+        except OSError as e:
+            return self._errno(e)
+        return paramiko.SFTP_OK
+
+    def rmdir(self, path: str) -> int:
+        try:
+            os.rmdir(self._local(path))
+        except OSError as e:
+            return self._errno(e)
+        return paramiko.SFTP_OK
+
+    def chattr(self, path: str, attr) -> int:
+        return paramiko.SFTP_OK
+
+class SFTPStandIn:
+    def __init__(
+        self, root: str, username: str = DEFAULT_USERNAME,
+        password: str = DEFAULT_PASSWORD, latency: float = 0.0,
+        bandwidth: float = None, allow_exec: bool = True) -> None:
+        """Creates an instance of the SFTPStandIn class, an in-process SSH/SFTP
+           server on a loopback port for measuring and testing FileIO without
+           a real server. Remote paths are relative to root, and exec requests
+           (used by the delta transfer) run locally with root as their working
+           directory, so use relative remote paths.
+
+        Args:
+            root (str): Directory to serve.
+            username (str, optional): Accepted user. Defaults to
+                                      DEFAULT_USERNAME.
+            password (str, optional): Accepted password. Defaults to
+                                      DEFAULT_PASSWORD.
+            latency (float, optional): Injected one way latency in seconds.
+                                       Defaults to 0.0.
+            bandwidth (float, optional): Injected bandwidth limit in bytes per
+                                         second, None for no limit.
+            allow_exec (bool, optional): Whether exec requests are served.
+                                         Defaults to True.
+        """
+        self.root = root
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.allow_exec = allow_exec
+        self.host_key = None
+        self.listener = None
+        self.port = None
+        self.transports = []
+        self.lock = threading.Lock()
+
+    ############
+    #   Helpers
+    ############
+    def _start(self) -> int:
+        """Starts listening on a free loopback port.
+
+        Returns:
+            int: Port the server listens on.
+        """
+        if self.host_key is None:
+            self.host_key = paramiko.RSAKey.generate(2048)
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(16)
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self.port
+
+    def _accept(self) -> None:
+        """Accepts connections until the server is stopped.
+        """
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(
+                target=self._serve, args=(sock,), daemon=True
+            ).start()
+
+    def _serve(self, sock) -> None:
+        """Runs the SSH side of one connection.
+        """
+        # Ping checks connect and hang up straight away, skip those quietly
+        readable, _, _ = select.select([sock], [], [], 1.0)
+        try:
+            if readable and not sock.recv(1, socket.MSG_PEEK):
+                sock.close()
+                return
+        except OSError:
+            sock.close()
+            return
+        if self.latency > 0 or self.bandwidth is not None:
+            sock = _ThrottledSocket(sock, self.latency, self.bandwidth)
+        transport = paramiko.Transport(sock)
+        transport.add_server_key(self.host_key)
+        transport.set_subsystem_handler(
+            "sftp", paramiko.SFTPServer, _StandInSFTP
+        )
+        with self.lock:
+            self.transports.append(transport)
+        try:
+            transport.start_server(server=_StandInServer(self))
+        except (paramiko.SSHException, EOFError, OSError):
+            transport.close()
+
+    def _drop_connections(self) -> None:
+        """Cuts every open connection, as a network failure would.
+        """
+        with self.lock:
+            transports, self.transports = self.transports, []
+        for transport in transports:
+            transport.close()
+
+    def _stop(self) -> None:
+        """Stops listening and cuts every open connection.
+        """
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        self._drop_connections()
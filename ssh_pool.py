@@ -0,0 +1,404 @@
+import threading
+import time
+import os
+
+from lazy import load_module
+
+# Definitions
+KEEPALIVE_INTERVAL = 30
+IDLE_TIMEOUT = 300
+CONNECT_TIMEOUT = 10
+
+# Imported by _load_paramiko once the first connection is made
+paramiko = None
+
+def _load_paramiko() -> None:
+    """Imports paramiko, code that never connects does not pay for it.
+    """
+    global paramiko
+    if paramiko is None:
+        paramiko = load_module("paramiko")
+
+class PooledSession:
+    def __init__(self, ssh_session, sftp_session) -> None:
+        """Creates an instance of the PooledSession class which holds a live
+           SSH transport and the SFTP channels opened on top of it. Each lease
+           of the session gets a channel of its own, so leases never share a
+           timeout or tear down each other's requests.
+
+        Args:
+            ssh_session (paramiko.SSHClient): Connected SSH client.
+            sftp_session (paramiko.SFTPClient): First SFTP channel of the
+                                                client.
+        """
+        self.ssh_session = ssh_session
+        # Channels of released leases, ready for the next lease
+        self.idle_channels = [sftp_session]
+        self.leases = 0
+        # Set once the pool no longer hands out leases of the session
+        self.retired = False
+        self.last_used = time.monotonic()
+
+    ############
+    #   Helpers
+    ############
+    def _touch(self) -> None:
+        """Marks the session as just used so it is not evicted as idle.
+        """
+        self.last_used = time.monotonic()
+
+    def _idle_for(self) -> float:
+        """Gets how long the session has been sitting unused.
+
+        Returns:
+            float: Seconds since the session was last used.
+        """
+        return time.monotonic() - self.last_used
+
+    def _is_alive(self) -> bool:
+        """Checks the health of the session without a round trip to the server.
+
+        Returns:
+            bool: True if the transport is still active, false otherwise.
+        """
+        transport = self.ssh_session.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            # Cheap write on the transport, surfaces dead sockets immediately
+            transport.send_ignore()
+        except Exception:
+            return False
+        return True
+
+    def _close(self) -> None:
+        """Closes the idle SFTP channels and the SSH transport.
+        """
+        for channel in self.idle_channels:
+            try:
+                channel.close()
+            except Exception:
+                pass
+        self.idle_channels = []
+        try:
+            self.ssh_session.close()
+        except Exception:
+            pass
+
+class SessionLease:
+    def __init__(self, key: tuple, session: PooledSession, sftp_session,
+                 timeout: float) -> None:
+        """Creates an instance of the SessionLease class, one user's hold on a
+           pooled session. The SFTP channel is the lease holder's alone until
+           the lease is released or discarded.
+
+        Args:
+            key (tuple): (server, port, user) of the session.
+            session (PooledSession): Session leased.
+            sftp_session (paramiko.SFTPClient): Channel of the lease.
+            timeout (float): Seconds requests on the channel wait at most.
+        """
+        self.key = key
+        self.session = session
+        self.ssh_session = session.ssh_session
+        self.sftp_session = sftp_session
+        self.timeout = timeout
+        # Set once released or discarded, ending it again does nothing
+        self.ended = False
+
+    ############
+    #   Helpers
+    ############
+    def _is_alive(self) -> bool:
+        """Checks the lease can still be used.
+
+        Returns:
+            bool: True if its channel and transport are open, false otherwise.
+        """
+        if self.ended or self.session.retired or \
+           self.sftp_session.get_channel().closed:
+            return False
+        return self.session._is_alive()
+
+    def _set_timeout(self, timeout: float) -> None:
+        """Changes how long requests on the lease wait at most.
+        """
+        self.timeout = timeout
+        self.sftp_session.get_channel().settimeout(timeout)
+
+class SessionPool:
+    def __init__(
+        self, keepalive: int = KEEPALIVE_INTERVAL,
+        idle_timeout: int = IDLE_TIMEOUT) -> None:
+        """Creates an instance of the SessionPool class which keeps SSH/SFTP
+           sessions alive between remote file operations, keyed by
+           (server, port, user). Sessions are handed out as leases, a session
+           is only closed once nobody holds a lease on it.
+
+        Args:
+            keepalive (int, optional): Seconds between SSH keepalive packets.
+                                       Defaults to KEEPALIVE_INTERVAL.
+            idle_timeout (int, optional): Seconds a session may sit unused
+                                          before it is closed. Defaults to
+                                          IDLE_TIMEOUT.
+        """
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.connect_locks = {}
+        self.lock = threading.Lock()
+
+    ############
+    #   Getters
+    ############
+    def _get_live_session(
+        self, key: tuple, timeout: float = CONNECT_TIMEOUT) -> SessionLease:
+        """Leases a healthy pooled session for the key, retiring it if it died.
+
+        Args:
+            key (tuple): (server, port, user) of the session.
+            timeout (float, optional): Seconds requests on the lease wait at
+                                       most. Defaults to CONNECT_TIMEOUT.
+
+        Raises:
+            paramiko.SSHException: If a channel could not be opened.
+
+        Returns:
+            SessionLease: Lease on a live session, None if there is none.
+        """
+        self._evict_idle()
+        with self.lock:
+            session = self.sessions.get(key)
+        if session is None:
+            return None
+        if session._is_alive() is False:
+            self._retire(key, session)
+            return None
+        return self._lease(key, session, timeout)
+
+    def _get_session(
+        self, server_ip: str, server_port: int, username: str,
+        password: str, private_key_path: str,
+        timeout: int = CONNECT_TIMEOUT) -> SessionLease:
+        """Leases a live session for the server, connecting only if the pool
+           has no healthy session for it.
+
+        Args:
+            server_ip (str): ip of server
+            server_port (int): port to access
+            username (str): username of the remote server.
+            password (str): password of the remote server
+            private_key_path (str): path to private key locally
+            timeout (int, optional): Seconds to wait on connect and on each
+                                     request of the lease. Defaults to
+                                     CONNECT_TIMEOUT.
+
+        Raises:
+            paramiko.SSHException: If the connection could not be established.
+
+        Returns:
+            SessionLease: Lease on a live session for the server.
+        """
+        _load_paramiko()
+        key = (server_ip, server_port, username)
+        lease = self._get_live_session(key, timeout)
+        if lease is not None:
+            return lease
+        # Only one thread connects to a server, the others wait and share it
+        with self._get_connect_lock(key):
+            lease = self._get_live_session(key, timeout)
+            if lease is not None:
+                return lease
+            session = self._connect(
+                server_ip, server_port, username, password, private_key_path,
+                timeout
+            )
+            with self.lock:
+                self.sessions[key] = session
+        return self._lease(key, session, timeout)
+
+    def _get_connect_lock(self, key: tuple) -> threading.Lock:
+        """Gets the lock serializing connects to one server.
+
+        Args:
+            key (tuple): (server, port, user) of the session.
+
+        Returns:
+            threading.Lock: Lock for the key.
+        """
+        with self.lock:
+            return self.connect_locks.setdefault(key, threading.Lock())
+
+    ############
+    #   Helpers
+    ############
+    def _connect(
+        self, server_ip: str, server_port: int, username: str,
+        password: str, private_key_path: str,
+        timeout: int) -> PooledSession:
+        """Opens a new SSH transport and SFTP channel.
+
+        Raises:
+            paramiko.SSHException: If the connection could not be established.
+
+        Returns:
+            PooledSession: Newly opened session.
+        """
+        _load_paramiko()
+        ssh_session = paramiko.SSHClient()
+        ssh_session.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            if private_key_path is None:
+                ssh_session.connect(
+                    hostname=server_ip,
+                    username=username,
+                    password=password,
+                    port=server_port,
+                    timeout=timeout,
+                    banner_timeout=timeout,
+                    auth_timeout=timeout
+                )
+            else:
+                private_key = paramiko.RSAKey.from_private_key_file(
+                    os.path.abspath(private_key_path)
+                )
+                ssh_session.connect(
+                    hostname=server_ip,
+                    username=username,
+                    pkey=private_key,
+                    port=server_port,
+                    timeout=timeout,
+                    banner_timeout=timeout,
+                    auth_timeout=timeout
+                )
+            ssh_session.get_transport().set_keepalive(self.keepalive)
+            sftp_session = ssh_session.open_sftp()
+        except Exception:
+            ssh_session.close()
+            raise
+        return PooledSession(ssh_session, sftp_session)
+
+    def _lease(
+        self, key: tuple, session: PooledSession,
+        timeout: float) -> SessionLease:
+        """Takes a lease on a session, with an idle channel of it or a new one.
+
+        Raises:
+            paramiko.SSHException: If a channel could not be opened.
+
+        Returns:
+            SessionLease: The lease.
+        """
+        with self.lock:
+            session.leases += 1
+            session._touch()
+            channel = session.idle_channels.pop() \
+                if session.idle_channels else None
+        try:
+            if channel is None or channel.get_channel().closed:
+                channel = session.ssh_session.open_sftp()
+            # The channel is this lease's alone, so is its timeout
+            channel.get_channel().settimeout(timeout)
+        except BaseException:
+            self._drop_lease(session)
+            raise
+        return SessionLease(key, session, channel, timeout)
+
+    def _release(self, lease: SessionLease) -> None:
+        """Hands a lease back, keeping its channel for the next lease.
+
+        Args:
+            lease (SessionLease): Lease that is done with.
+        """
+        channel = lease.sftp_session
+        with self.lock:
+            if lease.ended:
+                return
+            lease.ended = True
+            keep = not lease.session.retired and \
+                not channel.get_channel().closed
+            if keep:
+                lease.session.idle_channels.append(channel)
+        if not keep:
+            try:
+                channel.close()
+            except Exception:
+                pass
+        self._drop_lease(lease.session)
+
+    def _discard(self, lease: SessionLease) -> None:
+        """Gives up a lease after an error. Only its channel is closed, other
+           leases of the session carry on. The session itself is retired only
+           if its transport died, and closed once its last lease is gone.
+
+        Args:
+            lease (SessionLease): Lease that failed.
+        """
+        with self.lock:
+            if lease.ended:
+                return
+            lease.ended = True
+        try:
+            lease.sftp_session.close()
+        except Exception:
+            pass
+        if lease.session._is_alive() is False:
+            self._retire(lease.key, lease.session)
+        self._drop_lease(lease.session)
+
+    def _drop_lease(self, session: PooledSession) -> None:
+        """Counts a lease of a session as gone, closing a retired session
+           once nobody holds it.
+        """
+        with self.lock:
+            session.leases -= 1
+            session._touch()
+            close = session.retired and session.leases == 0
+        if close:
+            session._close()
+
+    def _retire(self, key: tuple, session: PooledSession) -> None:
+        """Stops leasing a session, e.g. because it died, and closes it unless
+           someone still holds a lease on it.
+
+        Args:
+            key (tuple): (server, port, user) of the session.
+            session (PooledSession): Session to retire.
+        """
+        with self.lock:
+            if self.sessions.get(key) is session:
+                del self.sessions[key]
+            session.retired = True
+            close = session.leases == 0
+        if close:
+            session._close()
+
+    def _evict_idle(self) -> None:
+        """Closes every session nobody holds a lease on that has been unused
+           for longer than the idle timeout.
+        """
+        with self.lock:
+            idle = [
+                key for key, session in self.sessions.items()
+                if session.leases == 0 and
+                session._idle_for() > self.idle_timeout
+            ]
+            evicted = [self.sessions.pop(key) for key in idle]
+            for session in evicted:
+                session.retired = True
+        for session in evicted:
+            session._close()
+
+    def _close_all(self) -> None:
+        """Closes every pooled session, leased or not, e.g. at exit.
+        """
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+            for session in sessions:
+                session.retired = True
+        for session in sessions:
+            session._close()
+
+# Shared pool used by every FileIO unless one is passed in explicitly
+SESSION_POOL = SessionPool()
@@ -1,5 +1,21 @@
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
 from project import Project
 from settings import Settings
+from checksum import checksum
+from rollup import tally, move_children, move_status, percent_done
+from persistent import (
+    FIELDS, Snapshot, History, from_model, to_model, invalidate
+)
+from rwlock import ReadWriteLock
+from events import (
+    emit, subscribe, unsubscribe, transaction, rollback, CHILDREN
+)
+
+# Definitions
+# Most edits undo can go back
+HISTORY_LIMIT = 100
 
 class State:
     def __init__(
@@ -17,6 +33,29 @@ class State:
         self.projects = projects
         self.username = username
         self.settings = settings
+        # The program state is the root of the hierarchy
+        self.parent = None
+        for project in self.projects:
+            project.parent = self
+        # Statuses of every object below this one
+        self.status_counts = tally(self.projects)
+        # Checksums of the projects as they were last read from disk
+        self.project_checksums = {}
+        # Persistent version of the tree handed out by snapshot(), only kept
+        # up to date once tracking started, see _track
+        self.root = None
+        # Undo and redo stacks of persistent versions, one step per change
+        # or transaction
+        self.history = None
+        # Events of the last undo or redo, they leave the objects they went
+        # through at a version already in the history
+        self.restore_events = []
+        self.snapshot_lock = threading.Lock()
+        # Held for reading by _read and for writing by _transaction
+        self.lock = ReadWriteLock()
+        # Runs a function on the thread the state belongs to, None to make
+        # edits on whatever thread asks for them
+        self.owner = None
 
     ############
     #   Setters
@@ -29,6 +68,17 @@ class State:
         """
         self.settings = settings
 
+    def _set_owner(self, owner) -> None:
+        """Sets how edits from other threads reach the thread the state
+           belongs to, e.g. the UI thread once Qt models show it.
+
+        Args:
+            owner (callable): Called from any thread with a function taking no
+                              arguments, runs it on the owning thread. None
+                              to run edits on the thread making them.
+        """
+        self.owner = owner
+
     def _set_username(self, username: str) -> None:
         """Sets the username of the user logged in.
 
@@ -43,7 +93,14 @@ class State:
         Args:
             projects (list[Project]): List of projects to set to program state.
         """
+        old = self.projects
+        for project in old:
+            project.parent = None
+        for project in projects:
+            project.parent = self
         self.projects = projects
+        move_children(self, old, projects)
+        emit(self, CHILDREN, old, projects)
 
     ############
     #   Getters
@@ -72,6 +129,30 @@ class State:
         """
         return self.projects
 
+    def _get_children(self) -> list[Project]:
+        """Gets the projects loaded to program state.
+
+        Returns:
+            list[Project]: List of the projects loaded to program state.
+        """
+        return self.projects
+
+    def _get_status_counts(self) -> dict:
+        """Gets the statuses of every object below this one.
+
+        Returns:
+            dict: Status to number of objects holding it.
+        """
+        return self.status_counts
+
+    def _get_percent_done(self) -> float:
+        """Gets how much of the loaded projects are done.
+
+        Returns:
+            float: Percentage from 0 to 100.
+        """
+        return percent_done(self)
+
     ############
     #   Helpers
     ############
@@ -82,6 +163,9 @@ class State:
             project (Project): Project object to append.
         """
         self.projects.append(project)
+        project.parent = self
+        move_children(self, [], [project])
+        emit(self, CHILDREN, [], [project], len(self.projects) - 1)
 
     def _remove_project(self, name: str) -> bool:
         """Removes a project in the program.
@@ -92,8 +176,301 @@ class State:
         Returns:
             bool: If the project was found or not.
         """
+        for i, project in enumerate(self.projects):
+            if project.title == name:
+                self.projects.pop(i)
+                project.parent = None
+                move_children(self, [project], [])
+                emit(self, CHILDREN, [project], [], i)
+                return True
+        return False
+
+
+    def _merge_projects(
+        self, projects: list[Project], checksums: dict = None) -> list[str]:
+        """Merges freshly read projects into the program state, only replacing
+           the projects whose content changed so everything else (and anything
+           holding on to it) is left alone.
+
+        Args:
+            projects (list[Project]): Projects as they are now on disk.
+            checksums (dict, optional): Title to checksum of the projects,
+                                        when already computed, e.g. by the
+                                        worker that read them.
+
+        Returns:
+            list[str]: Titles of the projects that were added, replaced or
+                       removed.
+        """
+        current = {}
         for project in self.projects:
-            if project.name == name:
-                self.projects.remove(project)
+            current[project.title] = project
+        changed = []
+        merged = []
+        known = checksums or {}
+        checksums = {}
+        for project in projects:
+            new_checksum = known.get(project.title)
+            if new_checksum is None:
+                new_checksum = checksum(project)
+            checksums[project.title] = new_checksum
+            existing = current.pop(project.title, None)
+            if existing is not None:
+                old_checksum = self.project_checksums.get(existing.title)
+                if old_checksum is None:
+                    old_checksum = checksum(existing)
+                if old_checksum == new_checksum:
+                    merged.append(existing)
+                    continue
+            merged.append(project)
+            changed.append(project.title)
+        # Whatever is left over no longer exists on disk
+        changed.extend(current.keys())
+        previous = list(self.projects)
+        kept = set(id(project) for project in merged)
+        removed = [p for p in self.projects if id(p) not in kept]
+        added = [p for p in merged if p.parent is not self]
+        for project in removed:
+            project.parent = None
+        for project in added:
+            project.parent = self
+        self.projects[:] = merged
+        self.project_checksums = checksums
+        if removed or added:
+            move_children(self, removed, added)
+            emit(self, CHILDREN, removed, added, previous=previous)
+        return changed
+
+    def snapshot(self) -> Snapshot:
+        """Gets a consistent read only view of the program state which other
+           threads can read while this one keeps editing. Taking one is O(1),
+           edits build a new version that shares everything they did not
+           touch. The first call starts tracking, see _track.
+
+        Returns:
+            Snapshot: The program state as of the last completed edit or
+                      transaction.
+        """
+        self._track()
+        return Snapshot(self.root, self.username, self.settings)
+
+    def undo(self) -> bool:
+        """Goes back to the version before the last change or transaction.
+           Only changes made once tracking started can be undone.
+
+        Returns:
+            bool: True if there was something to undo, false otherwise.
+        """
+        with self._transaction():
+            if self.history is None or not self.history._can_undo():
+                return False
+            self._restore(self.history._undo())
+        return True
+
+    def redo(self) -> bool:
+        """Goes forward to the version the last undo went back from. Any
+           other change drops what could be redone.
+
+        Returns:
+            bool: True if there was something to redo, false otherwise.
+        """
+        with self._transaction():
+            if self.history is None or not self.history._can_redo():
+                return False
+            self._restore(self.history._redo())
+        return True
+
+    def _track(self) -> None:
+        """Starts keeping the persistent version of the tree and the undo
+           history up to date. It builds the persistent version of the whole
+           tree, so make the first call on the editing thread, e.g. after
+           loading.
+        """
+        if self.root is None:
+            with self.snapshot_lock:
+                if self.root is None:
+                    self.root = from_model(self)
+                    self.history = History(self.root, HISTORY_LIMIT)
+                    subscribe(self._on_change)
+
+    def _close(self) -> None:
+        """Stops tracking, snapshot() starts it again. Call it once the state
+           is no longer used, it is otherwise told about every change.
+        """
+        with self.snapshot_lock:
+            unsubscribe(self._on_change)
+            self.root = None
+            self.history = None
+            self.restore_events = []
+            # Changes are not followed any more, what the objects keep would
+            # go stale
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                node.persistent = None
+                stack.extend(node._get_children())
+
+    def _owns(self, node) -> bool:
+        """Checks a changed node belongs to this program state.
+        """
+        while node is not None:
+            if node is self:
                 return True
+            node = node.parent
         return False
+
+    def _restore(self, root) -> None:
+        """Brings the model objects back to a persistent version of the tree,
+           in place and through events like any other edit. Objects are kept
+           wherever the tree still has a place for them, so references held
+           elsewhere (e.g. by the tree model or the dirty tracker) stay valid.
+           Only objects the current tree no longer has are built again.
+
+        Args:
+            root (PersistentNode): Version to go to, from the history.
+        """
+        before = dict(
+            (id(project), (project.title, getattr(project, "persistent", None)))
+            for project in self.projects
+        )
+        with transaction() as pending:
+            start = len(pending)
+            self._restore_node(self, root)
+            self.restore_events.extend(pending[start:])
+        unchanged = set(id(node) for _, node in before.values())
+        for project in self.projects:
+            if id(project.persistent) in unchanged:
+                continue
+            # Not as it was last read from disk any more
+            self.project_checksums.pop(project.title, None)
+            if id(project) in before:
+                self.project_checksums.pop(before[id(project)][0], None)
+
+    def _restore_node(self, model, node) -> None:
+        """Edits one model object and what is below it back to a persistent
+           node. Unchanged children are found by their version, the others
+           are paired up in order so an edited object is edited back rather
+           than replaced.
+        """
+        if getattr(model, "persistent", None) is node:
+            return
+        for field, value in zip(FIELDS[node.kind], node.values):
+            old = getattr(model, field)
+            if old != value:
+                setattr(model, field, value)
+                if field == "status":
+                    move_status(model, old, value)
+                emit(model, field, old, value)
+        children = model._get_children()
+        versions = dict(
+            (id(getattr(child, "persistent", None)), child)
+            for child in children
+        )
+        restored = [versions.pop(id(target), None) for target in node.children]
+        matched = set(id(child) for child in restored if child is not None)
+        spare = iter([child for child in children if id(child) not in matched])
+        for i, target in enumerate(node.children):
+            if restored[i] is not None:
+                continue
+            child = next(spare, None)
+            if child is None:
+                restored[i] = to_model(target)
+            else:
+                self._restore_node(child, target)
+                restored[i] = child
+        if len(restored) != len(children) or \
+           any(a is not b for a, b in zip(restored, children)):
+            previous = list(children)
+            kept = set(id(child) for child in restored)
+            removed = [c for c in children if id(c) not in kept]
+            added = [c for c in restored if c.parent is not model]
+            for child in removed:
+                child.parent = None
+            for child in added:
+                child.parent = model
+            children[:] = restored
+            move_children(model, removed, added)
+            emit(model, CHILDREN, removed, added, previous=previous)
+        model.persistent = node
+
+    def _on_change(self, events: list) -> None:
+        """Builds the next persistent version once a change or a whole
+           transaction is done, then swaps it in with a single assignment so
+           readers never see half of it. Each version is a step of the undo
+           history.
+        """
+        restored = set(id(event) for event in self.restore_events)
+        self.restore_events = []
+        for event in events:
+            # Events of every other state come here too, and an undo or redo
+            # already left its objects at their version from the history
+            if id(event) not in restored and self._owns(event.node):
+                invalidate(event.node)
+        if getattr(self, "persistent", None) is None:
+            self.history._commit(from_model(self))
+        self.root = self.persistent = self.history._get_root()
+
+    def _edit(self, func, *args) -> Future:
+        """Makes an edit from any thread. It runs inside a transaction, on the
+           owning thread if one was set, so background work only hands over
+           what it prepared and never changes the state under a reader or a
+           subscriber that is not thread safe.
+
+        Args:
+            func (callable): Called with args to make the edit.
+            args (unknown): Arguments of func.
+
+        Returns:
+            Future: Result of func, done once the edit was made. Do not wait
+                    on it from a thread the owner may be waiting on.
+        """
+        future = Future()
+
+        def run() -> None:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                with self._transaction():
+                    result = func(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        if self.owner is None:
+            run()
+        else:
+            self.owner(run)
+        return future
+
+    @contextmanager
+    def _read(self):
+        """Reads the live program state without an edit running alongside.
+           Any number of threads may read at once. Prefer snapshot() for long
+           reads, it does not hold edits back.
+
+        Yields:
+            State: This program state.
+        """
+        with self.lock._reading():
+            yield self
+
+    @contextmanager
+    def _transaction(self):
+        """Edits the program state as one unit. Other threads' reads and
+           transactions wait until it is done, the subscribers get every
+           change of it as one batch and, if the block raises, every change
+           is undone before the error is passed on and nobody is told.
+           Transactions may be nested, the outermost one commits.
+
+        Yields:
+            State: This program state.
+        """
+        with self.lock._writing():
+            with transaction() as pending:
+                start = len(pending)
+                try:
+                    yield self
+                except BaseException:
+                    rollback(pending[start:])
+                    del pending[start:]
+                    raise
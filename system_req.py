@@ -1,5 +1,7 @@
 from hl import HighLevel
 from checksum import checksum, hash_list
+from rollup import tally, move_children, move_status, percent_done
+from events import emit, CHILDREN
 
 class SystemRequirement:
     def __init__(
@@ -26,6 +28,12 @@ class SystemRequirement:
         self.description = description
         self.title = title
         self.HighLevel = HighLevel
+        # Set by the Requirement object holding this requirement
+        self.parent = None
+        for child in self.HighLevel:
+            child.parent = self
+        # Statuses of every object below this one
+        self.status_counts = tally(self.HighLevel)
 
     ############
     #   Setters
@@ -36,7 +44,9 @@ class SystemRequirement:
         Args:
             title (str): Denotes the title of the requirement
         """
+        old = self.title
         self.title = title
+        emit(self, "title", old, title)
 
     def _set_description(self, description: str) -> None:
         """Sets the description of a requirement.
@@ -44,7 +54,9 @@ class SystemRequirement:
         Args:
             description (str): Denotes the description of the requirement
         """
+        old = self.description
         self.description = description
+        emit(self, "description", old, description)
 
     def _set_status(self, status: str) -> bool:
         """Sets the status of a requirement.
@@ -59,7 +71,10 @@ class SystemRequirement:
             'In Progress', 'Not Started', 'Under Review', 'Done'
         })
         if status in status_options:
+            old = self.status
             self.status = status
+            move_status(self, old, status)
+            emit(self, "status", old, status)
             return True
         else:
             return False
@@ -74,7 +89,14 @@ class SystemRequirement:
             bool: Checks to make sure the HighLevel objects are not empty
         """
         if high_level is not None:
+            old = self.HighLevel
+            for child in old:
+                child.parent = None
+            for child in high_level:
+                child.parent = self
             self.HighLevel = high_level
+            move_children(self, old, high_level)
+            emit(self, CHILDREN, old, high_level)
             return True
         else:
             return False
@@ -116,6 +138,30 @@ class SystemRequirement:
         """
         return self.HighLevel
 
+    def _get_children(self) -> list[HighLevel]:
+        """Gets the children of this requirement.
+
+        Returns:
+            list[HighLevel]: Children HighLevel objects.
+        """
+        return self.HighLevel
+
+    def _get_status_counts(self) -> dict:
+        """Gets the statuses of every object below this one.
+
+        Returns:
+            dict: Status to number of objects holding it.
+        """
+        return self.status_counts
+
+    def _get_percent_done(self) -> float:
+        """Gets how much of this requirement is done.
+
+        Returns:
+            float: Percentage from 0 to 100.
+        """
+        return percent_done(self)
+
     ############
     #   Helpers
     ############
@@ -128,9 +174,12 @@ class SystemRequirement:
         Returns:
             bool: If the high level requirement was found or not.
         """
-        for hl in self.HighLevel:
+        for i, hl in enumerate(self.HighLevel):
             if hl.title == title:
-                self.HighLevel.remove(hl)
+                self.HighLevel.pop(i)
+                hl.parent = None
+                move_children(self, [hl], [])
+                emit(self, CHILDREN, [hl], [], i)
                 return True
         return False
     def __eq__(self, other) -> bool:
@@ -0,0 +1,96 @@
+import logging
+import os
+import sys
+import time
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Dropped connections are part of some tests, keep paramiko's logs quiet
+logging.getLogger("paramiko").addHandler(logging.NullHandler())
+
+@pytest.fixture
+def stand_in(tmp_path):
+    """In-process SFTP server serving a temporary directory.
+    """
+    from sftp_server import SFTPStandIn
+    root = tmp_path / "remote"
+    root.mkdir()
+    server = SFTPStandIn(str(root))
+    server._start()
+    yield server
+    server._stop()
+
+@pytest.fixture
+def make_file_io(stand_in, tmp_path):
+    """Makes FileIO objects for files served by the stand-in, sharing one
+       pool and cache unless told otherwise.
+    """
+    from file_io import FileIO
+    from remote_cache import RemoteCache
+    from sftp_server import DEFAULT_USERNAME, DEFAULT_PASSWORD
+    from ssh_pool import SessionPool
+    pool = SessionPool()
+    cache = RemoteCache(str(tmp_path / "cache"))
+
+    def make(remote_path="requirements.json", local_name="edited.json",
+             pool=pool, cache=cache):
+        return FileIO(
+            DEFAULT_USERNAME, DEFAULT_PASSWORD, None, remote_path,
+            "127.0.0.1", stand_in.port, str(tmp_path / local_name),
+            pool=pool, cache=cache
+        )
+    yield make
+    pool._close_all()
+
+@pytest.fixture
+def write_remote(stand_in):
+    """Writes a new version of a file served by the stand-in.
+    """
+    versions = []
+
+    def write(content: bytes, name="requirements.json") -> str:
+        path = os.path.join(stand_in.root, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        # SFTP mtimes are whole seconds, make every version stat differently
+        versions.append(None)
+        later = time.time() + 10 * len(versions)
+        os.utime(path, (later, later))
+        return path
+    return write
+
+@pytest.fixture
+def make_state():
+    """Makes a State with projects P<i> holding requirements R<j>, each with
+       one SR0 and HL0 and LowLevel items L<k>.
+    """
+    from state import State
+    from project import Project
+    from requirement import Requirement
+    from system_req import SystemRequirement
+    from hl import HighLevel
+    from ll import LowLevel
+
+    def make(projects=1, requirements=1, low_levels=3):
+        return State([
+            Project([
+                Requirement([SystemRequirement([HighLevel([
+                    LowLevel(f"L{k}", description=f"low {k}")
+                    for k in range(low_levels)
+                ], "HL0")], "SR0")], f"R{j}")
+                for j in range(requirements)
+            ], f"P{i}")
+            for i in range(projects)
+        ], "user", None)
+    return make
+
+@pytest.fixture(scope="session")
+def qt_app():
+    """Qt application for the tests that need an event loop.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
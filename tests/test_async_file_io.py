@@ -0,0 +1,36 @@
+import asyncio
+import os
+
+import pytest
+
+from async_file_io import AsyncFileIO, fetch_all
+from exception import RemoteTimeoutException
+
+def test_timeout_only_drops_its_own_lease(make_file_io, write_remote):
+    write_remote(os.urandom(4 * 1048576))
+    other = make_file_io(local_name="other.json")
+    other._require_sessions()
+    slow = make_file_io()
+    slow._require_sessions()
+    slow_lease = slow.lease
+    assert slow_lease.session is other.lease.session
+
+    async def run():
+        remote = AsyncFileIO(slow, timeout=0.001)
+        with pytest.raises(RemoteTimeoutException):
+            await remote.read()
+    asyncio.run(run())
+    assert slow_lease.ended
+    # The other user of the host still has a working lease
+    assert other.lease._is_alive()
+    assert other._stat_remote_file().st_size == 4 * 1048576
+
+def test_fetch_all_hands_leases_back(make_file_io, write_remote):
+    write_remote(b'{"projects": []}')
+    targets = [make_file_io(local_name=f"copy{i}.json") for i in range(3)]
+    results = asyncio.run(fetch_all(targets))
+    assert all(os.path.exists(path) for path in results)
+    for target in targets:
+        assert target.lease is None
+    sessions = list(targets[0].pool.sessions.values())
+    assert [session.leases for session in sessions] == [0]
@@ -0,0 +1,156 @@
+import json
+import os
+import subprocess
+import sys
+
+import cli
+from dictionify import LEVELS, dictionify
+from hl import HighLevel
+from json_read import HEADER_PREFIX, JsonReader
+from json_write import JsonWriter
+from ll import LowLevel
+from project import Project
+from requirement import Requirement
+from state import State
+from system_req import SystemRequirement
+
+def _state():
+    low = LowLevel("Parse", "reader.py", "Reads it", "Done", "", "read")
+    high = HighLevel([low], "Read", "Reading", "In Progress")
+    system = SystemRequirement([high], "Files", "File handling", "Not Started")
+    requirement = Requirement([system], "Storage", "Keep data", "Done")
+    return State(
+        [Project([requirement], "A", "First"), Project([], "B", "Second")],
+        "", None
+    )
+
+def _write(path):
+    with open(path, "w") as f:
+        JsonWriter(_state(), f)._write_json()
+
+def _read(path):
+    with open(path) as f:
+        return [dictionify(p) for p in JsonReader(f)._read_json()]
+
+def test_levels_match_what_is_written():
+    node = dictionify(_state().projects[0])
+    for name, fields, key in LEVELS:
+        expected = set(fields) | ({key} if key is not None else set())
+        assert set(node) == expected, name
+        if key is not None:
+            node = node[key][0]
+
+def test_validate(tmp_path, capsys):
+    good = tmp_path / "good.json"
+    _write(good)
+    assert cli.main(["validate", str(good)]) == cli.OK
+    bad = tmp_path / "bad.jsonl"
+    bad.write_text('{}\n{"title": "A", "requirements": {}}\n7\n')
+    assert cli.main(["validate", str(good), str(bad)]) == cli.FOUND
+    out = capsys.readouterr().out
+    assert "good.json: OK, 6 objects" in out
+    assert "A: Project misses 'description'" in out
+    assert "'requirements' is not a list" in out
+    assert "projects[1]: not an object" in out
+
+def test_stats_reports_bad_files_and_goes_on(tmp_path, capsys):
+    good = tmp_path / "good.json"
+    _write(good)
+    bad = tmp_path / "bad.json"
+    bad.write_text('{"projects": [{"title": "A"}, "B"]}')
+    missing = tmp_path / "missing.json"
+    code = cli.main([
+        "stats", "--json", str(bad), str(missing), str(good)
+    ])
+    assert code == cli.ERROR
+    captured = capsys.readouterr()
+    result = json.loads(captured.out)
+    assert result["path"] == str(good)
+    assert result["levels"]["LowLevel"] == {"Done": 1}
+    assert "projects[1]: not an object" in captured.err
+    assert "missing.json" in captured.err
+
+def test_export(tmp_path, capsys):
+    path = tmp_path / "requirements.json"
+    _write(path)
+    assert cli.main(["export", "--to", "jsonl", str(path)]) == cli.OK
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [row["level"] for row in rows] == [name for name, _, _ in LEVELS] \
+        + ["Project"]
+    assert rows[4]["path"] == "A/Storage/Files/Read/Parse"
+    assert rows[4]["code_reference"] == "reader.py"
+
+def test_convert_round_trips(tmp_path):
+    path = tmp_path / "requirements.json"
+    _write(path)
+    lines = tmp_path / "requirements.jsonl"
+    back = tmp_path / "back.json"
+    assert cli.main(["convert", "--to", "jsonl", str(path),
+                     "-o", str(lines)]) == cli.OK
+    assert len(lines.read_text().splitlines()) == 3
+    assert cli.main(["convert", "--to", "json", str(lines),
+                     "-o", str(back)]) == cli.OK
+    assert _read(back) == _read(path)
+    with open(back) as f:
+        assert JsonReader(f)._read_header() is not None
+
+def test_convert_without_header(tmp_path):
+    lines = tmp_path / "bare.jsonl"
+    project = dictionify(_state().projects[0])
+    lines.write_text("\n" + json.dumps(project) + "\n")
+    out = tmp_path / "bare.json"
+    assert cli.main(["convert", "--to", "json", str(lines),
+                     "-o", str(out)]) == cli.OK
+    assert json.loads(out.read_text()) == {"projects": [project]}
+    assert _read(out) == [project]
+    lines.write_text("\n")
+    assert cli.main(["convert", "--to", "json", str(lines),
+                     "-o", str(out)]) == cli.OK
+    assert json.loads(out.read_text()) == {"projects": []}
+
+def test_diff(tmp_path, capsys):
+    old = tmp_path / "old.json"
+    _write(old)
+    document = json.loads(old.read_text())
+    document["projects"][0]["description"] = "Changed"
+    document["projects"].pop()
+    new = tmp_path / "new.json"
+    new.write_text(json.dumps(document))
+    assert cli.main(["diff", str(old), str(old)]) == cli.OK
+    capsys.readouterr()
+    assert cli.main(["diff", str(old), str(new)]) == cli.FOUND
+    result = json.loads(capsys.readouterr().out)
+    assert result["removed"] == ["B"]
+    assert list(result["changed"]) == ["A"]
+
+def test_convert_writes_the_timestamp_first(tmp_path):
+    path = tmp_path / "old.json"
+    path.write_text(json.dumps({
+        "settings": None, "projects": [], "timestamp": 1.5
+    }))
+    out = tmp_path / "new.json"
+    assert cli.main(["convert", "--to", "json", str(path),
+                     "-o", str(out)]) == cli.OK
+    assert out.read_text().startswith(HEADER_PREFIX)
+    with open(out) as f:
+        assert JsonReader(f)._read_header() == {
+            "timestamp": 1.5, "settings": None
+        }
+    assert sorted(os.listdir(tmp_path)) == ["new.json", "old.json"]
+
+def test_closed_pipe_keeps_the_exit_code(tmp_path):
+    path = tmp_path / "big.json"
+    path.write_text(json.dumps({"projects": [
+        {"title": f"P{i}", "description": "x" * 100, "requirements": []}
+        for i in range(5000)
+    ]}))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, "cli.py", "export", str(path)], cwd=root,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    process.stdout.readline()
+    process.stdout.close()
+    assert process.wait(30) == cli.OK
+    assert process.stderr.read() == b""
+    process.stderr.close()
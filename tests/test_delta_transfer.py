@@ -0,0 +1,128 @@
+import os
+import shutil
+
+import pytest
+
+import delta
+from checksum import file_checksum
+from exception import RemoteConflictException
+
+SIZE = 300000
+
+def _read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def _edited(content: bytes, offset: int, data: bytes) -> bytes:
+    return content[:offset] + data + content[offset + len(data):]
+
+def test_patch_rebuilds_edited_file(tmp_path):
+    basis = os.urandom(SIZE)
+    target = _edited(basis, SIZE // 2, b"changed") + b"appended"
+    sig = delta.signature(basis)
+    ops = list(delta.delta(sig, target))
+    sent = sum(len(op[1]) for op in ops if op[0] == delta.OP_DATA)
+    assert sent < SIZE // 10
+    basis_path = tmp_path / "basis"
+    basis_path.write_bytes(basis)
+    out_path = tmp_path / "out"
+    with open(basis_path, "rb") as b, open(out_path, "wb") as out:
+        delta.patch(b, iter(ops), out, sig.block_size)
+    assert out_path.read_bytes() == target
+
+def test_delta_download_updates_stale_copy(stand_in, make_file_io, write_remote,
+                                           monkeypatch):
+    content = os.urandom(SIZE)
+    remote_path = write_remote(content)
+    file_io = make_file_io()
+    cached = file_io._fetch_remote_file()
+    assert _read(cached) == content
+
+    content = _edited(content, SIZE // 3, b"someone else")
+    write_remote(content)
+
+    def no_full_download(*args, **kwargs):
+        raise AssertionError("stale copy should be patched, not replaced")
+    monkeypatch.setattr(file_io, "_download_remote_file", no_full_download)
+    cached = file_io._fetch_remote_file()
+    assert _read(cached) == _read(remote_path)
+    entry = file_io.cache._get_entry(file_io._get_cache_key())
+    assert entry.digest == file_checksum(cached)
+    # No part file is left next to the cached copy
+    assert not [
+        name for name in os.listdir(os.path.dirname(cached))
+        if name.endswith(".part")
+    ]
+
+def test_delta_download_falls_back_without_exec(stand_in, make_file_io,
+                                                write_remote):
+    content = os.urandom(SIZE)
+    remote_path = write_remote(content)
+    file_io = make_file_io()
+    file_io._fetch_remote_file()
+    stand_in.allow_exec = False
+    write_remote(_edited(content, 10, b"edit"))
+    cached = file_io._fetch_remote_file()
+    assert _read(cached) == _read(remote_path)
+
+def test_delta_upload_sends_local_edit(make_file_io, write_remote,
+                                      monkeypatch):
+    content = os.urandom(SIZE)
+    remote_path = write_remote(content)
+    file_io = make_file_io()
+    base = file_io._fetch_remote_version()
+    shutil.copyfile(base.local_path, file_io.local_path)
+    with open(file_io.local_path, "r+b") as f:
+        f.seek(SIZE // 4)
+        f.write(b"ours")
+
+    def no_full_upload(*args, **kwargs):
+        raise AssertionError("edit should go up as a delta")
+    monkeypatch.setattr(file_io, "_replace_remote_file", no_full_upload)
+    file_io._push_local_file(file_io.local_path, base)
+    assert _read(remote_path) == _read(file_io.local_path)
+    # The pushed version is now the cached one, the next fetch is free
+    assert _read(file_io._fetch_remote_file()) == _read(remote_path)
+
+def test_delta_upload_falls_back_without_exec(stand_in, make_file_io,
+                                              write_remote):
+    content = os.urandom(SIZE)
+    remote_path = write_remote(content)
+    file_io = make_file_io()
+    base = file_io._fetch_remote_version()
+    shutil.copyfile(base.local_path, file_io.local_path)
+    with open(file_io.local_path, "r+b") as f:
+        f.write(b"ours")
+    stand_in.allow_exec = False
+    file_io._push_local_file(file_io.local_path, base)
+    assert _read(remote_path) == _read(file_io.local_path)
+    assert not [
+        name for name in os.listdir(stand_in.root) if name.endswith(".tmp")
+    ]
+
+
+def test_delta_upload_checks_base_on_the_server(make_file_io, write_remote,
+                                               monkeypatch):
+    content = os.urandom(SIZE)
+    remote_path = write_remote(content)
+    file_io = make_file_io()
+    base = file_io._fetch_remote_version()
+    shutil.copyfile(base.local_path, file_io.local_path)
+    with open(file_io.local_path, "r+b") as f:
+        f.write(b"ours")
+    theirs = _edited(content, SIZE // 2, b"theirs")
+    check_remote_base = file_io._check_remote_base
+
+    def colleague_saves_after_check(base):
+        check_remote_base(base)
+        write_remote(theirs)
+
+    def no_full_upload(*args, **kwargs):
+        raise AssertionError("the conflict should not fall back")
+    monkeypatch.setattr(
+        file_io, "_check_remote_base", colleague_saves_after_check
+    )
+    monkeypatch.setattr(file_io, "_replace_remote_file", no_full_upload)
+    with pytest.raises(RemoteConflictException):
+        file_io._push_local_file(file_io.local_path, base)
+    assert _read(remote_path) == theirs
@@ -0,0 +1,143 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from file_io import CHUNK_SIZE
+from exception import RemoteConflictException
+
+SIZE = 300000
+
+class _FullDisk:
+    def write(self, data):
+        raise OSError(28, "No space left on device")
+
+def test_transfer_does_not_retry_local_errors(make_file_io, write_remote,
+                                              monkeypatch):
+    write_remote(os.urandom(SIZE))
+    file_io = make_file_io()
+    file_io._require_sessions()
+    reconnects = []
+    monkeypatch.setattr(
+        file_io, "_close_sessions", lambda: reconnects.append(True)
+    )
+    with pytest.raises(OSError) as error:
+        file_io._transfer_remote_file(_FullDisk())
+    assert error.value.errno == 28
+    assert reconnects == []
+
+def test_transfer_resumes_after_dropped_connection(stand_in, make_file_io,
+                                                   write_remote, monkeypatch):
+    content = os.urandom(3 * CHUNK_SIZE)
+    write_remote(content)
+    file_io = make_file_io()
+    file_io._require_sessions()
+    reconnects = []
+    close_sessions = file_io._close_sessions
+
+    def count_reconnects():
+        reconnects.append(True)
+        close_sessions()
+    monkeypatch.setattr(file_io, "_close_sessions", count_reconnects)
+
+    def drop_once(offset, total):
+        if not reconnects and offset < total:
+            stand_in._drop_connections()
+    out = io.BytesIO()
+    file_io._transfer_remote_file(out, drop_once)
+    assert out.getvalue() == content
+    assert reconnects
+
+@pytest.mark.parametrize("push", ["_upload_file", "_push_local_file"])
+def test_push_conflicts_with_version_fetched_since(push, make_file_io,
+                                                   write_remote):
+    content = os.urandom(SIZE)
+    remote_path = write_remote(content)
+    editor = make_file_io()
+    base = editor._fetch_remote_version()
+    shutil.copyfile(base.local_path, editor.local_path)
+    with open(editor.local_path, "r+b") as f:
+        f.write(b"ours")
+    # A colleague saves, then a watcher on the same shared cache fetches it
+    theirs = content[:100] + b"theirs" + content[106:]
+    write_remote(theirs)
+    make_file_io(local_name="watcher.json")._fetch_remote_file()
+    with pytest.raises(RemoteConflictException):
+        getattr(editor, push)(editor.local_path, base)
+    with open(remote_path, "rb") as f:
+        assert f.read() == theirs
+
+def test_push_returns_base_of_next_push(make_file_io, write_remote):
+    write_remote(os.urandom(SIZE))
+    file_io = make_file_io()
+    base = file_io._fetch_remote_version()
+    shutil.copyfile(base.local_path, file_io.local_path)
+    for edit in (b"first", b"second"):
+        with open(file_io.local_path, "r+b") as f:
+            f.write(edit)
+        base = file_io._upload_file(file_io.local_path, base)
+    assert base.digest == file_io._fetch_remote_version().digest
+
+def test_paramiko_is_imported_on_first_connect(make_file_io, write_remote):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([
+        sys.executable, "-c",
+        "import sys, file_io, ssh_pool, async_file_io; "
+        "assert 'paramiko' not in sys.modules; "
+        "assert file_io.paramiko is None and ssh_pool.paramiko is None"
+    ], cwd=root, check=True)
+    write_remote(b"content")
+    targets = [make_file_io(local_name=f"edited{i}.json") for i in range(4)]
+    errors = []
+
+    def fetch(target):
+        try:
+            target._fetch_remote_file()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            target._release_sessions()
+    threads = [threading.Thread(target=fetch, args=(t,)) for t in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    import file_io
+    assert file_io.paramiko is sys.modules["paramiko"]
+
+def test_fetch_sees_edit_within_the_same_mtime(make_file_io, stand_in,
+                                               monkeypatch):
+    path = os.path.join(stand_in.root, "requirements.json")
+    now = int(time.time())
+    for content in (b"first", b"other"):
+        with open(path, "wb") as f:
+            f.write(content)
+        # Same size and the same whole second
+        os.utime(path, (now, now))
+        file_io = make_file_io()
+        with open(file_io._fetch_remote_file(), "rb") as f:
+            assert f.read() == content
+    # Once the second is long gone the stat is trusted again
+    entry = file_io.cache._get_entry(file_io._get_cache_key())
+    entry.checked = now + 60
+    monkeypatch.setattr(file_io, "_remote_checksum", None)
+    assert file_io._fetch_remote_version() is entry
+
+def test_errors_before_paramiko_is_loaded():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([
+        sys.executable, "-c",
+        "import file_io\n"
+        "target = file_io.FileIO('u', 'p', None, 'r', 'h', 22, 'l')\n"
+        "def fail(*args):\n"
+        "    raise ValueError('boom')\n"
+        "target._fetch_remote_file = fail\n"
+        "target._get_cached_file_handle()\n"
+    ], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout == "Operation error: boom\n"
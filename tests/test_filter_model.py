@@ -0,0 +1,98 @@
+import pytest
+from PyQt6.QtCore import QModelIndex
+
+from events import transaction
+from filter_model import FilterTreeModel
+from hl import HighLevel
+from ll import LowLevel
+from project import Project
+from requirement import Requirement
+from system_req import SystemRequirement
+
+def _shown(model, parent=QModelIndex()):
+    """Fetches every row below a parent and lists them as (title, rows).
+    """
+    if model.canFetchMore(parent):
+        model.fetchMore(parent)
+    rows = []
+    for row in range(model.rowCount(parent)):
+        index = model.index(row, 0, parent)
+        item = index.internalPointer()
+        assert item.row == row
+        assert item.parent_item.positions[row] == item.position
+        rows.append((model._get_node(index).title, _shown(model, index)))
+    return rows
+
+def _high_level(project):
+    return project.requirements[0].SystemRequirement[0].HighLevel[0]
+
+def _project(title, descriptions):
+    return Project([Requirement([SystemRequirement([HighLevel([
+        LowLevel(f"{title}-L{k}", description=description)
+        for k, description in enumerate(descriptions)
+    ], "HL0")], "SR0")], "R0")], title)
+
+@pytest.fixture
+def models(qt_app, make_state):
+    """A filter that follows the changes, and a way to build the one it
+       should match from scratch.
+    """
+    state = make_state(projects=3, low_levels=4)
+    model = FilterTreeModel(state)
+    model._set_filter(None, "low")
+    _shown(model)
+
+    def restart():
+        raise AssertionError("the filter ran again")
+    model._restart = restart
+    built = []
+
+    def fresh():
+        other = FilterTreeModel(state)
+        other._set_filter(None, "low")
+        built.append(other)
+        return _shown(other)
+    yield state, model, fresh
+    for other in [model] + built:
+        other.state_index._close()
+        other.search_index._close()
+        other._close()
+
+def test_removed_children_shift_the_rows(models):
+    state, model, fresh = models
+    _high_level(state.projects[0])._remove_low_level_requirement("L1")
+    assert _shown(model) == fresh()
+    state._remove_project("P1")
+    assert _shown(model) == fresh()
+    state.projects[0].requirements[0]._remove_system_requirement("SR0")
+    assert _shown(model) == fresh()
+    assert len(model.matches) == 4
+
+def test_added_children_are_checked(models):
+    state, model, fresh = models
+    state._append_project(_project("P3", ["low", "high"]))
+    assert _shown(model) == fresh()
+    high_level = _high_level(state.projects[1])
+    # Reordered as a whole, the rows follow the new order
+    high_level._set_low_levels(list(reversed(high_level.LowLevel)))
+    assert _shown(model) == fresh()
+    _high_level(state.projects[2])._set_low_levels(
+        _high_level(state.projects[2]).LowLevel + [LowLevel("new", "None")]
+    )
+    assert _shown(model) == fresh()
+
+def test_batch_of_moves_and_edits(models):
+    state, model, fresh = models
+    first = _high_level(state.projects[0])
+    second = _high_level(state.projects[2])
+    with transaction():
+        moved = first.LowLevel[2]
+        first._remove_low_level_requirement("L2")
+        moved._set_description("elsewhere")
+        second._set_low_levels([moved] + second.LowLevel)
+        first.LowLevel[0]._set_description("no match")
+        state._remove_project("P1")
+        state._append_project(_project("P4", ["low one", "low two"]))
+    assert _shown(model) == fresh()
+    moved._set_description("low again")
+    assert _shown(model) == fresh()
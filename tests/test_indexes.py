@@ -0,0 +1,67 @@
+from events import transaction
+from query import StateIndex
+from search import SearchIndex
+
+def _high_level(state):
+    return state.projects[0].requirements[0].SystemRequirement[0].HighLevel[0]
+
+def test_remove_then_edit_in_one_transaction(make_state):
+    state = make_state()
+    high_level = _high_level(state)
+    removed = high_level.LowLevel[1]
+    removed._set_description("alpha")
+    state_index = StateIndex(state)
+    search_index = SearchIndex(state)
+    assert state_index._count() == 7
+    with transaction():
+        high_level._remove_low_level_requirement("L1")
+        # Edited once out of the tree, the batch still names it
+        removed._set_status("Done")
+        removed._set_trace("gone")
+        removed._set_description("beta")
+    assert state_index._count() == 6
+    assert [r.node.title for r in state_index._query(level="LowLevel")] \
+        .count("L1") == 0
+    assert list(state_index._query(status="Done")) == []
+    assert list(state_index._query(trace="gone")) == []
+    assert search_index._search("alpha") == []
+    assert search_index._search("beta") == []
+    assert list(search_index._matches("alp")) == []
+    state_index._close()
+    search_index._close()
+
+def test_edit_then_remove_in_one_transaction(make_state):
+    state = make_state()
+    high_level = _high_level(state)
+    removed = high_level.LowLevel[1]
+    state_index = StateIndex(state)
+    search_index = SearchIndex(state)
+    with transaction():
+        removed._set_description("alpha")
+        removed._set_status("Done")
+        high_level._remove_low_level_requirement("L1")
+    assert state_index._count() == 6
+    assert list(state_index._query(status="Done")) == []
+    assert search_index._search("alpha") == []
+    assert sorted(r.node.title for r in search_index._search("low")) == \
+        ["L0", "L2"]
+    state_index._close()
+    search_index._close()
+
+def test_search_ranks_every_match(make_state):
+    state = make_state(low_levels=6000)
+    low_levels = state.projects[0].requirements[0].SystemRequirement[0] \
+        .HighLevel[0].LowLevel
+    # Indexed last, after more matches than used to be looked at
+    low_levels[0]._set_description("alpha alpha alpha")
+    low_levels[1]._set_description("alpha alpha")
+    for node in low_levels[2:]:
+        node._set_description("alpha")
+    search_index = SearchIndex(state)
+    try:
+        results = search_index._search("alpha", 3)
+    finally:
+        search_index._close()
+    assert [r.node for r in results[:2]] == [low_levels[0], low_levels[1]]
+    assert results[0]._get_score() > results[1]._get_score() > \
+        results[2]._get_score()
@@ -0,0 +1,56 @@
+import threading
+
+from events import subscribe, unsubscribe
+from scanner import SourceScanner, scan_file
+
+def _low_levels(state):
+    return state.projects[0].requirements[0].SystemRequirement[0] \
+        .HighLevel[0].LowLevel
+
+def test_update_edits_on_the_owner_thread(tmp_path, make_state):
+    source = tmp_path / "src"
+    source.mkdir()
+    (source / "a.py").write_text(
+        "# REQ: L0\ndef first():\n    pass\n# REQ: L2\ndef second():\n"
+    )
+    state = make_state()
+    handed_over = []
+    state._set_owner(handed_over.append)
+    batches = []
+    subscribe(batches.append)
+    try:
+        scanner = SourceScanner(
+            str(source), cache_path=str(tmp_path / "scan.json")
+        )
+        thread = threading.Thread(
+            target=lambda: handed_over.append(scanner._update(state))
+        )
+        thread.start()
+        thread.join()
+        run, future = handed_over
+        # Nothing changed until the owner ran the edit
+        assert not future.done()
+        assert _low_levels(state)[0].trace == ""
+        run()
+    finally:
+        unsubscribe(batches.append)
+    changed = future.result()
+    assert sorted(node.title for node in changed) == ["L0", "L2"]
+    low_levels = _low_levels(state)
+    assert low_levels[0].code_reference == "a.py:1"
+    assert low_levels[0].trace == "first"
+    assert low_levels[2].trace == "second"
+    # One transaction, one batch
+    assert len(batches) == 1
+    assert (tmp_path / "scan.json").exists()
+
+def test_scan_file_reads_crlf_sources(tmp_path):
+    path = tmp_path / "a.c"
+    path.write_bytes(
+        b"# REQ: L0\r\ndef first():\r\n    pass\r\n"
+        b"/* REQ: L1 */\r\n\r\nint second() {}\r\n"
+        b"// REQ: L2 \r\nfunction third() {}\r\n"
+    )
+    assert scan_file(str(path)) == [
+        ["L0", 1, "first"], ["L1", 4, "first"], ["L2", 7, "third"]
+    ]
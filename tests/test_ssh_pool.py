@@ -0,0 +1,68 @@
+import os
+
+from batch_fetch import fetch_many
+from ssh_pool import SessionPool
+
+SIZE = 100000
+
+def test_leases_have_their_own_channel_and_timeout(make_file_io,
+                                                   write_remote):
+    write_remote(os.urandom(SIZE))
+    first = make_file_io()
+    second = make_file_io(local_name="other.json")
+    first._require_sessions(5)
+    second._require_sessions(7)
+    assert first.lease.session is second.lease.session
+    assert first.sftp_session is not second.sftp_session
+    assert first.sftp_session.get_channel().gettimeout() == 5
+    assert second.sftp_session.get_channel().gettimeout() == 7
+
+def test_discarding_a_lease_leaves_others_running(make_file_io,
+                                                  write_remote):
+    write_remote(os.urandom(SIZE))
+    first = make_file_io()
+    second = make_file_io(local_name="other.json")
+    first._require_sessions()
+    second._require_sessions()
+    session = first.lease.session
+    first._close_sessions()
+    # The failed lease's channel is gone, the session and the other lease
+    # are not
+    assert second.lease._is_alive()
+    assert second._stat_remote_file().st_size == SIZE
+    first._require_sessions()
+    assert first.lease.session is session
+
+def test_idle_eviction_skips_leased_sessions(make_file_io, write_remote):
+    write_remote(os.urandom(SIZE))
+    file_io = make_file_io(pool=SessionPool(idle_timeout=0))
+    file_io._require_sessions()
+    file_io.pool._evict_idle()
+    assert file_io.lease._is_alive()
+    assert file_io._stat_remote_file().st_size == SIZE
+    session = file_io.lease.session
+    file_io._release_sessions()
+    file_io.pool._evict_idle()
+    assert session.retired
+    assert not session._is_alive()
+
+def test_released_channel_is_reused(make_file_io, write_remote):
+    write_remote(os.urandom(SIZE))
+    file_io = make_file_io()
+    file_io._require_sessions()
+    channel = file_io.sftp_session
+    file_io._release_sessions()
+    file_io._require_sessions()
+    assert file_io.sftp_session is channel
+
+def test_fetch_many_timeout_leaves_targets_alone(make_file_io, write_remote):
+    write_remote(os.urandom(SIZE))
+    targets = [
+        make_file_io(local_name=f"{i}.json") for i in range(4)
+    ]
+    for target in targets:
+        target.timeout = 9
+    results = fetch_many(targets, timeout=3)
+    assert all(result._succeeded() for result in results)
+    assert [target.timeout for target in targets] == [9, 9, 9, 9]
+    assert all(target.lease is None for target in targets)
@@ -0,0 +1,98 @@
+from events import subscribe, unsubscribe
+
+def _low_levels(project):
+    return project.requirements[0].SystemRequirement[0].HighLevel[0].LowLevel
+
+def test_undo_and_redo_restore_the_model(make_state):
+    state = make_state(projects=2)
+    state._track()
+    untouched = state.projects[1]
+    _low_levels(state.projects[0])[0]._set_status("Done")
+    with state._transaction():
+        _low_levels(state.projects[0])[1]._set_description("edited")
+        _low_levels(state.projects[0])[2]._set_status("Done")
+    assert state.status_counts["Done"] == 2
+
+    # The transaction is one step
+    edited = _low_levels(state.projects[0])
+    assert state.undo()
+    low_levels = _low_levels(state.projects[0])
+    assert low_levels == edited and \
+        all(a is b for a, b in zip(low_levels, edited))
+    assert low_levels[1].description == "low 1"
+    assert [node.status for node in low_levels] == \
+        ["Done", "Not Started", "Not Started"]
+    assert state.status_counts["Done"] == 1
+    assert state.projects[1] is untouched
+    assert state.projects[0].parent is state
+
+    assert state.undo()
+    assert state.status_counts.get("Done", 0) == 0
+    assert not state.undo()
+
+    assert state.redo()
+    assert state.redo()
+    low_levels = _low_levels(state.projects[0])
+    assert low_levels[1].description == "edited"
+    assert state.status_counts["Done"] == 2
+    assert not state.redo()
+    assert state.snapshot().projects[0] is state.history._get_root().children[0]
+
+def test_edit_after_undo_drops_redo(make_state):
+    state = make_state()
+    state._track()
+    _low_levels(state.projects[0])[0]._set_title("first")
+    assert state.undo()
+    _low_levels(state.projects[0])[0]._set_title("second")
+    assert not state.redo()
+    assert state.undo()
+    assert _low_levels(state.projects[0])[0].title == "L0"
+
+def test_changes_to_other_states_are_ignored(make_state):
+    state = make_state()
+    other = make_state()
+    snapshot = state.snapshot()
+    other.snapshot()
+    _low_levels(other.projects[0])[0]._set_title("other")
+    assert state.snapshot().root is snapshot.root
+    assert not state.undo()
+    assert other.undo()
+
+    state._close()
+    other._close()
+    _low_levels(state.projects[0])[0]._set_title("closed")
+    assert state.history is None
+    assert state.snapshot().projects[0].requirements[0].SystemRequirement[0] \
+        .HighLevel[0].LowLevel[0].title == "closed"
+    state._close()
+
+def test_undo_edits_the_objects_in_place(make_state):
+    state = make_state()
+    state._track()
+    high_level = state.projects[0].requirements[0].SystemRequirement[0] \
+        .HighLevel[0]
+    low_levels = list(high_level.LowLevel)
+    with state._transaction():
+        high_level._remove_low_level_requirement("L1")
+        low_levels[0]._set_title("renamed")
+    batches = []
+    subscribe(batches.append)
+    try:
+        assert state.undo()
+    finally:
+        unsubscribe(batches.append)
+    restored = high_level.LowLevel
+    assert [node.title for node in restored] == ["L0", "L1", "L2"]
+    # Only the removed one is new, the others are the same objects
+    assert restored[0] is low_levels[0] and restored[2] is low_levels[2]
+    assert restored[1].parent is high_level
+    assert state.projects[0].requirements[0].SystemRequirement[0] \
+        .HighLevel[0] is high_level
+    [events] = batches
+    assert [(event.node, event.field) for event in events] == \
+        [(low_levels[0], "title"), (high_level, "children")]
+    # Going back is not a new version, what was undone can be redone
+    assert state.redo()
+    assert [node.title for node in high_level.LowLevel] == ["renamed", "L2"]
+    assert high_level.LowLevel[0] is low_levels[0]
+    assert state.snapshot().root is state.history._get_root()
@@ -0,0 +1,80 @@
+import random
+
+from trace_index import TraceIndex
+
+def _low_levels(state):
+    return state.projects[0].requirements[0].SystemRequirement[0] \
+        .HighLevel[0].LowLevel
+
+def _titles(impact):
+    return sorted(node.title for node in impact["LowLevel"])
+
+def test_overlapping_matches_a_full_walk(make_state):
+    generator = random.Random(4)
+    state = make_state(low_levels=200)
+    references = {}
+    for node in _low_levels(state):
+        start = generator.randint(0, 400)
+        if start == 0:
+            reference = "src/a.py"
+        elif generator.random() < 0.5:
+            reference = f"src/a.py:{start}"
+        else:
+            reference = f"src/a.py:{start}-{start + generator.randint(0, 40)}"
+        node.code_reference = reference
+        references[node.title] = reference
+    index = TraceIndex(state)
+    starts = sorted(set(
+        int(reference.split(":")[1].split("-")[0])
+        for reference in references.values() if ":" in reference
+    ))
+
+    def covers(reference, first, last):
+        if ":" not in reference:
+            return True
+        lines = reference.split(":")[1]
+        start = int(lines.split("-")[0])
+        if "-" in lines:
+            end = int(lines.split("-")[1])
+        else:
+            following = [s for s in starts if s > start]
+            end = following[0] - 1 if following else float("inf")
+        return start <= last and end >= first
+    for _ in range(300):
+        first = generator.randint(1, 450)
+        last = first + generator.randint(0, 30)
+        expected = sorted(
+            title for title, reference in references.items()
+            if covers(reference, first, last)
+        )
+        assert _titles(index._impact({"src/a.py": [(first, last)]})) == \
+            expected
+
+def test_traces_are_indexed(make_state, tmp_path):
+    state = make_state()
+    first, second, third = _low_levels(state)
+    first._set_code_reference("src/a.py:10")
+    first._set_trace("parse")
+    second._set_trace("parse")
+    third._set_code_reference("src/b.py:5")
+    third._set_trace("render")
+    index = TraceIndex(state)
+    # Changed definitions match the trace in the file referenced, or in any
+    # file when the requirement names no file
+    assert _titles(index._impact([], {"src/a.py": ["parse"]})) == ["L0", "L1"]
+    assert _titles(index._impact([], {"src/c.py": ["parse"]})) == ["L1"]
+    assert _titles(index._impact([], ["render"])) == ["L2"]
+    third._set_trace("draw")
+    assert _titles(index._impact([], ["render"])) == []
+    assert _titles(index._impact([], ["draw"])) == ["L2"]
+    index._close()
+
+    path = tmp_path / "requirements.json"
+    path.write_text("{}")
+    saved = TraceIndex(state, str(path))
+    saved._save()
+    saved._close()
+    loaded = TraceIndex(state, str(path))
+    assert loaded._load()
+    assert _titles(loaded._impact([], ["parse"])) == ["L0", "L1"]
+    loaded._close()
@@ -0,0 +1,61 @@
+import threading
+
+from json_write import JsonWriter
+from project import Project
+from state import State
+from watcher import ChangeWatcher
+
+def test_check_errors_go_to_on_error(tmp_path, capsys):
+    path = tmp_path / "requirements.json"
+    path.write_text("not json\n")
+    errors = []
+    seen = threading.Event()
+
+    def on_error(e):
+        errors.append(e)
+        seen.set()
+    watcher = ChangeWatcher(
+        State([], "", None), local_path=str(path), interval=0.05,
+        on_error=on_error
+    )
+    watcher._start()
+    try:
+        assert seen.wait(5)
+    finally:
+        watcher._stop()
+    assert watcher.error is errors[0]
+    assert capsys.readouterr().out == ""
+
+def _write(path, titles):
+    state = State([Project([], title) for title in titles], "", None)
+    with open(path, "w") as f:
+        JsonWriter(state, f)._write_json()
+
+def test_reload_merges_on_the_owner_thread(tmp_path):
+    path = tmp_path / "requirements.json"
+    _write(path, ["A", "B"])
+    state = State([], "", None)
+    handed_over = []
+    state._set_owner(handed_over.append)
+    changes = []
+    watcher = ChangeWatcher(
+        state, local_path=str(path), on_change=changes.append
+    )
+    thread = threading.Thread(target=lambda: handed_over.append(
+        watcher._check()
+    ))
+    thread.start()
+    thread.join()
+    run, merged = handed_over
+    assert state.projects == []
+    # A reader holds the lock, the merge waits for it
+    with state._read():
+        blocked = threading.Thread(target=run)
+        blocked.start()
+        blocked.join(0.2)
+        assert blocked.is_alive()
+        assert state.projects == []
+    blocked.join()
+    assert merged.result() == ["A", "B"]
+    assert [p.title for p in state.projects] == ["A", "B"]
+    assert changes == [["A", "B"]]
@@ -0,0 +1,44 @@
+import os
+import threading
+
+from json_read import JsonReader
+from project import Project
+from state import State
+from workers import UiInvoker, Worker, write_file
+
+def test_invoker_runs_on_its_own_thread(qt_app):
+    invoker = UiInvoker()
+    ran_on = []
+    thread = threading.Thread(
+        target=invoker, args=(lambda: ran_on.append(threading.get_ident()),)
+    )
+    thread.start()
+    thread.join()
+    assert ran_on == []
+    qt_app.processEvents()
+    assert ran_on == [threading.get_ident()]
+
+def test_concurrent_writes_of_one_file(qt_app, tmp_path):
+    path = tmp_path / "requirements.json"
+    snapshots = [
+        State([Project([], f"P{i}-{j}") for j in range(200)], "", None)
+        .snapshot()
+        for i in range(4)
+    ]
+    errors = []
+
+    def save(snapshot):
+        try:
+            write_file(Worker(write_file), snapshot, str(path))
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=save, args=(s,)) for s in snapshots]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["requirements.json"]
+    with open(path) as f:
+        titles = [p.title for p in JsonReader(f)._read_json()]
+    assert titles in [[f"P{i}-{j}" for j in range(200)] for i in range(4)]
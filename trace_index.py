@@ -0,0 +1,444 @@
+import base64
+import bisect
+import hashlib
+import json
+import os
+import re
+
+from state import State
+from query import preorder
+from checksum import file_checksum
+from events import subscribe, unsubscribe, CHILDREN
+
+# Definitions
+INDEX_SUFFIX = ".trace.json"
+INDEX_VERSION = 1
+# "path", "path:line" or "path:start-end"
+REFERENCE_PATTERN = re.compile(
+    r"^(?P<path>[^:]+?)(?::(?P<start>\d+)(?:-(?P<end>\d+))?)?$"
+)
+BITS_PER_PATH = 10
+BLOOM_HASHES = 7
+LEVELS = ("LowLevel", "HighLevel", "SystemRequirement", "Requirement",
+          "Project")
+
+def normalize_path(path: str) -> str:
+    """Puts a source path in the form used as key, so paths from git and from
+       code references compare equal.
+
+    Args:
+        path (str): Path relative to the source root.
+
+    Returns:
+        str: Normalized path with forward slashes.
+    """
+    return os.path.normpath(path.strip()).replace(os.sep, "/")
+
+def parse_reference(code_reference: str) -> tuple:
+    """Splits a code reference into the file and lines it points at.
+
+    Args:
+        code_reference (str): Code reference of a LowLevel requirement.
+
+    Returns:
+        tuple: (path, start, end), start and end may be None. None if the
+               reference does not point into a source file.
+    """
+    if not code_reference or code_reference == "None" or \
+       "://" in code_reference:
+        return None
+    match = REFERENCE_PATTERN.match(code_reference.strip())
+    if match is None:
+        return None
+    start = match.group("start")
+    end = match.group("end")
+    return (
+        normalize_path(match.group("path")),
+        None if start is None else int(start),
+        None if end is None else int(end)
+    )
+
+class BloomFilter:
+    def __init__(
+        self, capacity: int, hashes: int = BLOOM_HASHES,
+        bits: bytearray = None) -> None:
+        """Creates an instance of the BloomFilter class, a compact set which
+           may wrongly claim to hold a key but never misses one it holds.
+
+        Args:
+            capacity (int): Number of keys it is sized for.
+            hashes (int, optional): Bits set per key. Defaults to BLOOM_HASHES.
+            bits (bytearray, optional): Saved bits to start from.
+        """
+        self.size = max(64, capacity * BITS_PER_PATH)
+        if bits is not None:
+            self.size = len(bits) * 8
+        self.hashes = hashes
+        self.capacity = capacity
+        self.count = 0
+        self.bits = bits if bits is not None else \
+            bytearray((self.size + 7) // 8)
+
+    ############
+    #   Helpers
+    ############
+    def _positions(self, key: str):
+        """Gets the bits of a key by double hashing one digest.
+        """
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def _add(self, key: str) -> None:
+        """Adds a key.
+
+        Args:
+            key (str): Key to add.
+        """
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def _is_full(self) -> bool:
+        """Checks if more keys were added than the filter was sized for, which
+           makes false positives more likely.
+
+        Returns:
+            bool: True if it should be rebuilt bigger, false otherwise.
+        """
+        return self.count > self.capacity
+
+    def __contains__(self, key: str) -> bool:
+        for position in self._positions(key):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+class TraceIndex:
+    def __init__(self, state: State, path: str = None) -> None:
+        """Creates an instance of the TraceIndex class which maps source files
+           and lines back to the LowLevel requirements whose code_reference
+           points there. If path is the requirements file the state was read
+           from and a saved index for that exact file exists next to it, the
+           saved index is used instead of building a new one.
+
+        Args:
+            state (State): Program state to index.
+            path (str, optional): Requirements file the state was read from.
+        """
+        self.state = state
+        self.path = path
+        # path -> sorted [(start line, explicit end line, id(node))]
+        self.by_path = {}
+        # id(node) -> (node, path, entry) for what is indexed
+        self.entries = {}
+        # path -> (starts, ends, longest, unbounded) of the table, see
+        # _get_spans
+        self.spans = {}
+        # Trace -> {id(node): node}, and id(node) -> trace
+        self.by_trace = {}
+        self.traces = {}
+        self.bloom = None
+        if path is None or self._load() is False:
+            for node in preorder(state):
+                self._add(node)
+            self._rebuild_bloom()
+        subscribe(self._on_change)
+
+    ############
+    #   Getters
+    ############
+    def _get_spans(self, path: str) -> tuple:
+        """Gets the lines each reference to a file covers, worked out again
+           only after the references to the file changed.
+
+        Args:
+            path (str): Indexed source path.
+
+        Returns:
+            tuple: (starts, ends, longest, unbounded), the start and last line
+                   of every row of the table, the longest bounded span and
+                   the rows running to the end of the file.
+        """
+        spans = self.spans.get(path)
+        if spans is not None:
+            return spans
+        table = self.by_path[path]
+        starts = [start for start, _, _ in table]
+        ends = [0] * len(table)
+        unbounded = []
+        longest = 0
+        following = float("inf")
+        current = None
+        # Walk from the end so the start of the next reference is known
+        for row in range(len(table) - 1, -1, -1):
+            start, end, _ = table[row]
+            if start != current:
+                if current is not None:
+                    following = current
+                current = start
+            if start == 0:
+                # Points at the whole file
+                end = float("inf")
+            elif end is None:
+                end = following - 1
+            ends[row] = end
+            if end == float("inf"):
+                unbounded.append(row)
+            else:
+                longest = max(longest, end - start)
+        spans = self.spans[path] = (starts, ends, longest, unbounded)
+        return spans
+
+    ############
+    #   Helpers
+    ############
+    def _close(self) -> None:
+        """Stops following changes to the program state.
+        """
+        unsubscribe(self._on_change)
+
+    def _impact(self, changes, functions=None) -> dict:
+        """Finds everything a set of source changes affects, e.g. the files of
+           one commit. Files no requirement points at are mostly turned away by
+           the Bloom filter before any lookup.
+
+        Args:
+            changes (dict or list): Path to a list of (start, end) changed line
+                                    ranges, or None for the whole file. A
+                                    plain list of paths means whole files.
+            functions (dict or list, optional): Path to the names of the
+                                                definitions changed in it, e.g.
+                                                from the hunk headers of git
+                                                diff, matched against the
+                                                trace of each requirement. A
+                                                plain list of names matches in
+                                                any file.
+
+        Returns:
+            dict: Class name to the affected objects of that level, LowLevel
+                  first then every ancestor up to Project, each listed once.
+        """
+        if not isinstance(changes, dict):
+            changes = dict.fromkeys(changes)
+        found = {}
+        for path, ranges in changes.items():
+            path = normalize_path(path)
+            if path not in self.bloom:
+                continue
+            table = self.by_path.get(path)
+            if not table:
+                continue
+            if ranges is None:
+                for _, _, key in table:
+                    found[key] = self.entries[key][0]
+                continue
+            for first, last in ranges:
+                for key in self._overlapping(path, first, last):
+                    found[key] = self.entries[key][0]
+        if functions is not None:
+            if not isinstance(functions, dict):
+                functions = {None: functions}
+            for path, names in functions.items():
+                if path is not None:
+                    path = normalize_path(path)
+                for name in names:
+                    for key, node in self.by_trace.get(name, {}).items():
+                        # A trace without a file reference matches anywhere
+                        indexed = self.entries.get(key)
+                        if path is None or indexed is None or \
+                           indexed[1] == path:
+                            found[key] = node
+        impact = dict((level, []) for level in LEVELS)
+        seen = set()
+        for node in found.values():
+            while node is not None and node is not self.state:
+                if id(node) in seen:
+                    break
+                seen.add(id(node))
+                impact.setdefault(type(node).__name__, []).append(node)
+                node = node.parent
+        return impact
+
+    def _overlapping(self, path: str, first: int, last: int) -> list:
+        """Gets the requirements whose lines overlap a changed range. A
+           reference without an explicit end covers the lines up to the next
+           reference in the same file. Only the rows starting at most the
+           longest span before the range are looked at.
+        """
+        table = self.by_path[path]
+        starts, ends, longest, unbounded = self._get_spans(path)
+        high = bisect.bisect_right(starts, last)
+        low = bisect.bisect_left(starts, first - longest, 0, high)
+        keys = [table[row][2] for row in range(low, high) if ends[row] >= first]
+        keys.extend(table[row][2] for row in unbounded if row < low)
+        return keys
+
+    def _add(self, node) -> None:
+        """Indexes a LowLevel by its code reference and trace.
+        """
+        self._discard(node)
+        trace = getattr(node, "trace", None)
+        if trace:
+            self.by_trace.setdefault(trace, {})[id(node)] = node
+            self.traces[id(node)] = trace
+        reference = parse_reference(getattr(node, "code_reference", None))
+        if reference is None:
+            return
+        path, start, end = reference
+        entry = (start or 0, end, id(node))
+        bisect.insort(self.by_path.setdefault(path, []), entry,
+                      key=lambda e: (e[0], e[2]))
+        self.entries[id(node)] = (node, path, entry)
+        self.spans.pop(path, None)
+        if self.bloom is not None:
+            self.bloom._add(path)
+            if self.bloom._is_full():
+                self._rebuild_bloom()
+
+    def _discard(self, node) -> None:
+        """Removes a LowLevel from the index.
+        """
+        trace = self.traces.pop(id(node), None)
+        if trace is not None:
+            nodes = self.by_trace[trace]
+            del nodes[id(node)]
+            if not nodes:
+                del self.by_trace[trace]
+        indexed = self.entries.pop(id(node), None)
+        if indexed is None:
+            return
+        _, path, entry = indexed
+        table = self.by_path[path]
+        table.remove(entry)
+        self.spans.pop(path, None)
+        if not table:
+            # The path stays in the Bloom filter, it only costs a lookup
+            del self.by_path[path]
+
+    def _rebuild_bloom(self) -> None:
+        """Sizes the Bloom filter for twice the indexed paths and fills it.
+        """
+        self.bloom = BloomFilter(max(1, len(self.by_path)) * 2)
+        for path in self.by_path:
+            self.bloom._add(path)
+
+    def _owns(self, node) -> bool:
+        """Checks a changed node belongs to the indexed program state.
+        """
+        while node is not None:
+            if node is self.state:
+                return True
+            node = node.parent
+        return False
+
+    def _on_change(self, events: list) -> None:
+        """Keeps the index in step with a batch of changes to the program
+           state.
+        """
+        for event in events:
+            node = event.node
+            if event.field == CHILDREN:
+                if not self._owns(node):
+                    continue
+                for child in event.old:
+                    stack = [child]
+                    while stack:
+                        child = stack.pop()
+                        self._discard(child)
+                        stack.extend(child._get_children())
+                for child in event.new:
+                    stack = [child]
+                    while stack:
+                        child = stack.pop()
+                        self._add(child)
+                        stack.extend(child._get_children())
+            elif event.field in ("code_reference", "trace") and \
+                 self._owns(node):
+                self._add(node)
+
+    ############
+    #   Persistence
+    ############
+    def _get_index_path(self) -> str:
+        """Gets where the index is saved, next to the requirements file.
+
+        Returns:
+            str: Path of the saved index.
+        """
+        return self.path + INDEX_SUFFIX
+
+    def _save(self) -> None:
+        """Saves the index next to the requirements file. Call it once the
+           state has been written to that file, the saved index is tied to the
+           file's checksum.
+        """
+        numbers = {}
+        for number, node in enumerate(preorder(self.state)):
+            numbers[id(node)] = number
+        paths = {}
+        for path, table in self.by_path.items():
+            paths[path] = [
+                [start, end, numbers[key]] for start, end, key in table
+            ]
+        data = {
+            "version" : INDEX_VERSION,
+            "source" : file_checksum(self.path),
+            "bloom" : {
+                "capacity" : self.bloom.capacity,
+                "hashes" : self.bloom.hashes,
+                "bits" : base64.b64encode(bytes(self.bloom.bits)).decode()
+            },
+            "paths" : paths
+        }
+        index_path = self._get_index_path()
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(index_path + ".tmp", index_path)
+
+    def _load(self) -> bool:
+        """Loads the saved index if it was saved for the current file.
+
+        Returns:
+            bool: True if the saved index was loaded, false otherwise.
+        """
+        try:
+            with open(self._get_index_path(), "r") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION or \
+               data.get("source") != file_checksum(self.path):
+                return False
+        except (OSError, ValueError):
+            return False
+        nodes = preorder(self.state)
+        by_path = {}
+        entries = {}
+        try:
+            for path, table in data["paths"].items():
+                rows = by_path[path] = []
+                for start, end, number in table:
+                    node = nodes[number]
+                    entry = (start, end, id(node))
+                    rows.append(entry)
+                    entries[id(node)] = (node, path, entry)
+            bloom = BloomFilter(
+                data["bloom"]["capacity"], data["bloom"]["hashes"],
+                bytearray(base64.b64decode(data["bloom"]["bits"]))
+            )
+        except (IndexError, KeyError, TypeError, ValueError):
+            # The state does not match the file the index was saved for
+            return False
+        bloom.count = len(by_path)
+        self.by_path = by_path
+        self.entries = entries
+        self.spans = {}
+        self.bloom = bloom
+        # Traces are not saved, they are read off the nodes
+        for node in nodes:
+            trace = getattr(node, "trace", None)
+            if trace:
+                self.by_trace.setdefault(trace, {})[id(node)] = node
+                self.traces[id(node)] = trace
+        return True
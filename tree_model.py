@@ -0,0 +1,249 @@
+from PyQt6.QtCore import QAbstractItemModel, QModelIndex, Qt
+
+from state import State
+from events import subscribe, unsubscribe, CHILDREN
+
+# Definitions
+COLUMNS = ("Title", "Status", "Done")
+# Rows created per fetchMore, the view asks again as it scrolls
+FETCH_BATCH = 256
+
+class TreeItem:
+    def __init__(self, node, parent_item, row: int) -> None:
+        """Creates an instance of the TreeItem class, the model's handle on a
+           node that has been shown. Its children are only created once the
+           view fetches them.
+
+        Args:
+            node (unknown): State, Project, Requirement, SystemRequirement,
+                            HighLevel or LowLevel object.
+            parent_item (TreeItem): Item of the parent, None for the root.
+            row (int): Position under the parent.
+        """
+        self.node = node
+        self.parent_item = parent_item
+        self.row = row
+        self.children = []
+        # Children the model believes the node has while replaying events
+        self.known = len(node._get_children())
+
+class RequirementTreeModel(QAbstractItemModel):
+    def __init__(self, state: State, parent=None) -> None:
+        """Creates an instance of the RequirementTreeModel class which shows
+           the program state as a tree. Rows are created as branches are
+           expanded and scrolled, and changes made through the model setters
+           update single rows. Changes must be made on the UI thread.
+
+        Args:
+            state (State): Program state to show.
+            parent (QObject, optional): Qt parent.
+        """
+        super().__init__(parent)
+        self.state = state
+        self.root = TreeItem(state, None, 0)
+        # id(node) -> TreeItem, only for nodes that have been shown
+        self.items = {id(state): self.root}
+        # Set while rows are inserted or removed, fetching then would nest
+        # another change inside it
+        self.changing = False
+        subscribe(self._on_change)
+
+    ############
+    #   Qt model interface
+    ############
+    def index(self, row: int, column: int, parent=QModelIndex()):
+        item = self._item(parent)
+        if row < 0 or row >= len(item.children) or \
+           column < 0 or column >= len(COLUMNS):
+            return QModelIndex()
+        return self.createIndex(row, column, item.children[row])
+
+    def parent(self, index=QModelIndex()):
+        if not index.isValid():
+            return QModelIndex()
+        parent_item = index.internalPointer().parent_item
+        if parent_item is None or parent_item is self.root:
+            return QModelIndex()
+        return self.createIndex(parent_item.row, 0, parent_item)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid() and parent.column() != 0:
+            return 0
+        return len(self._item(parent).children)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return len(COLUMNS)
+
+    def hasChildren(self, parent=QModelIndex()) -> bool:
+        # Answered from the node so branches show before they are fetched
+        return len(self._item(parent).node._get_children()) > 0
+
+    def canFetchMore(self, parent) -> bool:
+        if self.changing:
+            return False
+        item = self._item(parent)
+        return len(item.children) < len(item.node._get_children())
+
+    def fetchMore(self, parent) -> None:
+        item = self._item(parent)
+        nodes = item.node._get_children()
+        first = len(item.children)
+        last = min(len(nodes), first + FETCH_BATCH) - 1
+        if last < first:
+            return
+        self.changing = True
+        try:
+            self.beginInsertRows(parent, first, last)
+            for row in range(first, last + 1):
+                child = TreeItem(nodes[row], item, row)
+                item.children.append(child)
+                self.items[id(nodes[row])] = child
+            item.known = len(nodes)
+            self.endInsertRows()
+        finally:
+            self.changing = False
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer().node
+        if role == Qt.ItemDataRole.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return node.title
+            if column == 1:
+                return getattr(node, "status", "")
+            return f"{node._get_percent_done():.0f}%"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return node.description
+        return None
+
+    def headerData(
+        self, section: int, orientation,
+        role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and \
+           role == Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    ############
+    #   Getters
+    ############
+    def _item(self, index) -> TreeItem:
+        """Gets the item behind an index, the root for an invalid one.
+        """
+        if index.isValid():
+            return index.internalPointer()
+        return self.root
+
+    def _get_node(self, index):
+        """Gets the object shown at an index.
+
+        Args:
+            index (QModelIndex): Index from a view.
+
+        Returns:
+            unknown: Object shown at the index, the State for the root.
+        """
+        return self._item(index).node
+
+    def _index_of(self, item: TreeItem, column: int = 0):
+        """Gets the index of an item.
+        """
+        if item is self.root:
+            return QModelIndex()
+        return self.createIndex(item.row, column, item)
+
+    ############
+    #   Helpers
+    ############
+    def _close(self) -> None:
+        """Stops following changes to the program state.
+        """
+        unsubscribe(self._on_change)
+
+    def _forget(self, item: TreeItem) -> None:
+        """Drops an item and everything fetched below it from the lookup.
+        """
+        stack = [item]
+        while stack:
+            item = stack.pop()
+            if self.items.get(id(item.node)) is item:
+                del self.items[id(item.node)]
+            stack.extend(item.children)
+
+    def _renumber(self, item: TreeItem, start: int) -> None:
+        """Fixes the rows of children from a position onwards.
+        """
+        for row in range(start, len(item.children)):
+            item.children[row].row = row
+
+    def _row_changed(self, item: TreeItem) -> None:
+        """Tells the views one row changed, along with the Done column of
+           every shown ancestor since their rollups moved too.
+        """
+        if item is not self.root:
+            self.dataChanged.emit(
+                self._index_of(item, 0), self._index_of(item, len(COLUMNS) - 1)
+            )
+        item = item.parent_item
+        while item is not None and item is not self.root:
+            done = self._index_of(item, len(COLUMNS) - 1)
+            self.dataChanged.emit(done, done)
+            item = item.parent_item
+
+    def _on_change(self, events: list) -> None:
+        """Turns a batch of changes into row inserts, removals and updates for
+           the parts of the tree that have been shown.
+        """
+        touched = []
+        self.changing = True
+        try:
+            self._replay(events, touched)
+        finally:
+            self.changing = False
+        for item in touched:
+            item.known = len(item.node._get_children())
+
+    def _replay(self, events: list, touched: list) -> None:
+        """Applies each change of a batch to the items in order.
+        """
+        for event in events:
+            item = self.items.get(id(event.node))
+            if item is None:
+                continue
+            if event.field != CHILDREN:
+                self._row_changed(item)
+                continue
+            touched.append(item)
+            parent = self._index_of(item)
+            if event.index is None:
+                # Whole list replaced, start the branch over
+                if item.children:
+                    self.beginRemoveRows(parent, 0, len(item.children) - 1)
+                    for child in item.children:
+                        self._forget(child)
+                    item.children = []
+                    self.endRemoveRows()
+                item.known = None
+            elif item.known is not None:
+                fetched = len(item.children)
+                for child in event.old:
+                    item.known -= 1
+                    if event.index < fetched:
+                        self.beginRemoveRows(parent, event.index, event.index)
+                        self._forget(item.children.pop(event.index))
+                        self._renumber(item, event.index)
+                        self.endRemoveRows()
+                for child in event.new:
+                    complete = fetched == item.known
+                    item.known += 1
+                    if event.index < fetched or \
+                       (event.index == fetched and complete):
+                        self.beginInsertRows(parent, event.index, event.index)
+                        added = TreeItem(child, item, event.index)
+                        item.children.insert(event.index, added)
+                        self.items[id(child)] = added
+                        self._renumber(item, event.index)
+                        self.endInsertRows()
+            self._row_changed(item)
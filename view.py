@@ -1,4 +1,7 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QPushButton, QLineEdit
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QLabel, QPushButton, QLineEdit, QTreeView,
+    QProgressBar
+)
 
 class View(QWidget):
     def __init__(self):
@@ -18,6 +21,19 @@ class View(QWidget):
         self.button = QPushButton('Update')
         self.layout.addWidget(self.button)
 
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText('Filter')
+        self.layout.addWidget(self.filter_input)
+
+        self.tree = QTreeView()
+        # Every row is one line, lets the view skip measuring rows
+        self.tree.setUniformRowHeights(True)
+        self.layout.addWidget(self.tree)
+
+        self.progress = QProgressBar()
+        self.progress.hide()
+        self.layout.addWidget(self.progress)
+
         self.setLayout(self.layout)
 
     def get_input_text(self):
@@ -26,5 +42,19 @@ class View(QWidget):
     def set_label_text(self, text):
         self.label.setText(f'Data: {text}')
 
+    def set_progress(self, text, done, total):
+        # Totals may not fit the bar's int, show per mille instead
+        self.progress.setFormat(f'{text} %p%')
+        self.progress.setRange(0, 1000)
+        self.progress.setValue(done * 1000 // total if total else 0)
+        self.progress.show()
+
+    def hide_progress(self):
+        self.progress.hide()
+
+    def set_tree_model(self, model):
+        if self.tree.model() is not model:
+            self.tree.setModel(model)
+
     def show_full_screen(self):
         self.showFullScreen()
@@ -0,0 +1,273 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+from concurrent.futures import Future
+
+from json_read import JsonReader
+from state import State
+from file_io import FileIO
+from checksum import checksum
+
+# Definitions
+POLL_INTERVAL = 1.0
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+INOTIFY_EVENT = struct.Struct("iIII")
+
+class _Inotify:
+    def __init__(self, directory: str) -> None:
+        """Creates an inotify watch on a directory. Watching the directory
+           rather than the file catches editors that save by renaming a new
+           file over the old one.
+
+        Args:
+            directory (str): Directory to watch.
+
+        Raises:
+            OSError: If inotify is not available on this system.
+        """
+        name = ctypes.util.find_library("c")
+        if name is None:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(
+            self.fd, os.fsencode(directory),
+            IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        )
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def _wait(self, timeout: float) -> set[str]:
+        """Waits for changes in the directory.
+
+        Args:
+            timeout (float): Seconds to wait at most.
+
+        Returns:
+            set[str]: Names of the files that changed, empty on timeout.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return set()
+        names = set()
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            names.add(os.fsdecode(
+                data[offset:offset + length].rstrip(b"\0")
+            ))
+            offset += length
+        return names
+
+    def _close(self) -> None:
+        """Closes the inotify instance and its watch.
+        """
+        os.close(self.fd)
+
+class ChangeWatcher:
+    def __init__(
+        self, state: State, local_path: str = None, file_io: FileIO = None,
+        interval: float = POLL_INTERVAL, on_change=None,
+        on_error=None) -> None:
+        """Creates an instance of the ChangeWatcher class which keeps the
+           program state in step with a requirements file that other people
+           edit. Exactly one of local_path or file_io is given.
+
+        Args:
+            state (State): Program state to merge changes into.
+            local_path (str, optional): Local requirements file to watch.
+            file_io (FileIO, optional): Remote requirements file to watch.
+            interval (float, optional): Seconds between polls. Defaults to
+                                        POLL_INTERVAL.
+            on_change (callable, optional): Called with the titles of the
+                                            projects that changed, on the
+                                            thread owning the state.
+            on_error (callable, optional): Called with the exception when a
+                                           check fails, watching carries on.
+                                           The last one is kept in error
+                                           either way.
+        """
+        self.state = state
+        self.local_path = local_path
+        self.file_io = file_io
+        self.interval = interval
+        self.on_change = on_change
+        self.on_error = on_error
+        self.error = None
+        self.timestamp = None
+        self.digest = None
+        self.stat_signature = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    ############
+    #   Helpers
+    ############
+    def _start(self) -> None:
+        """Starts watching on a background thread.
+        """
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._run, name="spectrak-watcher", daemon=True
+        )
+        self.thread.start()
+
+    def _stop(self) -> None:
+        """Stops watching and waits for the background thread to finish.
+        """
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+
+    def _run(self) -> None:
+        """Body of the background thread.
+        """
+        inotify = None
+        if self.local_path is not None:
+            try:
+                inotify = _Inotify(
+                    os.path.dirname(os.path.abspath(self.local_path))
+                )
+            except OSError:
+                # Fall back to polling the mtime
+                inotify = None
+        name = None if self.local_path is None \
+            else os.path.basename(self.local_path)
+        try:
+            while not self.stop_event.is_set():
+                if inotify is not None:
+                    names = inotify._wait(self.interval)
+                    if names and name not in names:
+                        continue
+                try:
+                    merged = self._check()
+                except Exception as e:
+                    # A server or file that is briefly unavailable must not
+                    # stop the watch, the owner decides what to make of it
+                    self._report(e)
+                else:
+                    if merged is not None:
+                        merged.add_done_callback(self._on_merged)
+                if inotify is None:
+                    self.stop_event.wait(self.interval)
+        finally:
+            if inotify is not None:
+                inotify._close()
+
+    def _report(self, e: Exception) -> None:
+        """Hands an error to the owner.
+        """
+        self.error = e
+        if self.on_error is not None:
+            self.on_error(e)
+
+    def _on_merged(self, merged: Future) -> None:
+        """Reports a merge that failed, it runs after _check returned.
+        """
+        if merged.exception() is not None:
+            self._report(merged.exception())
+
+    def _check(self) -> Future:
+        """Checks the watched file once and reloads it if its data changed.
+
+        Returns:
+            Future: Titles of the projects that changed, once merged. None if
+                    the file did not change.
+        """
+        if self.local_path is not None:
+            return self._check_local()
+        return self._check_remote()
+
+    def _check_local(self) -> Future:
+        """Checks the local file, only reading it if its stat moved.
+
+        Returns:
+            Future: Titles of the projects that changed, once merged. None if
+                    the file did not change.
+        """
+        try:
+            st = os.stat(self.local_path)
+        except FileNotFoundError:
+            # Mid-save by a rename, the next event will find it
+            return None
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if signature == self.stat_signature:
+            return None
+        self.stat_signature = signature
+        return self._reload(self.local_path)
+
+    def _check_remote(self) -> Future:
+        """Checks the remote file, which costs a stat unless it changed.
+
+        Returns:
+            Future: Titles of the projects that changed, once merged. None if
+                    the file did not change.
+        """
+        try:
+            entry = self.file_io._fetch_remote_version()
+        except Exception:
+            self.file_io._close_sessions()
+            raise
+        self.file_io._release_sessions()
+        if entry.digest == self.digest:
+            return None
+        self.digest = entry.digest
+        return self._reload(entry.local_path)
+
+    def _reload(self, path: str) -> Future:
+        """Reads the file and merges the projects that changed into the state,
+           unless its timestamp shows it was not saved again. Reading and
+           checksumming happen on the watcher thread, the merge is one
+           transaction on the thread owning the state.
+
+        Args:
+            path (str): Requirements file to read.
+
+        Returns:
+            Future: Titles of the projects that changed, once merged. None if
+                    the file did not change.
+        """
+        with open(path, "r") as f:
+            reader = JsonReader(f)
+            timestamp = reader._read_timestamp()
+            if timestamp is None or timestamp == self.timestamp:
+                return None
+            projects = reader._read_json()
+        self.timestamp = timestamp
+        checksums = dict(
+            (project.title, checksum(project)) for project in projects
+        )
+        return self.state._edit(self._merge, projects, checksums)
+
+    def _merge(self, projects: list, checksums: dict) -> list[str]:
+        """Merges projects read by _reload, on the thread owning the state.
+
+        Returns:
+            list[str]: Titles of the projects that changed.
+        """
+        changed = self.state._merge_projects(projects, checksums)
+        if changed and self.on_change is not None:
+            self.on_change(changed)
+        return changed
@@ -0,0 +1,290 @@
+import io
+import os
+import tempfile
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, Qt, pyqtSignal
+
+from json_read import JsonReader
+from json_write import JsonWriter
+from project import Project
+from checksum import checksum
+from file_io import FileIO
+from remote_cache import CacheEntry
+from persistent import Snapshot
+from exception import CancelledException
+
+# Definitions
+READ_CHUNK = 1048576
+# Projects handed over per partial result
+PARTIAL_BATCH = 16
+
+class WorkerSignals(QObject):
+    """Signals of a Worker. They are emitted on the pool thread and, since
+       this object lives on the UI thread, delivered to slots there.
+    """
+    # Phase, done and total of it
+    progress = pyqtSignal(str, "qint64", "qint64")
+    # Part of the result, available before the task is done
+    partial = pyqtSignal(object)
+    # Result of the task
+    finished = pyqtSignal(object)
+    # Exception the task raised
+    error = pyqtSignal(object)
+    cancelled = pyqtSignal()
+
+class UiInvoker(QObject):
+    """Runs functions handed over from any thread on the thread this object
+       lives on. Create it on the UI thread and give it to State._set_owner.
+    """
+    invoke = pyqtSignal(object)
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        # Queued, the emitting thread never runs the function itself
+        self.invoke.connect(self._run, Qt.ConnectionType.QueuedConnection)
+
+    def __call__(self, func) -> None:
+        self.invoke.emit(func)
+
+    def _run(self, func) -> None:
+        func()
+
+class Worker(QRunnable):
+    def __init__(self, task, *args) -> None:
+        """Creates an instance of the Worker class which runs a task on a
+           QThreadPool. Create it on the UI thread so its signals are
+           delivered there.
+
+        Args:
+            task (callable): Called on the pool thread with this worker and
+                             args. It reports through _progress and
+                             _partial, calls _check_cancelled between steps
+                             and returns the result.
+            args (unknown): Arguments of the task.
+        """
+        super().__init__()
+        self.task = task
+        self.args = args
+        self.signals = WorkerSignals()
+        self.cancel_event = threading.Event()
+
+    def run(self) -> None:
+        try:
+            self._check_cancelled()
+            result = self.task(self, *self.args)
+        except CancelledException:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.error.emit(e)
+        else:
+            self.signals.finished.emit(result)
+
+    ############
+    #   Getters
+    ############
+    def _is_cancelled(self) -> bool:
+        """Checks if the worker was asked to stop.
+
+        Returns:
+            bool: True if it was cancelled, false otherwise.
+        """
+        return self.cancel_event.is_set()
+
+    ############
+    #   Helpers
+    ############
+    def _cancel(self) -> None:
+        """Asks the task to stop at its next check. Nothing it produced is
+           merged, cancelled is emitted instead of finished.
+        """
+        self.cancel_event.set()
+
+    def _check_cancelled(self) -> None:
+        """Stops the task if the worker was cancelled.
+
+        Raises:
+            CancelledException: If the worker was cancelled.
+        """
+        if self.cancel_event.is_set():
+            raise CancelledException("Cancelled")
+
+    def _progress(self, phase: str, done: int, total: int) -> None:
+        """Reports progress and stops the task if it was cancelled, so it can
+           be handed to code taking a progress callback.
+        """
+        self.signals.progress.emit(phase, done, total)
+        self._check_cancelled()
+
+    def _partial(self, part) -> None:
+        """Hands over part of the result.
+        """
+        self.signals.partial.emit(part)
+
+class LoadResult:
+    def __init__(
+        self, path: str, projects: list[Project], checksums: dict,
+        settings, base: CacheEntry = None) -> None:
+        """Creates an instance of the LoadResult class, what a load or sync
+           task read, ready to be merged into the program state.
+
+        Args:
+            path (str): Requirements file that was read.
+            projects (list[Project]): Projects of the file.
+            checksums (dict): Title to checksum of each project.
+            settings (Settings): Settings of the file, None if it has none.
+            base (CacheEntry, optional): Version of the remote file that was
+                                         read, None for a local file.
+        """
+        self.path = path
+        self.projects = projects
+        self.checksums = checksums
+        self.settings = settings
+        self.base = base
+
+def read_file(worker: Worker, path: str) -> LoadResult:
+    """Task reading a requirements file. Parsing, building the objects and
+       checksumming them all happen here rather than on the UI thread.
+
+    Args:
+        worker (Worker): Worker running the task.
+        path (str): Requirements file to read.
+
+    Returns:
+        LoadResult: What was read.
+    """
+    total = os.path.getsize(path)
+    chunks = []
+    done = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            done += len(chunk)
+            worker._progress("read", done, total)
+    reader = JsonReader(io.BytesIO(b"".join(chunks)))
+    del chunks
+    if reader._check_handle_status() is False:
+        raise ValueError(f"Could not read {path}")
+    worker._check_cancelled()
+    reader._read_settings()
+    data = reader.read_json["projects"]
+    projects = []
+    checksums = {}
+    batch = []
+    for i, entry in enumerate(data):
+        project = Project(
+            [reader._create_requirement(r) for r in entry["requirements"]],
+            entry["title"], entry["description"]
+        )
+        projects.append(project)
+        checksums[project.title] = checksum(project)
+        batch.append(project)
+        if len(batch) == PARTIAL_BATCH:
+            worker._partial(batch)
+            batch = []
+        worker._progress("parse", i + 1, len(data))
+    if batch:
+        worker._partial(batch)
+    return LoadResult(path, projects, checksums, reader._get_settings())
+
+def write_file(
+    worker: Worker, snapshot: Snapshot, path: str,
+    fragments: dict = None) -> str:
+    """Task writing a snapshot of the program state to a file. The file is
+       only replaced once the new content is on disk, a cancelled or failed
+       save leaves it as it was.
+
+    Args:
+        worker (Worker): Worker running the task.
+        snapshot (Snapshot): Program state to write.
+        path (str): Requirements file to write.
+        fragments (dict, optional): Json text cache of JsonWriter, only one
+                                    task may use it at a time.
+
+    Returns:
+        str: Path that was written.
+    """
+    worker._progress("write", 0, 1)
+    # A name of its own, a save and an autosave of the same file may run at
+    # once and must not write into each other's file
+    fd, temp_path = tempfile.mkstemp(
+        suffix=".tmp", prefix=os.path.basename(path) + ".",
+        dir=os.path.dirname(os.path.abspath(path))
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            JsonWriter(snapshot, f, fragments)._write_json()
+            f.flush()
+            os.fsync(f.fileno())
+        worker._check_cancelled()
+        try:
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    # The rename only survives a crash once the directory is synced
+    try:
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return path
+    try:
+        os.fsync(directory)
+    except OSError:
+        pass
+    finally:
+        os.close(directory)
+    return path
+
+def sync_file(worker: Worker, file_io: FileIO) -> LoadResult:
+    """Task bringing the local copy of a remote requirements file up to date
+       and reading it.
+
+    Args:
+        worker (Worker): Worker running the task.
+        file_io (FileIO): Remote file to sync.
+
+    Returns:
+        LoadResult: What was read, with the version it came from as the base
+                    of the next push.
+    """
+    try:
+        base = file_io._fetch_remote_version(
+            lambda done, total: worker._progress("fetch", done, total)
+        )
+    finally:
+        file_io._release_sessions()
+    result = read_file(worker, base.local_path)
+    result.base = base
+    return result
+
+def push_file(
+    worker: Worker, file_io: FileIO, snapshot: Snapshot,
+    base: CacheEntry) -> CacheEntry:
+    """Task saving a snapshot to the local copy of a remote file and pushing
+       it to the server.
+
+    Args:
+        worker (Worker): Worker running the task.
+        file_io (FileIO): Remote file to update.
+        snapshot (Snapshot): Program state to write.
+        base (CacheEntry): Version of the remote file the edits were made to,
+                           None if it should not exist yet.
+
+    Raises:
+        RemoteConflictException: If someone else changed the remote file.
+
+    Returns:
+        CacheEntry: Version now on the server.
+    """
+    local_path = write_file(worker, snapshot, file_io.local_path)
+    try:
+        return file_io._push_local_file(local_path, base)
+    finally:
+        file_io._release_sessions()